@@ -0,0 +1,291 @@
+"""
+Micro-benchmarks for the control step and battery hot paths.
+
+Run (from the repo root):
+    python benchmarks/bench_control.py
+    python benchmarks/bench_control.py --filter balance --output my_run.json
+Compare two runs (exits with 1 if anything got slower than the threshold):
+    python benchmarks/bench_control.py --compare benchmarks/results/old.json benchmarks/results/new.json
+
+Results are written as JSON to benchmarks/results/<commit>.json by default.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Callable, Dict
+import numpy as np
+
+# Benchmark the source tree this file sits in.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+from microgrid.battery import Battery
+from microgrid.control import Control
+from microgrid.profiles import clear_profile_cache
+from microgrid.rollout import njit
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+N_YEAR = 8760
+
+# name -> function that does the setup and returns the callable to time.
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def make_control() -> Control:
+    control = Control()
+    control.battery._set_battery_capacity(100)
+    return control
+
+
+@benchmark('control_init')
+def bench_control_init():
+    make_control()  # profiles already parsed
+    return Control
+
+
+@benchmark('control_init_cold')
+def bench_control_init_cold():
+    def init():
+        clear_profile_cache()
+        Control()
+
+    return init
+
+
+@benchmark('update_state')
+def bench_update_state():
+    control = make_control()
+    return lambda: control.update_state(100)
+
+
+def bench_balance(load: float, solar_gen: float, soc: float, action: float):
+    """balance_energy from a fixed state (resetting the state is part of the time)."""
+    control = make_control()
+
+    def balance():
+        control.battery._set_soc(soc)
+        control._set_state(
+            load=load, solar_gen=solar_gen, tou_tariff=1, battery_soc=soc
+        )
+        control.balance_energy(action=action)
+
+    return balance
+
+
+# One per branch of Control.calculate_to_purchase
+BENCHMARKS['balance_energy_positive'] = lambda: bench_balance(2, 10, 0.9, 4)
+BENCHMARKS['balance_energy_artificial_positive'] = lambda: bench_balance(
+    10, 2, 0.5, 10
+)
+BENCHMARKS['balance_energy_negative'] = lambda: bench_balance(12, 2, 0.48, 0)
+
+
+@benchmark('battery_charge')
+def bench_battery_charge():
+    battery = Battery(capacity=100)
+
+    def charge():
+        battery._set_soc(0.5)
+        battery.charge(5)
+
+    return charge
+
+
+@benchmark('battery_discharge')
+def bench_battery_discharge():
+    battery = Battery(capacity=100)
+
+    def discharge():
+        battery._set_soc(0.5)
+        battery.discharge(5)
+
+    return discharge
+
+
+@benchmark('battery_update_soc')
+def bench_battery_update_soc():
+    battery = Battery(capacity=100)
+
+    def update_soc():
+        battery._set_soc(0.5)
+        battery.update_soc(1)
+
+    return update_soc
+
+
+@benchmark('solar_forecast')
+def bench_solar_forecast():
+    control = make_control()
+    return lambda: control.solar.get_solar_forecast(8750)
+
+
+@benchmark('control_forecast')
+def bench_control_forecast():
+    control = make_control()
+    return lambda: control.get_forecast(24)
+
+
+@benchmark('snapshot_restore')
+def bench_snapshot_restore():
+    control = make_control()
+    control.balance_energy(action=10)
+
+    def branch():
+        snapshot = control.get_snapshot()
+        control.balance_energy(action=20)
+        control.restore(snapshot)
+
+    return branch
+
+
+def year_actions() -> np.ndarray:
+    return np.tile([20.0] * 6 + [0.0] * 18, N_YEAR // 24)
+
+
+@benchmark('year_step_loop')
+def bench_year_step_loop():
+    control = make_control()
+    actions = year_actions().tolist()
+
+    def run_year():
+        control.reset()
+        for i, action in enumerate(actions):
+            control.balance_energy(action=action)
+            if i < N_YEAR - 1:
+                control.step()
+
+    return run_year
+
+
+@benchmark('year_rollout_python')
+def bench_year_rollout_python():
+    control = make_control()
+    actions = year_actions()
+    return lambda: control.rollout(actions, backend='python')
+
+
+if njit is not None:
+
+    @benchmark('year_rollout_numba')
+    def bench_year_rollout_numba():
+        control = make_control()
+        actions = year_actions()
+        control.rollout(actions, backend='numba')  # compile outside the timing
+        return lambda: control.rollout(actions, backend='numba')
+
+
+def time_function(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Seconds per call: pick a number of calls that takes ~0.2s, then repeat."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(name_filter: str, repeat: int) -> dict:
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = time_function(setup(), repeat)
+        print(f"{name:40s} {results[name]['min'] * 1e6:12.3f} us")
+
+    return {
+        'commit': get_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'results': results,
+    }
+
+
+def compare(old_file: str, new_file: str, threshold: float) -> int:
+    """Print the ratio new/old per benchmark. Returns 1 if anything got slower than threshold."""
+    old = json.loads(Path(old_file).read_text())['results']
+    new = json.loads(Path(new_file).read_text())['results']
+
+    regressions = 0
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name]['min'] / old[name]['min']
+        flag = ''
+        if ratio > threshold:
+            flag = '  <-- slower'
+            regressions += 1
+        print(
+            f"{name:40s} {old[name]['min'] * 1e6:12.3f} us"
+            f" -> {new[name]['min'] * 1e6:12.3f} us  x{ratio:.2f}{flag}"
+        )
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--filter',
+        default='',
+        help='only run benchmarks with this in the name',
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--output', default='', help='JSON file for the results'
+    )
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=1.2,
+        help='slowdown ratio that counts as a regression',
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+
+    report = run(args.filter, args.repeat)
+    output = (
+        Path(args.output)
+        if args.output
+        else RESULTS_DIR / f"{report['commit']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Saved results to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+from typing import Dict, Tuple
+import numpy as np
+from microgrid.solar import Solar
+from microgrid.load import Load
+from microgrid.grid import Grid
+from microgrid.generator import Generator
+from microgrid.tariff import Tariff
+
+# Same keys as the dict returned by Control.balance_energy
+RESULT_KEYS: Tuple[str, ...] = (
+    'to_purchase',
+    'charged_this_step',
+    'discharged_this_step',
+    'excess_this_step',
+    'unmet_demand_this_step',
+)
+RESULT_DTYPE = np.dtype([(key, np.float64) for key in RESULT_KEYS])
+# BatchControl with a generator adds the generator fields.
+GENERATOR_RESULT_KEYS: Tuple[str, ...] = RESULT_KEYS + (
+    'generated_this_step',
+    'generator_cost_this_step',
+)
+GENERATOR_RESULT_DTYPE = np.dtype(
+    [(key, np.float64) for key in GENERATOR_RESULT_KEYS]
+)
+
+
+def balance_energy_batch(
+    soc: np.ndarray,
+    energy_balance: np.ndarray,
+    purchase_request: np.ndarray,
+    capacity: np.ndarray,
+    C_rate: np.ndarray,
+    efficiency: np.ndarray,
+    soc_cuttoff: np.ndarray,
+    interval: float,
+    out: np.ndarray = None,
+    available: np.ndarray = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Use: Vectorised version of Control.balance_energy. Every branch (positive, artificial positive, negative)
+        is evaluated for all envs with masked array ops, so there is no Python work per env.
+
+    Args:
+        soc (np.ndarray): battery soc per env (0 -> 1)
+        energy_balance (np.ndarray): solar - load per env
+        purchase_request (np.ndarray): action per env
+        capacity, C_rate, efficiency, soc_cuttoff (np.ndarray): battery parameters per env (or scalars)
+        interval (float): time interval in hours
+        out (np.ndarray, optional): RESULT_DTYPE array to write the results into.
+        available (np.ndarray, optional): grid availability per env, nothing is purchased where it is False.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (result, new_soc). result has the fields in RESULT_KEYS.
+    """
+    # Battery.get_charge_capacity / get_discharge_capacity
+    max_rate = C_rate * capacity * interval
+    charge_capacity = np.minimum(max_rate, capacity - capacity * soc)
+    discharge_capacity = np.minimum(
+        max_rate, capacity * np.round(soc - soc_cuttoff, 6)
+    )
+    # Energy that can actually be used to charge / can be delivered by a discharge.
+    usable_charge = charge_capacity / efficiency
+    usable_discharge = discharge_capacity * efficiency
+
+    # Control.calculate_to_purchase, all three branches at once.
+    balance_with_request = energy_balance + purchase_request
+    headroom = usable_charge - energy_balance
+    positive = np.where(
+        headroom > 0, np.minimum(purchase_request, headroom), 0.0
+    )
+    artificial_positive = np.minimum(
+        -energy_balance + charge_capacity, purchase_request
+    )
+    shortfall = np.abs(balance_with_request)
+    to_discharge = np.where(
+        usable_discharge > shortfall, shortfall, usable_discharge
+    )
+    negative = purchase_request + np.abs(balance_with_request + to_discharge)
+    to_purchase = np.where(
+        energy_balance > 0,
+        positive,
+        np.where(balance_with_request > 0, artificial_positive, negative),
+    )
+    if available is not None:
+        # Loadshedding
+        to_purchase = np.where(available, to_purchase, 0.0)
+
+    # Control.balance_with_battery -> Battery.charge / Battery.discharge
+    balance_with_grid = energy_balance + to_purchase
+    charging = balance_with_grid > 0
+    demand = np.abs(balance_with_grid)
+
+    fits = balance_with_grid < usable_charge
+    charged = np.where(
+        charging,
+        np.where(fits, balance_with_grid, usable_charge) * efficiency,
+        0.0,
+    )
+    excess = np.where(charging & ~fits, balance_with_grid - usable_charge, 0.0)
+
+    covered = demand < usable_discharge
+    discharged = np.where(
+        charging, 0.0, np.where(covered, demand, usable_discharge)
+    )
+    unmet_demand = np.where(charging | covered, 0.0, demand - usable_discharge)
+
+    # Battery.update_soc
+    soc_change = np.where(charging, charged, -discharged / efficiency)
+    new_soc = np.round(soc + soc_change / capacity, 12)
+
+    if out is None:
+        out = np.empty(np.shape(new_soc), dtype=RESULT_DTYPE)
+    out['to_purchase'] = to_purchase
+    out['charged_this_step'] = charged
+    out['discharged_this_step'] = discharged
+    out['excess_this_step'] = excess
+    out['unmet_demand_this_step'] = unmet_demand
+
+    return out, new_soc
+
+
+class BatchControl:
+    """
+    Vector env: N microgrids stepped in lockstep. Battery state and parameters are arrays over the envs,
+    the profiles are shared with every other component built from the same input file.
+    """
+
+    def __init__(
+        self,
+        n_envs: int = 1,
+        start_step=0,
+        input_file: str = "",
+        soc=0.5,
+        capacity=1,
+        C_rate=0.2,
+        efficiency=0.9,
+        soc_cuttoff=0.4,
+        time_interval: float = 1,
+        generator: Generator = None,
+        availability=None,
+        tariff: Tariff = None,
+    ):
+        self.n_envs = n_envs
+        # time interval in hours
+        self.time_interval = time_interval
+
+        self.solar = Solar(input_file=input_file, time_interval=time_interval)
+        self.load = Load(input_file=input_file, time_interval=time_interval)
+        self.grid = Grid(
+            input_file=input_file,
+            time_interval=time_interval,
+            availability=availability,
+            tariff=tariff,
+        )
+
+        # Battery parameters per env, scalars are broadcast over all of them.
+        self.soc: np.ndarray = self._per_env(soc)
+        self.capacity: np.ndarray = self._per_env(capacity)
+        self.C_rate: np.ndarray = self._per_env(C_rate)
+        self.efficiency: np.ndarray = self._per_env(efficiency)
+        self.soc_cuttoff: np.ndarray = self._per_env(soc_cuttoff)
+        self.current_step: np.ndarray = self._per_env(start_step, np.int64)
+
+        # One generator model for every env, its on/off state is per env.
+        self.generator = generator
+        self.generator_running: np.ndarray = np.zeros(n_envs, dtype=bool)
+
+        self.update_state()
+
+    def _per_env(self, value, dtype=np.float64) -> np.ndarray:
+        return np.array(np.broadcast_to(value, (self.n_envs,)), dtype=dtype)
+
+    def step(self) -> None:
+        """Advance every env one step. (and update the state)"""
+        self.current_step += 1
+        self.update_state()
+
+    def reset(self, start_step=0, soc=0.5, envs=None) -> None:
+        """
+        Use: Reset the step and soc of some (or all) of the envs, without touching the profiles.
+
+        Args:
+            start_step (int or np.ndarray): step to restart at.
+            soc (float or np.ndarray): soc to restart with.
+            envs (np.ndarray, optional): indices or boolean mask of the envs to reset. Defaults to all of them.
+        """
+        if envs is None:
+            envs = slice(None)
+        self.current_step[envs] = start_step
+        self.soc[envs] = soc
+        self.generator_running[envs] = False
+        self.update_state()
+
+    def update_state(self) -> None:
+        """Fetch the state for the current step of every env."""
+        steps = self.current_step
+        self.state: Dict[str, np.ndarray] = {
+            'load': self.load.load_values[steps],
+            'solar_gen': self.solar.solar_generation[steps],
+            'tou_tariff': self.grid.tariffs[steps],
+            'battery_soc': self.soc,
+        }
+
+    def get_current_state(self) -> Dict[str, np.ndarray]:
+        """Returns the current state"""
+        return self.state
+
+    def balance_energy(self, actions) -> np.ndarray:
+        """
+        Use: Balance every env for the current step. Same logic as Control.balance_energy.
+
+        Args:
+            actions (np.ndarray): purchase request per env (a scalar is used for all envs)
+
+        Returns:
+            np.ndarray: structured array (n_envs,) with the fields in RESULT_KEYS (GENERATOR_RESULT_KEYS with a generator).
+        """
+        state = self.get_current_state()
+        energy_balance = state['solar_gen'] - state['load']
+
+        out = None
+        if self.generator is not None:
+            out = np.empty(self.n_envs, dtype=GENERATOR_RESULT_DTYPE)
+        result, self.soc = balance_energy_batch(
+            soc=self.soc,
+            energy_balance=energy_balance,
+            purchase_request=np.broadcast_to(actions, (self.n_envs,)),
+            capacity=self.capacity,
+            C_rate=self.C_rate,
+            efficiency=self.efficiency,
+            soc_cuttoff=self.soc_cuttoff,
+            interval=self.time_interval,
+            out=out,
+            available=self.grid.availability[self.current_step],
+        )
+        if self.generator is not None:
+            generated, cost, excess, self.generator_running = (
+                self.generator.dispatch_batch(
+                    result['unmet_demand_this_step'],
+                    self.time_interval,
+                    self.generator_running,
+                )
+            )
+            result['excess_this_step'] += excess
+            result['unmet_demand_this_step'] = np.maximum(
+                result['unmet_demand_this_step'] - generated, 0.0
+            )
+            result['generated_this_step'] = generated
+            result['generator_cost_this_step'] = cost
+        return result
+
+    def _set_state(self, load, solar_gen, tou_tariff, battery_soc) -> None:
+        """internal func for setting state during testing"""
+        self.soc = self._per_env(battery_soc)
+        self.state: Dict[str, np.ndarray] = {
+            'load': self._per_env(load),
+            'solar_gen': self._per_env(solar_gen),
+            'tou_tariff': self._per_env(tou_tariff),
+            'battery_soc': self.soc,
+        }
@@ -13,6 +13,7 @@ class Battery:
         efficiency: float = 0.9,
         soc_cuttoff: float = 0.4,
         time_interval: float = 1,
+        degradation=None,
     ):
 
         ### State of Charge stuff (SOC)
@@ -28,6 +29,9 @@ class Battery:
         self.interval: float = time_interval
         ### Metrics in kWh for understanding and conversions.
         self.capacity: float = capacity
+        # Optional DegradationModel (microgrid/degradation.py). When set, capacity fades from nominal_capacity as the battery cycles.
+        self.nominal_capacity: float = capacity
+        self.degradation = degradation
 
     def charge(self, charge_energy: float) -> Tuple[float, float]:
         """
@@ -98,6 +102,11 @@ class Battery:
         # I was getting issues with floating point precision. 6 decimal points should be enough??? Maybe I should use soc out of 100 rather than 0->1.
         # I had commented out the below line (self.battery_soc=round....) and I can't remember why I did.... But I was getting the floating point errors again so I'm un-commenting it.
         self.soc = round(self.soc, 12)
+        if self.degradation is not None:
+            state_of_health = self.degradation.update(
+                self.soc, abs(energy) / self.nominal_capacity
+            )
+            self.capacity = self.nominal_capacity * state_of_health
         return self.soc
 
     # Getter Functions
@@ -161,4 +170,5 @@ class Battery:
     def _set_battery_capacity(self, battery_capacity) -> float:
         """internal func for setting battery capcity during testing."""
         self.capacity = battery_capacity
+        self.nominal_capacity = battery_capacity
         return self.capacity
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from io import StringIO
 from typing import Dict, Tuple
@@ -5,30 +6,266 @@ from microgrid.battery import Battery
 from microgrid.solar import Solar
 from microgrid.load import Load
 from microgrid.grid import Grid
+from microgrid.tariff import Tariff
+from microgrid.generator import Generator, DISPATCH_TOLERANCE
+from microgrid.ledger import Ledger, LEDGER_KEYS
+from microgrid.profiles import get_forecast_windows
+from microgrid.timeindex import TimeIndex, get_time_index, DEFAULT_TIMEZONE
+from microgrid.settlement import settle, get_window_starts
+from microgrid.demand import PeakTracker, get_period_ends
+from microgrid.rollout import run_rollout, rollout_columns
+from microgrid.stream import StreamSource, StreamError, RingBuffer
+
+# Feature order of the last axis of Control.get_forecast
+FORECAST_KEYS = ('load', 'solar_gen', 'tou_tariff')
+
+
+class ControlSnapshot:
+    """
+    The mutable state of a Control at one step (see Control.get_snapshot). The profiles aren't part of it,
+    they are shared and read-only, so a snapshot is a few numbers.
+    """
+
+    __slots__ = (
+        'current_step',
+        'soc',
+        'ledger',
+        'capacity',
+        'degradation',
+        'generator_running',
+        'peak',
+    )
+
+    def __init__(
+        self,
+        current_step: int,
+        soc: float,
+        ledger: tuple,
+        capacity: float,
+        degradation: tuple = None,
+        generator_running: bool = False,
+        peak: tuple = None,
+    ):
+        self.current_step = current_step
+        self.soc = soc
+        self.ledger = ledger
+        # Battery capacity and degradation state, they change as the battery fades.
+        self.capacity = capacity
+        self.degradation = degradation
+        # A running generator doesn't pay the start up cost again.
+        self.generator_running = generator_running
+        # Running and last billed peak import (see PeakTracker).
+        self.peak = peak
 
 
 class Control:
-    def __init__(self, start_step: int = 0, input_file: str = ""):
+    def __init__(
+        self,
+        start_step: int = 0,
+        input_file: str = "",
+        time_interval: float = 1,
+        source: StreamSource = None,
+        forecast_period: int = None,
+        ledger_length: int = 8760,
+        generator: Generator = None,
+        availability=None,
+        start_date=None,
+        tz: str = DEFAULT_TIMEZONE,
+        tariff: Tariff = None,
+        feed_in_tariff: float = 0.0,
+        demand_charge: float = 0.0,
+        billing_period: str = "month",
+    ):
+        """
+        Args:
+            start_step (int): step to start at.
+            input_file (str): profiles to use. Defaults to microgrid.INPUT_FILE.
+            time_interval (float): step length in hours.
+            source (StreamSource, optional): streaming mode. Samples are pulled from the source one step at a time
+                (the first one when the Control is built) instead of read from the profiles, so it can run indefinitely.
+            forecast_period (int, optional): streaming mode, samples kept for the persistence forecast. Defaults to a day.
+            ledger_length (int): streaming mode, rows kept in the ledger.
+            generator (Generator, optional): dispatched for whatever demand the grid and battery can't meet.
+            availability (array like, optional): grid availability mask per step, False during loadshedding
+                (see microgrid.loadshedding). Defaults to the grid always being on.
+            start_date (str or datetime, optional): start at the step of this date instead of start_step.
+            tz (str): timezone of the site, naive dates are local time (see microgrid.timeindex).
+            tariff (Tariff, optional): rule based tariff instead of the tou_tariff column (see microgrid.tariff).
+                Not used in streaming mode, the tariff comes with each sample.
+            feed_in_tariff (float): export credit per kWh when the tariff doesn't set one (see Control.settle).
+            demand_charge (float): charge per kW of peak import per billing period when there is no tariff.
+            billing_period (str): "day", "week", "month" or "year", the peak import is billed at the end of each.
+        """
 
         self.current_step = start_step
-        # time interval in hours
-        self.time_interval = 1
+        # time interval in hours. The profiles are resampled to it when the file has a different interval.
+        self.time_interval = time_interval
 
         # setup battery
-        self.battery = Battery()
-        self.solar = Solar(input_file=input_file)
-        self.load = Load(input_file=input_file)
-        self.grid = Grid(input_file=input_file)
+        self.battery = Battery(time_interval=time_interval)
+        self.generator = generator
+
+        self.source = source
+        if source is None:
+            self.solar = Solar(
+                input_file=input_file, time_interval=time_interval
+            )
+            self.load = Load(
+                input_file=input_file, time_interval=time_interval
+            )
+            # Dates of the steps (synthesized when the file has no timestamps).
+            self.time_index: TimeIndex = get_time_index(self.load.profiles, tz)
+            self.grid = Grid(
+                input_file=input_file,
+                time_interval=time_interval,
+                availability=availability,
+                tariff=tariff,
+                time_index=self.time_index,
+                feed_in_tariff=feed_in_tariff,
+                demand_charge=demand_charge,
+            )
+            # Episode accounting, one row per timestep of the profiles.
+            self.ledger = Ledger(n_steps=len(self.load.load_values))
+            self.billing_period = billing_period
+            self.peak_tracker = PeakTracker(
+                get_period_ends(
+                    self.time_index.get_period_starts(billing_period),
+                    self.time_index.n_steps,
+                ),
+                interval=time_interval,
+            )
+            self.setup_demand_charge()
+            if start_date is not None:
+                self.current_step = self.time_index.get_step(start_date)
+        else:
+            # No profiles in memory, only the last forecast_period samples.
+            self.solar = None
+            self.load = None
+            self.grid = Grid(
+                input_file=None,
+                feed_in_tariff=feed_in_tariff,
+                demand_charge=demand_charge,
+            )
+            if forecast_period is None:
+                forecast_period = int(round(24 / time_interval))
+            self.history = RingBuffer(forecast_period, len(FORECAST_KEYS))
+            self.history.append(source.next_sample())
+            self.ledger = Ledger(n_steps=ledger_length, wrap=True)
+            self.time_index = None
+            # No billing periods without dates, the peak is only tracked.
+            self.billing_period = None
+            self.peak_tracker = PeakTracker(interval=time_interval)
 
         self.update_state(self.current_step)
 
     def step(self):
         """Advance the simulation on step. (and update the state)"""
+        if self.source is not None:
+            # Pull before moving on, so the state is unchanged if the stream has ended (StreamEnd).
+            self.history.append(self.source.next_sample())
         self.current_step = self.current_step + 1
         self.update_state(self.current_step)
 
+    def reset(
+        self,
+        start_step: int = 0,
+        soc: float = 0.5,
+        keep_degradation: bool = False,
+    ) -> None:
+        """
+        Use: Start a new episode without rebuilding Solar/Load/Grid or reading the input file again.
+            Resets the step, battery soc, ledger and generator (off). The battery goes back to its nominal
+            capacity and the degradation model to a new battery, unless keep_degradation (wear carries across
+            episodes).
+        """
+        self.current_step = start_step
+        self.battery._set_soc(soc)
+        if not keep_degradation:
+            self.battery.capacity = self.battery.nominal_capacity
+            if self.battery.degradation is not None:
+                self.battery.degradation.reset()
+        if self.generator is not None:
+            self.generator.running = False
+        self.ledger.clear()
+        self.peak_tracker.reset()
+        self.update_state(self.current_step)
+
+    def setup_demand_charge(self) -> None:
+        """Point the peak tracker at the demand charge rate and demand periods of the grid."""
+        self.peak_tracker.demand_charge = self.grid.demand_charge
+        self.peak_tracker.demand_mask = self.grid.demand_mask
+
+    def set_tariff(self, tariff: Tariff) -> None:
+        """Swap in a rule based tariff (see Grid.set_tariff), including its demand charge."""
+        self._check_profiles("set_tariff")
+        self.grid.set_tariff(tariff, self.time_index)
+        self.setup_demand_charge()
+        self.update_state(self.current_step)
+
+    def seek(self, when) -> None:
+        """
+        Use: Jump to the step containing a date (O(1), see TimeIndex.get_step). Like _set_step, the battery
+            and ledger are left as they are.
+        """
+        self._check_profiles("seek")
+        self.current_step = self.time_index.get_step(when)
+        self.update_state(self.current_step)
+
+    def get_timestamp(self):
+        """Local date and time of the current step (pd.Timestamp)."""
+        self._check_profiles("get_timestamp")
+        return self.time_index.get_timestamp(self.current_step)
+
+    def get_calendar_features(self) -> np.ndarray:
+        """Calendar features of the current step, see timeindex.CALENDAR_KEYS. A read-only row of a precomputed matrix."""
+        self._check_profiles("get_calendar_features")
+        return self.time_index.get_calendar_matrix()[self.current_step]
+
+    def get_snapshot(self) -> ControlSnapshot:
+        """
+        Use: Capture the current step, battery soc and ledger so a branch (tree search, counterfactuals)
+            can be tried from here and undone with restore(). Much cheaper than copy.deepcopy(control).
+        """
+        self._check_profiles("get_snapshot")
+        degradation = self.battery.degradation
+        return ControlSnapshot(
+            self.current_step,
+            self.battery.get_soc(),
+            self.ledger.get_snapshot(self.current_step),
+            self.battery.capacity,
+            degradation.get_snapshot() if degradation is not None else None,
+            self.generator is not None and self.generator.running,
+            self.peak_tracker.get_snapshot(),
+        )
+
+    def restore(self, snapshot: ControlSnapshot) -> None:
+        """
+        Use: Go back to a snapshot from get_snapshot, undoing the steps taken since.
+            The same snapshot can be restored any number of times. (A reset() in between can't be undone.)
+        """
+        self.current_step = snapshot.current_step
+        self.battery._set_soc(snapshot.soc)
+        self.battery.capacity = snapshot.capacity
+        if self.battery.degradation is not None:
+            self.battery.degradation.restore(snapshot.degradation)
+        if self.generator is not None:
+            self.generator.running = snapshot.generator_running
+        self.peak_tracker.restore(snapshot.peak)
+        self.ledger.restore(snapshot.ledger)
+        self.update_state(self.current_step)
+
     def update_state(self, timestep: int) -> None:
         """Fetch the state for the current timestep."""
+        if self.source is not None:
+            load, solar_gen, tou_tariff = self.history.latest().tolist()
+            self.state: Dict[str, float] = {
+                'load': load,
+                'solar_gen': solar_gen,
+                'tou_tariff': tou_tariff,
+                'battery_soc': self.battery.get_soc(),
+                'peak_import': self.peak_tracker.peak,
+            }
+            return
         self.state: Dict[str, float] = {
             'load': self.load.get_current_load(timestep=timestep),
             'solar_gen': self.solar.get_current_solar_generation(
@@ -36,6 +273,8 @@ class Control:
             ),
             'tou_tariff': self.grid.get_current_tariff(timestep=timestep),
             'battery_soc': self.battery.get_soc(),
+            # Peak import (kW) so far this billing period, what the demand charge will be billed on.
+            'peak_import': self.peak_tracker.peak,
         }
 
     def get_current_state(self) -> Dict[str, float]:
@@ -43,6 +282,47 @@ class Control:
         state = self.state
         return state
 
+    def get_forecast(
+        self, forecast_length: int = 24, mode: str = "wrap"
+    ) -> np.ndarray:
+        """
+        Use: Stacked load/solar/tariff forecast from the current step, for observation builders (RL, MPC).
+            A read-only view into a (T, forecast_length, features) matrix that is built once and shared, so no allocation per step.
+
+            In streaming mode it is a persistence forecast from the recent samples (see RingBuffer.get_forecast).
+
+        Returns:
+            np.ndarray: (forecast_length, len(FORECAST_KEYS))
+        """
+        if self.source is not None:
+            return self.history.get_forecast(forecast_length)
+        return self.get_forecast_matrix(forecast_length, mode)[
+            self.current_step
+        ]
+
+    def get_loadshedding_forecast(
+        self, forecast_length: int = 24, mode: str = "wrap"
+    ) -> np.ndarray:
+        """Grid availability for the next forecast_length steps (False is loadshedding), a read-only view."""
+        return self.grid.loadshedding_forecast(
+            self.current_step, forecast_length, mode
+        )
+
+    def get_forecast_matrix(
+        self, forecast_length: int = 24, mode: str = "wrap"
+    ) -> np.ndarray:
+        """The full (T, forecast_length, len(FORECAST_KEYS)) forecast matrix."""
+        self._check_profiles("get_forecast_matrix")
+        return get_forecast_windows(
+            (
+                self.load.load_values,
+                self.solar.solar_generation,
+                self.grid.tariffs,
+            ),
+            forecast_length,
+            mode,
+        )
+
     # Functions to Energy logic flow
     def balance_energy(self, action: float):
         """Main logic function. Adjust system state based on control signals and ensure energy balance."""
@@ -60,6 +340,9 @@ class Control:
         to_purchase = self.calculate_to_purchase(
             energy_balance, purchase_request
         )
+        # Loadshedding: nothing from the grid, the battery (and generator) have to cover it.
+        if not self.grid.is_available(self.current_step):
+            to_purchase = 0.0
 
         # Purchase and balance with Battery.
         energy_balance_with_grid = energy_balance + to_purchase
@@ -69,6 +352,43 @@ class Control:
             energy_balance_with_grid
         )
 
+        # Run the generator for what is still unmet.
+        generated, generator_cost = 0.0, 0.0
+        if self.generator is not None:
+            generated, generator_cost, excess, unmet_demand = (
+                self.balance_with_generator(excess, unmet_demand)
+            )
+
+        # Export what is left, up to the feed in rating. It is credited when the ledger is settled.
+        exported, curtailed = 0.0, 0.0
+        if excess > 0:
+            exported, curtailed = self.grid.export_energy(
+                excess, self.current_step, self.time_interval
+            )
+
+        purchased, cost = self.grid.purchase_energy(
+            to_purchase,
+            self.current_step,
+            tariff=state['tou_tariff'] if self.source is not None else None,
+        )
+        # O(1) running peak, billed on the last step of the billing period.
+        demand_charge = self.peak_tracker.update(self.current_step, purchased)
+        self.ledger.record(
+            self.current_step,
+            purchased,
+            cost,
+            charged,
+            discharged,
+            excess,
+            unmet_demand,
+            self.battery.get_soc(),
+            generated,
+            generator_cost,
+            exported,
+            curtailed,
+            demand_charge,
+        )
+
         result = {
             'to_purchase': to_purchase,
             'charged_this_step': charged,
@@ -76,8 +396,32 @@ class Control:
             'excess_this_step': excess,
             'unmet_demand_this_step': unmet_demand,
         }
+        if self.generator is not None:
+            result['generated_this_step'] = generated
+            result['generator_cost_this_step'] = generator_cost
         return result
 
+    def balance_with_generator(
+        self, excess: float, unmet_demand: float
+    ) -> tuple:
+        """
+        Use: Dispatch the generator for the unmet demand. It runs at min load or more, anything above the
+            demand is excess. Turns it off when there is nothing to cover.
+
+        Returns:
+            tuple: generated energy, generator cost, excess and unmet demand after the generator.
+        """
+        if unmet_demand <= DISPATCH_TOLERANCE:
+            self.generator.stop()
+            return 0.0, 0.0, excess, unmet_demand
+        power, generator_cost = self.generator.run_generators(
+            unmet_demand / self.time_interval, self.time_interval
+        )
+        generated = power * self.time_interval
+        excess += max(generated - unmet_demand, 0.0)
+        unmet_demand = max(unmet_demand - generated, 0.0)
+        return generated, float(generator_cost), excess, unmet_demand
+
     def artificial_positive_energy_balance(
         self, energy_balance: float, purchase_request: float
     ):
@@ -207,6 +551,106 @@ class Control:
 
         return charged, discharged, excess, unmet_demand
 
+    def rollout(self, actions, backend: str = "auto") -> Dict[str, np.ndarray]:
+        """
+        Use: Fast-path for evaluating a fixed action sequence from the current step. Gives the same numbers as
+            calling balance_energy(action) and step() for every action, but runs as one tight kernel
+            (compiled with numba when it is installed). Does not change the state of the Control or Battery.
+            Degradation isn't applied: the capacity stays at battery.capacity for the whole rollout, where
+            stepping a battery with a DegradationModel fades it every step (see run_degradation_years).
+
+        Args:
+            actions (array like): purchase request for each step.
+            backend (str): "auto", "numba" or "python".
+
+        Returns:
+            Dict[str, np.ndarray]: per step arrays of to_purchase, charged, discharged, excess, unmet_demand, soc (after the step) and cost.
+                With a generator also generated and generator_cost (unmet_demand and excess are after the generator).
+        """
+        self._check_profiles("rollout")
+        out, _ = run_rollout(
+            load=self.load.load_values,
+            solar_gen=self.solar.solar_generation,
+            tariffs=self.grid.tariffs,
+            available=self.grid.availability,
+            actions=actions,
+            start_step=self.current_step,
+            soc=self.battery.get_soc(),
+            capacity=self.battery.capacity,
+            C_rate=self.battery.C_rate,
+            efficiency=self.battery.efficiency,
+            soc_cuttoff=self.battery.soc_cuttoff,
+            interval=self.battery.interval,
+            backend=backend,
+        )
+        columns = rollout_columns(out)
+        if self.generator is not None:
+            # The generator doesn't change the battery, so it is dispatched on the finished trace.
+            generated, generator_cost, generator_excess = (
+                self.generator.dispatch_trace(
+                    columns['unmet_demand'], self.time_interval
+                )
+            )
+            columns['excess'] = columns['excess'] + generator_excess
+            columns['unmet_demand'] = np.maximum(
+                columns['unmet_demand'] - generated, 0.0
+            )
+            columns['generated'] = generated
+            columns['generator_cost'] = generator_cost
+        columns['exported'], columns['curtailed'] = self.grid.export_trace(
+            columns['excess'], self.current_step, self.time_interval
+        )
+        columns['demand_charge'] = self.peak_tracker.trace(
+            columns['to_purchase'], self.current_step
+        )
+        return columns
+
+    def settle(
+        self, mode: str = "net_billing", period: str = "month"
+    ) -> Dict[str, np.ndarray]:
+        """
+        Use: Settle the recorded steps of the ledger per billing period, one vectorised pass (see settlement.settle).
+
+        Args:
+            mode (str): "net_billing" or "net_metering".
+            period (str): billing period, see timeindex.PERIODS.
+
+        Returns:
+            Dict[str, np.ndarray]: start step, imported, exported, import_cost, export_credit and bill per billing period.
+        """
+        self._check_profiles("settle")
+        rows = self.ledger.get_rows()
+        start = self.ledger.start if len(rows) else 0
+        end = start + len(rows)
+        starts = get_window_starts(
+            self.time_index.get_period_starts(period), start, end
+        )
+        settlement = settle(
+            purchased=rows[:, LEDGER_KEYS.index('purchased')],
+            cost=rows[:, LEDGER_KEYS.index('cost')],
+            exported=rows[:, LEDGER_KEYS.index('exported')],
+            tariffs=self.grid.tariffs[start:end],
+            feed_in_tariffs=self.grid.feed_in_tariffs[start:end],
+            starts=starts,
+            mode=mode,
+            demand_charge=self.grid.demand_charge,
+            demand_mask=(
+                self.grid.demand_mask[start:end]
+                if self.grid.demand_mask is not None
+                else None
+            ),
+            interval=self.time_interval,
+        )
+        # Steps of the profiles rather than rows of the window.
+        settlement['start'] = settlement['start'] + start
+        return settlement
+
+    def _check_profiles(self, name: str) -> None:
+        if self.source is not None:
+            raise StreamError(
+                f"{name} needs the full profiles, it isn't available in streaming mode."
+            )
+
     # internal function to set the current step for testing purposes.
     def _set_step(self, step) -> None:
         self.current_step = step
@@ -224,4 +668,5 @@ class Control:
             'solar_gen': solar_gen,
             'tou_tariff': tou_tariff,
             'battery_soc': battery_soc,
+            'peak_import': self.peak_tracker.peak,
         }
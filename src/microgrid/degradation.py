@@ -0,0 +1,320 @@
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+
+class DegradationError(Exception):
+    """Custom exception for the battery degradation model. Found in microgrid/degradation.py"""
+
+    pass
+
+
+def turning_points(values) -> np.ndarray:
+    """
+    Use: The reversals of a trace (plus its first and last value), found with array ops.
+        Flat sections are collapsed first so they don't create reversals.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 3:
+        return values.copy()
+    keep = np.empty(len(values), dtype=bool)
+    keep[0] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    values = values[keep]
+    if len(values) < 3:
+        return values
+    diff = np.diff(values)
+    reversal = diff[:-1] * diff[1:] < 0
+    return np.concatenate([values[:1], values[1:-1][reversal], values[-1:]])
+
+
+class RainflowCounter:
+    """
+    Streaming rainflow cycle counting (ASTM E1049 three point method). push() one value per step:
+    each reversal goes on the stack once and comes off at most once, so it is O(1) amortised and the
+    only memory is the stack of open reversals. Counted cycles are reduced to totals as they close.
+    """
+
+    def __init__(self, exponent: float = 1.0, keep_cycles: bool = False):
+        """
+        Args:
+            exponent (float): damage_sum adds count * range**exponent for every cycle (the Wöhler exponent).
+            keep_cycles (bool): also keep every (range, count), for the batch function.
+        """
+        self.exponent = exponent
+        # Totals of the closed cycles (half cycles from the start of the trace count 0.5).
+        self.cycles: float = 0.0
+        self.damage_sum: float = 0.0
+        self.history: List[Tuple[float, float]] = [] if keep_cycles else None
+
+        self._stack: List[float] = []
+        self._last: float = None
+        self._direction: int = 0
+
+    def push(self, value: float) -> None:
+        """Add the next value of the trace."""
+        if self._last is None:
+            self._last = value
+            self._add_reversal(value)
+            return
+        change = value - self._last
+        if change == 0:
+            return
+        direction = 1 if change > 0 else -1
+        if direction != self._direction and self._direction != 0:
+            # The last value was a peak or a valley.
+            self._add_reversal(self._last)
+        self._direction = direction
+        self._last = value
+
+    def _count(self, cycle_range: float, count: float) -> None:
+        self.cycles += count
+        self.damage_sum += count * cycle_range**self.exponent
+        if self.history is not None:
+            self.history.append((cycle_range, count))
+
+    def _add_reversal(self, reversal: float) -> None:
+        stack = self._stack
+        stack.append(reversal)
+        while len(stack) >= 3:
+            x = abs(stack[-1] - stack[-2])
+            y = abs(stack[-2] - stack[-3])
+            if x < y:
+                break
+            if len(stack) == 3:
+                # Y includes the start of the trace: half a cycle.
+                self._count(y, 0.5)
+                del stack[0]
+            else:
+                self._count(y, 1.0)
+                del stack[-3:-1]
+
+    def get_residual(self) -> List[float]:
+        """Ranges of the open half cycles (the stack and the value the trace is on now)."""
+        points = list(self._stack)
+        if self._last is not None and (not points or points[-1] != self._last):
+            points.append(self._last)
+        return [abs(b - a) for a, b in zip(points, points[1:])]
+
+    def get_totals(self, include_residual: bool = True) -> Tuple[float, float]:
+        """(cycles, damage_sum), with the open half cycles counted as half cycles if include_residual."""
+        cycles, damage_sum = self.cycles, self.damage_sum
+        if include_residual:
+            for cycle_range in self.get_residual():
+                cycles += 0.5
+                damage_sum += 0.5 * cycle_range**self.exponent
+        return cycles, damage_sum
+
+    def get_snapshot(self) -> tuple:
+        return (
+            list(self._stack),
+            self._last,
+            self._direction,
+            self.cycles,
+            self.damage_sum,
+        )
+
+    def restore(self, snapshot: tuple) -> None:
+        stack, self._last, self._direction, self.cycles, self.damage_sum = (
+            snapshot
+        )
+        self._stack = list(stack)
+
+    def reset(self) -> None:
+        """Forget the trace, as if nothing had been pushed."""
+        self.cycles = 0.0
+        self.damage_sum = 0.0
+        if self.history is not None:
+            self.history = []
+        self._stack = []
+        self._last = None
+        self._direction = 0
+
+
+def rainflow(values, exponent: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Use: Rainflow count a finished trace (e.g. the soc column of a rollout). The reversals are found
+        with array ops, so only the turning points (a few per day) go through the counting loop.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (ranges, counts) per cycle, counts are 1 or 0.5 (half cycles).
+    """
+    counter = RainflowCounter(exponent=exponent, keep_cycles=True)
+    for value in turning_points(values).tolist():
+        counter.push(value)
+    for cycle_range in counter.get_residual():
+        counter.history.append((cycle_range, 0.5))
+    if not counter.history:
+        return np.zeros(0), np.zeros(0)
+    ranges, counts = np.array(counter.history).T
+    return ranges, counts
+
+
+class DegradationModel:
+    """
+    Capacity fade from cycling. Two mechanisms add up (Miner's rule):
+        cycle aging: every rainflow cycle of depth d uses d**wohler_exponent / cycle_life of the life.
+        throughput aging: every full equivalent cycle (2x capacity through the cells) uses 1 / throughput_life.
+    A used up life (damage of 1) is end_of_life_fade of the nominal capacity lost.
+    """
+
+    def __init__(
+        self,
+        cycle_life: float = 4000,
+        wohler_exponent: float = 1.5,
+        throughput_life: float = 10000,
+        end_of_life_fade: float = 0.2,
+    ):
+        """
+        Args:
+            cycle_life (float): 100% depth of discharge cycles to end of life.
+            wohler_exponent (float): cycles to end of life at depth d are cycle_life * d**-wohler_exponent.
+            throughput_life (float): full equivalent cycles to end of life, None to ignore throughput.
+            end_of_life_fade (float): fraction of the capacity lost at end of life.
+        """
+        if cycle_life <= 0 or (
+            throughput_life is not None and throughput_life <= 0
+        ):
+            raise DegradationError(
+                "Cycle and throughput life must be positive."
+            )
+        self.cycle_life = cycle_life
+        self.wohler_exponent = wohler_exponent
+        self.throughput_life = throughput_life
+        self.end_of_life_fade = end_of_life_fade
+
+        self.counter = RainflowCounter(exponent=wohler_exponent)
+        # Energy through the cells, in units of the nominal capacity.
+        self.throughput: float = 0.0
+        self.state_of_health: float = 1.0
+
+    def update(self, soc: float, throughput: float) -> float:
+        """
+        Use: Per step update (called by Battery.update_soc).
+
+        Args:
+            soc (float): soc after the step.
+            throughput (float): energy in or out of the cells this step over the nominal capacity.
+
+        Returns:
+            float: the new state of health (capacity over nominal capacity).
+        """
+        self.counter.push(soc)
+        self.throughput += throughput
+        self.state_of_health = self._get_state_of_health(
+            self.counter.damage_sum
+        )
+        return self.state_of_health
+
+    def update_from_trace(self, soc, throughput: float = None) -> float:
+        """
+        Use: Batch update from a finished soc trace (continues from the previous updates).
+
+        Args:
+            soc (np.ndarray): soc per step.
+            throughput (float, optional): energy through the cells over the nominal capacity. Defaults to the sum of the soc changes.
+
+        Returns:
+            float: the new state of health.
+        """
+        points = turning_points(soc)
+        if throughput is None:
+            throughput = float(np.abs(np.diff(points)).sum())
+        for value in points.tolist():
+            self.counter.push(value)
+        self.throughput += throughput
+        self.state_of_health = self._get_state_of_health(
+            self.counter.damage_sum
+        )
+        return self.state_of_health
+
+    def _get_state_of_health(self, damage_sum: float) -> float:
+        damage = damage_sum / self.cycle_life
+        if self.throughput_life is not None:
+            damage += self.throughput / (2 * self.throughput_life)
+        return max(1.0 - self.end_of_life_fade * damage, 0.0)
+
+    def get_metrics(self) -> Dict[str, float]:
+        """State of health including the open half cycles, cycle count and equivalent full cycles."""
+        cycles, damage_sum = self.counter.get_totals(include_residual=True)
+        return {
+            'state_of_health': self._get_state_of_health(damage_sum),
+            'cycles': cycles,
+            'equivalent_full_cycles': self.throughput / 2,
+        }
+
+    def get_snapshot(self) -> tuple:
+        return (
+            self.counter.get_snapshot(),
+            self.throughput,
+            self.state_of_health,
+        )
+
+    def restore(self, snapshot: tuple) -> None:
+        counter, self.throughput, self.state_of_health = snapshot
+        self.counter.restore(counter)
+
+    def reset(self) -> None:
+        """Back to a new battery (no cycles, no throughput, full health)."""
+        self.counter.reset()
+        self.throughput = 0.0
+        self.state_of_health = 1.0
+
+
+def run_degradation_years(
+    control,
+    actions,
+    n_years: int,
+    model: DegradationModel = None,
+    backend: str = "auto",
+) -> pd.DataFrame:
+    """
+    Use: Long horizon economics. Runs the fixed actions over the profiles once per year with Control.rollout,
+        rainflow counts each year's soc trace in batch and fades the battery capacity before the next year.
+        The capacity is constant within a year, so a 10 year run is 10 rollouts.
+
+    Args:
+        control (Control): the site. Its battery capacity and soc are updated, the step is left where it was.
+        actions (array like): purchase request per step, one year from control.current_step.
+        n_years (int): number of years.
+        model (DegradationModel, optional): defaults to control.battery.degradation or a default model.
+        backend (str): rollout backend, see Control.rollout.
+
+    Returns:
+        pd.DataFrame: one row per year with capacity (at the start of the year), state_of_health (at the end),
+            cost, grid_energy_bought, unmet_demand and cycles.
+    """
+    battery = control.battery
+    if model is None:
+        model = battery.degradation or DegradationModel()
+    nominal_capacity = battery.nominal_capacity
+
+    rows = []
+    for year in range(n_years):
+        capacity = battery.capacity
+        start_soc = battery.get_soc()
+        out = control.rollout(actions, backend=backend)
+        soc = np.concatenate([[start_soc], out['soc']])
+
+        cycles_before = model.counter.cycles
+        model.update_from_trace(
+            soc,
+            throughput=float(np.abs(np.diff(soc)).sum())
+            * capacity
+            / nominal_capacity,
+        )
+        battery.capacity = nominal_capacity * model.state_of_health
+        battery._set_soc(float(out['soc'][-1]))
+
+        rows.append(
+            {
+                'year': year,
+                'capacity': capacity,
+                'state_of_health': model.state_of_health,
+                'cost': float(out['cost'].sum()),
+                'grid_energy_bought': float(out['to_purchase'].sum()),
+                'unmet_demand': float(out['unmet_demand'].sum()),
+                'cycles': model.counter.cycles - cycles_before,
+            }
+        )
+    return pd.DataFrame(rows).set_index('year')
@@ -0,0 +1,151 @@
+from typing import Tuple
+import numpy as np
+
+
+class DemandError(Exception):
+    """Custom exception for demand charges. Found in microgrid/demand.py"""
+
+    pass
+
+
+def get_period_ends(starts: np.ndarray, n_steps: int) -> np.ndarray:
+    """Bool per step, True on the last step of each billing period (and the last step of the horizon)."""
+    ends = np.zeros(n_steps, dtype=bool)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends[starts[(starts > 0) & (starts <= n_steps)] - 1] = True
+    if n_steps:
+        ends[-1] = True
+    return ends
+
+
+def get_period_peaks(
+    purchased: np.ndarray,
+    starts: np.ndarray,
+    interval: float = 1,
+    demand_mask: np.ndarray = None,
+    initial_peak: float = 0.0,
+) -> np.ndarray:
+    """
+    Use: Peak import power of every billing period, for whole trajectories at once (np.maximum.reduceat).
+
+    Args:
+        purchased (np.ndarray): energy bought per step, (T,) or (n_trajectories, T).
+        starts (np.ndarray): first step of each billing period (indices into the steps, starts at 0).
+        interval (float): step length in hours, energy per step / interval is power.
+        demand_mask (np.ndarray, optional): bool per step, only these steps count towards the peak.
+        initial_peak (float or np.ndarray): peak of the first period before the first step (a trace that
+            starts part way through a period).
+
+    Returns:
+        np.ndarray: (n_periods,) or (n_trajectories, n_periods) peak import in kW.
+    """
+    power = np.asarray(purchased, dtype=np.float64) / interval
+    if power.shape[-1] == 0:
+        return np.zeros(power.shape[:-1] + (0,))
+    starts = np.asarray(starts, dtype=np.int64)
+    if starts[0] != 0 or np.any(np.diff(starts) <= 0):
+        raise DemandError("Billing periods must start at 0 and increase.")
+    if demand_mask is not None:
+        power = np.where(demand_mask, power, 0.0)
+    # Imports are never negative, so 0 is the peak of a period with nothing to count.
+    peaks = np.maximum.reduceat(np.maximum(power, 0.0), starts, axis=-1)
+    peaks[..., 0] = np.maximum(peaks[..., 0], initial_peak)
+    return peaks
+
+
+class PeakTracker:
+    """
+    Running peak import of the current billing period, updated in O(1) per step. The demand charge
+    (peak * demand_charge) is billed on the last step of the period and the peak starts again from 0.
+    Without period ends (streaming) the peak is only tracked, never billed.
+    """
+
+    __slots__ = (
+        'period_ends',
+        'demand_mask',
+        'demand_charge',
+        'interval',
+        'peak',
+        'last_peak',
+    )
+
+    def __init__(
+        self,
+        period_ends: np.ndarray = None,
+        demand_mask: np.ndarray = None,
+        demand_charge: float = 0.0,
+        interval: float = 1,
+    ):
+        """
+        Args:
+            period_ends (np.ndarray, optional): bool per step, True on the last step of a billing period (see get_period_ends).
+            demand_mask (np.ndarray, optional): bool per step, only these steps count towards the peak (see Tariff.demand_periods).
+            demand_charge (float): charge per kW of peak per billing period.
+            interval (float): step length in hours.
+        """
+        self.period_ends = period_ends
+        self.demand_mask = demand_mask
+        self.demand_charge = demand_charge
+        self.interval = interval
+        # kW, the peak so far in the current billing period.
+        self.peak: float = 0.0
+        # kW, the peak billed for the last finished period.
+        self.last_peak: float = 0.0
+
+    def update(self, timestep: int, purchased: float) -> float:
+        """
+        Use: Track the import of a step.
+
+        Returns:
+            float: the demand charge, 0 unless timestep ends a billing period.
+        """
+        power = purchased / self.interval
+        if power > self.peak and (
+            self.demand_mask is None or self.demand_mask[timestep]
+        ):
+            self.peak = power
+        if self.period_ends is not None and self.period_ends[timestep]:
+            charge = self.peak * self.demand_charge
+            self.last_peak = self.peak
+            self.peak = 0.0
+            return charge
+        return 0.0
+
+    def reset(self) -> None:
+        self.peak = 0.0
+        self.last_peak = 0.0
+
+    def get_snapshot(self) -> Tuple[float, float]:
+        return self.peak, self.last_peak
+
+    def restore(self, snapshot: Tuple[float, float]) -> None:
+        self.peak, self.last_peak = snapshot
+
+    def trace(self, purchased: np.ndarray, start_step: int) -> np.ndarray:
+        """
+        Use: The demand charge of every step of a trace from start_step, vectorised and without changing
+            the tracker. Gives the same numbers as calling update for every step.
+
+        Returns:
+            np.ndarray: charge per step, non zero on the steps that end a billing period.
+        """
+        purchased = np.asarray(purchased, dtype=np.float64)
+        charges = np.zeros(len(purchased))
+        if self.period_ends is None or not len(purchased):
+            return charges
+        window = slice(start_step, start_step + len(purchased))
+        ends = np.flatnonzero(self.period_ends[window])
+        if not len(ends):
+            return charges
+        # Each period of the trace runs up to and including its end step, the tail after the last end isn't billed yet.
+        starts = np.concatenate(([0], ends + 1))
+        starts = starts[starts < len(purchased)]
+        peaks = get_period_peaks(
+            purchased,
+            starts,
+            self.interval,
+            (None if self.demand_mask is None else self.demand_mask[window]),
+            self.peak,
+        )
+        charges[ends] = peaks[: len(ends)] * self.demand_charge
+        return charges
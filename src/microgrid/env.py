@@ -0,0 +1,170 @@
+from typing import Dict, Tuple
+import numpy as np
+from microgrid.control import Control
+from microgrid.ledger import LEDGER_KEYS
+
+try:
+    import gymnasium as gym
+    from gymnasium import spaces
+except ImportError as e:
+    raise ImportError(
+        "microgrid.env needs gymnasium, install it with: pip install microgrid[rl]"
+    ) from e
+
+
+class MicrogridEnv(gym.Env):
+    """
+    Gymnasium environment around Control. The observation is the Control state (in the order of its keys),
+    the action is the purchase request passed to Control.balance_energy.
+    The Control is built once and reset in place, so reset() never touches the input file.
+    """
+
+    metadata = {"render_modes": []}
+
+    def __init__(
+        self,
+        input_file: str = "",
+        episode_length: int = 24 * 7,
+        random_start: bool = True,
+        max_purchase: float = None,
+        unmet_demand_penalty: float = 10,
+        control: Control = None,
+    ):
+        """
+        Args:
+            input_file (str): profiles to use. Defaults to microgrid.INPUT_FILE.
+            episode_length (int): steps per episode.
+            random_start (bool): start each episode at a random step of the year (otherwise at step 0).
+            max_purchase (float, optional): upper bound of the action. Defaults to the peak load plus the battery's max charge rate.
+            unmet_demand_penalty (float): cost per unit of unmet demand in the reward.
+            control (Control, optional): use an existing Control instead of building one.
+        """
+        self.control = (
+            control if control is not None else Control(input_file=input_file)
+        )
+        self.n_steps = len(self.control.load.load_values)
+        if not 0 < episode_length <= self.n_steps:
+            raise ValueError(
+                f"episode_length must be between 1 and {self.n_steps}, got {episode_length}"
+            )
+        self.episode_length = episode_length
+        self.random_start = random_start
+        self.unmet_demand_penalty = unmet_demand_penalty
+        self.episode_end = 0
+
+        battery = self.control.battery
+        max_charge = battery.C_rate * battery.capacity * battery.interval
+        if max_purchase is None:
+            max_purchase = (
+                float(self.control.load.load_values.max()) + max_charge
+            )
+
+        # Observation bounds from the profiles, one entry per state key.
+        self.obs_keys = list(self.control.get_current_state().keys())
+        self._max_peak = max_purchase / battery.interval
+        self._bounds_tariffs: np.ndarray = None
+        self.update_observation_space()
+        self.action_space = spaces.Box(
+            low=0.0, high=max_purchase, shape=(1,), dtype=np.float32
+        )
+        self._cost_columns = [
+            LEDGER_KEYS.index('cost'),
+            LEDGER_KEYS.index('generator_cost'),
+            LEDGER_KEYS.index('demand_charge'),
+        ]
+
+    @staticmethod
+    def _bounds(values: np.ndarray) -> Tuple[float, float]:
+        return float(min(values.min(), 0)), float(values.max())
+
+    def update_observation_space(self) -> None:
+        """
+        Use: Observation bounds from the profiles. Called again when the tariffs change (Control.set_tariff),
+            so tou_tariff observations stay inside observation_space.
+        """
+        tariffs = self.control.grid.tariffs
+        bounds: Dict[str, Tuple[float, float]] = {
+            'load': self._bounds(self.control.load.load_values),
+            'solar_gen': self._bounds(self.control.solar.solar_generation),
+            'tou_tariff': self._bounds(tariffs),
+            'battery_soc': (0.0, 1.0),
+            'peak_import': (0.0, self._max_peak),
+        }
+        low, high = zip(*(bounds[key] for key in self.obs_keys))
+        self.observation_space = spaces.Box(
+            low=np.array(low, dtype=np.float32),
+            high=np.array(high, dtype=np.float32),
+            dtype=np.float32,
+        )
+        self._bounds_tariffs = tariffs
+
+    def _get_obs(self) -> np.ndarray:
+        # A swapped tariff is a new (cached, read-only) array, so an identity check is enough.
+        if self.control.grid.tariffs is not self._bounds_tariffs:
+            self.update_observation_space()
+        # The state is fetched before balance_energy, so take the soc from the battery itself.
+        state = self.control.get_current_state()
+        soc = self.control.battery.get_soc()
+        return np.array(
+            [
+                soc if key == 'battery_soc' else state[key]
+                for key in self.obs_keys
+            ],
+            dtype=np.float32,
+        )
+
+    def reset(self, seed: int = None, options: dict = None):
+        """
+        Use: Start a new episode. O(1) apart from clearing the last episode's ledger rows.
+
+        Args:
+            seed (int, optional): seeds self.np_random.
+            options (dict, optional): 'start_step' and/or 'soc' to start from instead of the defaults,
+                'keep_degradation' to carry the battery wear over from the last episode (see Control.reset).
+        """
+        super().reset(seed=seed)
+        options = options or {}
+
+        start_step = options.get('start_step')
+        if start_step is None:
+            if self.random_start:
+                start_step = int(
+                    self.np_random.integers(
+                        0, self.n_steps - self.episode_length + 1
+                    )
+                )
+            else:
+                start_step = 0
+        self.control.reset(
+            start_step=start_step,
+            soc=options.get('soc', 0.5),
+            keep_degradation=options.get('keep_degradation', False),
+        )
+        self.episode_end = min(start_step + self.episode_length, self.n_steps)
+
+        return self._get_obs(), {'timestep': start_step}
+
+    def step(self, action):
+        purchase_request = float(
+            np.clip(
+                np.asarray(action, dtype=np.float64).reshape(-1)[0],
+                self.action_space.low[0],
+                self.action_space.high[0],
+            )
+        )
+        timestep = self.control.current_step
+        result = self.control.balance_energy(action=purchase_request)
+
+        cost = float(
+            self.control.ledger.data[timestep, self._cost_columns].sum()
+        )
+        reward = -(
+            cost + self.unmet_demand_penalty * result['unmet_demand_this_step']
+        )
+
+        truncated = timestep + 1 >= self.episode_end
+        if not truncated:
+            self.control.step()
+
+        info = {'timestep': timestep, 'cost': cost, **result}
+        return self._get_obs(), reward, False, truncated, info
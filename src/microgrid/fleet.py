@@ -0,0 +1,333 @@
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from microgrid.batch import RESULT_DTYPE, balance_energy_batch
+from microgrid.profiles import load_profiles
+
+# Profile fields every site needs. Column names in a fleet file are "<site>/<field>",
+# a column called just "tou_tariff" is shared by every site.
+FLEET_FIELDS: Tuple[str, ...] = ('load', 'solar_gen', 'tou_tariff')
+SITE_SEPARATOR = "/"
+
+# Battery parameters that can be given per site.
+SITE_PARAMETERS: Tuple[str, ...] = (
+    'soc',
+    'capacity',
+    'C_rate',
+    'efficiency',
+    'soc_cuttoff',
+)
+
+
+class FleetError(Exception):
+    """Custom exception for the fleet controller. Found in microgrid/fleet.py"""
+
+    pass
+
+
+def split_fleet_columns(
+    columns: Dict[str, np.ndarray], separator: str = SITE_SEPARATOR
+) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Use: Turn the columns of a wide fleet table ("<site>/<field>") into one (T, n_sites) matrix per field.
+
+    Args:
+        columns (Dict[str, np.ndarray]): column name -> profile. A column named only by its field is shared by all sites.
+        separator (str): between the site and field in the column names.
+
+    Returns:
+        Tuple[List[str], Dict[str, np.ndarray]]: (site names in order of first appearance, field -> (T, n_sites))
+    """
+    sites: List[str] = []
+    for name in columns:
+        site, sep, field = name.rpartition(separator)
+        if sep and field in FLEET_FIELDS and site not in sites:
+            sites.append(site)
+    if not sites:
+        raise FleetError(
+            f"No site columns found, expected names like 'site_a{separator}load'."
+        )
+
+    matrices: Dict[str, np.ndarray] = {}
+    for field in FLEET_FIELDS:
+        per_site = [columns.get(f"{site}{separator}{field}") for site in sites]
+        if all(values is not None for values in per_site):
+            matrices[field] = np.column_stack(per_site)
+        elif field in columns:
+            # Shared column: a broadcast view, no copy per site.
+            shared = np.asarray(columns[field], dtype=np.float64)
+            matrices[field] = np.broadcast_to(
+                shared[:, None], (len(shared), len(sites))
+            )
+        else:
+            missing = [s for s, v in zip(sites, per_site) if v is None]
+            raise FleetError(f"Sites {missing} have no '{field}' column.")
+    return sites, matrices
+
+
+class Fleet:
+    """
+    Many microgrids stepped together from one data store. Profiles are (T, n_sites) matrices and the battery
+    state/parameters are arrays over the sites, so one step is a handful of array ops whatever the fleet size.
+    Keeps fleet-level aggregates (grid import per step, peak coincident demand) as it goes.
+    """
+
+    def __init__(
+        self,
+        profiles: Dict[str, np.ndarray],
+        site_names: List[str] = None,
+        start_step: int = 0,
+        soc=0.5,
+        capacity=1,
+        C_rate=0.2,
+        efficiency=0.9,
+        soc_cuttoff=0.4,
+        time_interval: float = 1,
+    ):
+        """
+        Args:
+            profiles (Dict[str, np.ndarray]): (T, n_sites) matrix for every field in FLEET_FIELDS.
+            site_names (List[str], optional): names of the sites, defaults to site_0, site_1, ...
+            start_step (int): step to start at.
+            soc, capacity, C_rate, efficiency, soc_cuttoff (float or array like): battery parameters, per site or one for all.
+            time_interval (float): time interval in hours
+        """
+        missing = [field for field in FLEET_FIELDS if field not in profiles]
+        if missing:
+            raise FleetError(f"Fleet profiles are missing {missing}")
+
+        self.load_values = np.asarray(profiles['load'], dtype=np.float64)
+        self.solar_generation = np.asarray(
+            profiles['solar_gen'], dtype=np.float64
+        )
+        self.tariffs = np.asarray(profiles['tou_tariff'], dtype=np.float64)
+        if not (
+            self.load_values.ndim == 2
+            and self.load_values.shape
+            == self.solar_generation.shape
+            == self.tariffs.shape
+        ):
+            raise FleetError(
+                "Fleet profiles must all be (T, n_sites) matrices of the same shape."
+            )
+
+        self.n_steps, self.n_sites = self.load_values.shape
+        if site_names is None:
+            site_names = [f"site_{i}" for i in range(self.n_sites)]
+        if len(site_names) != self.n_sites:
+            raise FleetError(
+                f"Got {len(site_names)} site names for {self.n_sites} sites."
+            )
+        self.site_names = list(site_names)
+        # time interval in hours
+        self.time_interval = time_interval
+
+        self.soc: np.ndarray = self._per_site(soc)
+        self.capacity: np.ndarray = self._per_site(capacity)
+        self.C_rate: np.ndarray = self._per_site(C_rate)
+        self.efficiency: np.ndarray = self._per_site(efficiency)
+        self.soc_cuttoff: np.ndarray = self._per_site(soc_cuttoff)
+
+        # Reused every step so balancing doesn't allocate the result.
+        self._result = np.empty(self.n_sites, dtype=RESULT_DTYPE)
+        # Fleet totals per step, and running totals per site.
+        self.grid_import = np.zeros(self.n_steps)
+        self.fleet_cost = np.zeros(self.n_steps)
+        self.fleet_unmet_demand = np.zeros(self.n_steps)
+        self.site_import = np.zeros(self.n_sites)
+        self.site_cost = np.zeros(self.n_sites)
+        self.site_unmet_demand = np.zeros(self.n_sites)
+        # Per site import, cost and unmet demand of the last balanced step. Balancing that step again
+        # replaces it in the running totals, like the per step arrays (and the Control ledger row).
+        self._step_totals = np.zeros((3, self.n_sites))
+        self._balanced_step: int = None
+
+        self.reset(start_step=start_step, soc=self.soc)
+
+    @classmethod
+    def from_file(
+        cls,
+        input_file: str,
+        separator: str = SITE_SEPARATOR,
+        site_parameters: pd.DataFrame = None,
+        **kwargs,
+    ) -> "Fleet":
+        """
+        Use: Build a fleet from a wide csv or bundle, parsed once through load_profiles (so it is cached and shared).
+
+        Args:
+            input_file (str): columns named "<site>/<field>", see split_fleet_columns.
+            separator (str): between the site and field in the column names.
+            site_parameters (pd.DataFrame, optional): indexed by site, columns from SITE_PARAMETERS.
+            **kwargs: passed to Fleet (battery parameters for every site, start_step, time_interval).
+        """
+        # Resampled like the single site profiles, so sub hourly steps hold energy per step.
+        profiles = load_profiles(input_file, kwargs.get('time_interval', 1))
+        sites, matrices = split_fleet_columns(profiles.columns, separator)
+        kwargs.update(cls._site_kwargs(site_parameters, sites))
+        return cls(matrices, site_names=sites, **kwargs)
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        site_parameters: pd.DataFrame = None,
+        **kwargs,
+    ) -> "Fleet":
+        """
+        Use: Build a fleet from a wide DataFrame with (site, field) MultiIndex columns.
+
+        Args:
+            df (pd.DataFrame): one row per timestep, e.g. df['site_a']['load'].
+            site_parameters (pd.DataFrame, optional): indexed by site, columns from SITE_PARAMETERS.
+            **kwargs: passed to Fleet.
+        """
+        if not isinstance(df.columns, pd.MultiIndex):
+            raise FleetError(
+                "Fleet frames need (site, field) MultiIndex columns."
+            )
+        columns = {
+            f"{site}{SITE_SEPARATOR}{field}": df[(site, field)].to_numpy()
+            for site, field in df.columns
+        }
+        sites, matrices = split_fleet_columns(columns)
+        kwargs.update(cls._site_kwargs(site_parameters, sites))
+        return cls(matrices, site_names=sites, **kwargs)
+
+    @staticmethod
+    def _site_kwargs(site_parameters: pd.DataFrame, sites: List[str]) -> Dict:
+        if site_parameters is None:
+            return {}
+        unknown = set(site_parameters.columns) - set(SITE_PARAMETERS)
+        if unknown:
+            raise FleetError(f"Unknown site parameters {sorted(unknown)}")
+        try:
+            site_parameters = site_parameters.loc[sites]
+        except KeyError as e:
+            raise FleetError(f"No parameters for site(s): {e}")
+        return {
+            name: site_parameters[name].to_numpy(np.float64)
+            for name in site_parameters.columns
+        }
+
+    def _per_site(self, value) -> np.ndarray:
+        return np.array(
+            np.broadcast_to(value, (self.n_sites,)), dtype=np.float64
+        )
+
+    def step(self) -> None:
+        """Advance every site one step. (and update the state)"""
+        self.current_step += 1
+        self.update_state()
+
+    def reset(self, start_step: int = 0, soc=0.5) -> None:
+        """Restart every site at start_step with soc, and clear the aggregates."""
+        self.current_step = start_step
+        self.soc = self._per_site(soc)
+        for totals in (
+            self.grid_import,
+            self.fleet_cost,
+            self.fleet_unmet_demand,
+            self.site_import,
+            self.site_cost,
+            self.site_unmet_demand,
+        ):
+            totals[:] = 0.0
+        self._balanced_step = None
+        self.update_state()
+
+    def update_state(self) -> None:
+        """Fetch the state for the current step. The profile rows are views, nothing is copied."""
+        step = self.current_step
+        self.state: Dict[str, np.ndarray] = {
+            'load': self.load_values[step],
+            'solar_gen': self.solar_generation[step],
+            'tou_tariff': self.tariffs[step],
+            'battery_soc': self.soc,
+        }
+
+    def get_current_state(self) -> Dict[str, np.ndarray]:
+        """Returns the current state"""
+        return self.state
+
+    def balance_energy(self, actions) -> np.ndarray:
+        """
+        Use: Balance every site for the current step (same logic as Control.balance_energy) and add it to the aggregates.
+
+        Args:
+            actions (np.ndarray): purchase request per site (a scalar is used for all sites)
+
+        Returns:
+            np.ndarray: structured array (n_sites,) with the fields in batch.RESULT_KEYS.
+                Reused by the next call, copy it to keep it.
+        """
+        state = self.get_current_state()
+        result, self.soc = balance_energy_batch(
+            soc=self.soc,
+            energy_balance=state['solar_gen'] - state['load'],
+            purchase_request=np.broadcast_to(actions, (self.n_sites,)),
+            capacity=self.capacity,
+            C_rate=self.C_rate,
+            efficiency=self.efficiency,
+            soc_cuttoff=self.soc_cuttoff,
+            interval=self.time_interval,
+            out=self._result,
+        )
+        self.state['battery_soc'] = self.soc
+
+        purchased = result['to_purchase']
+        cost = purchased * state['tou_tariff']
+        unmet_demand = result['unmet_demand_this_step']
+        step = self.current_step
+        self.grid_import[step] = purchased.sum()
+        self.fleet_cost[step] = cost.sum()
+        self.fleet_unmet_demand[step] = unmet_demand.sum()
+        site_totals = (
+            self.site_import,
+            self.site_cost,
+            self.site_unmet_demand,
+        )
+        if step == self._balanced_step:
+            for totals, last in zip(site_totals, self._step_totals):
+                totals -= last
+        for totals, last, value in zip(
+            site_totals, self._step_totals, (purchased, cost, unmet_demand)
+        ):
+            totals += value
+            last[:] = value
+        self._balanced_step = step
+        return result
+
+    def get_peak_coincident_demand(self) -> Tuple[float, int]:
+        """
+        Returns:
+            Tuple[float, int]: (highest fleet grid import in one step as power, the step it happened at)
+        """
+        peak_step = int(np.argmax(self.grid_import))
+        return (
+            float(self.grid_import[peak_step] / self.time_interval),
+            peak_step,
+        )
+
+    def get_aggregates(self) -> Dict[str, float]:
+        """Fleet totals since the last reset."""
+        peak, peak_step = self.get_peak_coincident_demand()
+        return {
+            'grid_import': float(self.site_import.sum()),
+            'cost': float(self.site_cost.sum()),
+            'unmet_demand': float(self.site_unmet_demand.sum()),
+            'peak_coincident_demand': peak,
+            'peak_step': peak_step,
+        }
+
+    def get_site_totals(self) -> pd.DataFrame:
+        """Per site totals since the last reset, indexed by site name."""
+        return pd.DataFrame(
+            {
+                'grid_import': self.site_import,
+                'cost': self.site_cost,
+                'unmet_demand': self.site_unmet_demand,
+                'soc': self.soc,
+            },
+            index=pd.Index(self.site_names, name='site'),
+        )
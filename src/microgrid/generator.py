@@ -1,6 +1,16 @@
 from typing import Tuple
+import numpy as np
 import pandas as pd
 
+# Unmet demand (kWh) below this is float noise from the balance, the generator isn't started for it.
+DISPATCH_TOLERANCE: float = 1e-9
+
+
+class GeneratorError(Exception):
+    """Custom exception for the generator. Found in microgrid/generator.py"""
+
+    pass
+
 
 class Generator:
     def __init__(
@@ -8,21 +18,88 @@ class Generator:
         capacity: float = 500,
         cost_diesel: float = 20,
         litre_diesel_per_kWh: float = 0.3,
+        min_load: float = 0,
+        start_up_cost: float = 0,
+        fuel_curve: Tuple[tuple, tuple] = None,
     ):
+        """
+        Args:
+            capacity (float): rated power (kW)
+            cost_diesel (float): cost per litre
+            litre_diesel_per_kWh (float): fuel use at full load (and at every load if there is no fuel_curve)
+            min_load (float): lowest output when running, as a fraction of capacity.
+            start_up_cost (float): cost every time the generator starts.
+            fuel_curve (Tuple[tuple, tuple], optional): part-load curve, (load fractions, litres per kWh at that load).
+                e.g. ((0.25, 0.5, 0.75, 1), (0.45, 0.36, 0.32, 0.3)). Linear interpolation in between.
+        """
         # initialise the generators and characteristics.
         # This doesn't feel very smart. The idea was along the lines of wanting to have different generators with different sizes within this module but I'm not going to dive into that now.
         self.setup_generators(
             capacity=capacity,
             cost_diesel=cost_diesel,
             litre_diesel_per_kWh=litre_diesel_per_kWh,
+            min_load=min_load,
+            start_up_cost=start_up_cost,
+            fuel_curve=fuel_curve,
         )
+        # Is the generator on (a start up is charged when it turns on).
+        self.running: bool = False
 
     def setup_generators(
-        self, capacity: float, cost_diesel: float, litre_diesel_per_kWh: float
+        self,
+        capacity: float,
+        cost_diesel: float,
+        litre_diesel_per_kWh: float,
+        min_load: float = 0,
+        start_up_cost: float = 0,
+        fuel_curve: Tuple[tuple, tuple] = None,
     ) -> None:
         self.capacity = capacity
         self.cost_diesel = cost_diesel
         self.litre_diesel_per_kWh = litre_diesel_per_kWh
+        self.min_load = min_load
+        self.start_up_cost = start_up_cost
+        self.fuel_curve = fuel_curve
+        self.setup_cost_table()
+
+    def setup_cost_table(self) -> None:
+        """
+        Use: Precompute the fuel cost per hour against output power, so every cost is one np.interp lookup
+            (works the same on a single value or a whole array of outputs).
+        """
+        if self.fuel_curve is None:
+            fractions = np.array([0.0, 1.0])
+            litres_per_kWh = np.full(2, self.litre_diesel_per_kWh)
+        else:
+            fractions, litres_per_kWh = (
+                np.asarray(values, dtype=np.float64)
+                for values in self.fuel_curve
+            )
+            if (
+                len(fractions) != len(litres_per_kWh)
+                or len(fractions) < 2
+                or np.any(np.diff(fractions) <= 0)
+            ):
+                raise GeneratorError(
+                    "fuel_curve needs matching, increasing load fractions and litres per kWh (at least 2 points)."
+                )
+            # Anything below the first point uses the first point's consumption.
+            if fractions[0] > 0:
+                fractions = np.concatenate([[0.0], fractions])
+                litres_per_kWh = np.concatenate(
+                    [litres_per_kWh[:1], litres_per_kWh]
+                )
+
+        self.table_power: np.ndarray = fractions * self.capacity
+        self.table_cost: np.ndarray = (
+            self.table_power * litres_per_kWh * self.cost_diesel
+        )
+
+    def get_output(self, requested_power):
+        """Output for a request: at least min_load (when running) and at most capacity. Works on arrays."""
+        return np.clip(
+            requested_power, self.min_load * self.capacity, self.capacity
+        )
 
     def run_generators(
         self, requested_power: float, time_interval: float
@@ -39,15 +116,19 @@ class Generator:
         """
         # check if requested_power less than capacity
         if requested_power < self.capacity:
-            return (
-                requested_power,
-                self.calculate_generator_cost(requested_power, time_interval),
-            )
+            power = max(requested_power, self.min_load * self.capacity)
         else:
-            return (
-                self.capacity,
-                self.calculate_generator_cost(self.capacity, time_interval),
-            )
+            power = self.capacity
+
+        cost = self.calculate_generator_cost(power, time_interval)
+        if not self.running:
+            cost += self.start_up_cost
+            self.running = True
+        return power, cost
+
+    def stop(self) -> None:
+        """Turn off (the next run pays the start up cost again)."""
+        self.running = False
 
     def calculate_generator_cost(
         self, generated_power: float, time_interval: float
@@ -55,12 +136,61 @@ class Generator:
         """
         Calculates the cost associated with running the generators for this time period.
         Args:
-            generated_power (float): the amount of energy generated in kWh
+            generated_power (float or np.ndarray): output power (kW), the energy in kWh for an hourly interval
+            time_interval (float): hours the generator runs at generated_power
 
         Returns:
             float: cost of energy
         """
-        # should impliment a cost curve since it costs more to run them not at full power.
-        cost = generated_power * self.litre_diesel_per_kWh * self.cost_diesel
+        # Part-load fuel curve, looked up in the precomputed table.
+        cost = (
+            np.interp(generated_power, self.table_power, self.table_cost)
+            * time_interval
+        )
 
         return cost
+
+    def dispatch_batch(
+        self,
+        unmet_demand: np.ndarray,
+        time_interval: float,
+        was_running: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Use: Vectorised dispatch. The generator runs wherever there is unmet demand (energy) and is off otherwise,
+            a start up is charged where it wasn't running before.
+
+        Returns:
+            Tuple[np.ndarray, ...]: (generated energy, cost, excess energy, running) per entry.
+        """
+        unmet_demand = np.asarray(unmet_demand, dtype=np.float64)
+        on = unmet_demand > DISPATCH_TOLERANCE
+        power = np.where(
+            on, self.get_output(unmet_demand / time_interval), 0.0
+        )
+        generated = power * time_interval
+        cost = np.where(
+            on, self.calculate_generator_cost(power, time_interval), 0.0
+        )
+        cost += (on & ~was_running) * self.start_up_cost
+        excess = np.maximum(generated - unmet_demand, 0.0)
+        return generated, cost, excess, on
+
+    def dispatch_trace(
+        self, unmet_demand: np.ndarray, time_interval: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Use: dispatch_batch over a trace of steps (e.g. a rollout), starting from self.running. Doesn't change self.running.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (generated energy, cost, excess energy) per step.
+        """
+        on = np.asarray(unmet_demand) > DISPATCH_TOLERANCE
+        was_running = np.empty_like(on)
+        if len(on):
+            was_running[0] = self.running
+            was_running[1:] = on[:-1]
+        generated, cost, excess, _ = self.dispatch_batch(
+            unmet_demand, time_interval, was_running
+        )
+        return generated, cost, excess
@@ -1,8 +1,15 @@
 from datetime import time
 from os import error
 from typing import Tuple
+import numpy as np
 import pandas as pd
-from microgrid import INPUT_FILE
+from microgrid.profiles import (
+    load_profiles,
+    get_forecast_windows,
+    ProfileError,
+)
+from microgrid.tariff import Tariff
+from microgrid.timeindex import TimeIndex, get_time_index
 
 
 class GridError(Exception):
@@ -20,7 +27,24 @@ class Grid:
         take_off_power_rating: float = 1000,
         transformer_efficiencies: float = 1,
         input_file: str = "",
+        time_interval: float = None,
+        availability=None,
+        tariff: Tariff = None,
+        time_index: TimeIndex = None,
+        feed_in_tariff: float = 0.0,
+        demand_charge: float = 0.0,
     ):
+        """
+        Args:
+            input_file (str): tariff profile, None for no profile (streaming mode).
+            time_interval (float, optional): step length in hours the profile is resampled to.
+            availability (array like, optional): bool per step, False during loadshedding (see microgrid.loadshedding).
+                Defaults to the grid always being available.
+            tariff (Tariff, optional): rule based tariff used instead of the tou_tariff column (see microgrid.tariff).
+            time_index (TimeIndex, optional): dates of the steps for the tariff rules. Defaults to the index of the profiles.
+            feed_in_tariff (float): export credit per kWh, when there is no tariff with its own feed-in rates.
+            demand_charge (float): charge per kW of peak import per billing period, when there is no tariff.
+        """
 
         self.feed_in_voltage = feed_in_voltage
         self.feed_in_power_rating = feed_in_power_rating
@@ -28,10 +52,53 @@ class Grid:
         self.take_off_power_rating = take_off_power_rating
         self.transformer_efficiencies = transformer_efficiencies
 
-        self.tariffs: list = self.setup_tariff_structure(input_file=input_file)
+        # input_file=None: no tariff profile, the tariff is passed in with each purchase (streaming mode).
+        self.tariff = tariff
+        self.time_index = time_index
+        self.feed_in_tariff = feed_in_tariff
+        self.tariffs: np.ndarray = (
+            self.setup_tariff_structure(
+                input_file=input_file,
+                time_interval=time_interval,
+                tariff=tariff,
+                time_index=time_index,
+            )
+            if input_file is not None
+            else None
+        )
+        self.feed_in_tariffs: np.ndarray = self.setup_feed_in_tariffs()
+        self.demand_charge: float = demand_charge
+        self.demand_mask: np.ndarray = None
+        self.setup_demand_charge()
+        self.availability: np.ndarray = None
+        self.set_availability(availability)
+
+    def set_availability(self, availability=None) -> None:
+        """
+        Use: Set the outage schedule, a bool mask over the whole horizon (True = grid available).
+            None is always available. Checks during the run are a lookup in this mask.
+        """
+        if availability is None:
+            if self.tariffs is None:
+                # Streaming: nothing to look up, is_available is always True.
+                self.availability = None
+                return
+            availability = np.ones(len(self.tariffs), dtype=bool)
+        availability = np.asarray(availability, dtype=bool)
+        if self.tariffs is not None and len(availability) != len(self.tariffs):
+            raise GridError(
+                f"The availability mask has {len(availability)} steps, the tariffs have {len(self.tariffs)}"
+            )
+        self.availability = availability
+
+    def is_available(self, timestep: int) -> bool:
+        """Is the grid on at timestep (not loadshedding)."""
+        if self.availability is None:
+            return True
+        return bool(self.availability[timestep])
 
     def purchase_energy(
-        self, purchase_amount: float, timestep: int
+        self, purchase_amount: float, timestep: int, tariff: float = None
     ) -> Tuple[float, float]:
         """
         Use: Purchase energy from the grid.
@@ -39,58 +106,167 @@ class Grid:
         Args:
             purchase_amount (float): Amount of energy to be purchased
             timestep (int): Timestep that the energy was purchesed.
+            tariff (float, optional): tariff to use instead of the tariff profile at timestep.
         Returns:
             Tuple[float,float](purchased_energy, cost): Amount of energy purchased, the cost of energy.
         """
-        # Can impliment loadshedding logic here.
-        purchased_energy: float = purchase_amount
+        # Nothing can be bought during loadshedding.
+        purchased_energy: float = (
+            purchase_amount if self.is_available(timestep) else 0.0
+        )
 
-        cost: float = self.calculate_cost(purchased_energy, timestep)
+        cost: float = self.calculate_cost(purchased_energy, timestep, tariff)
 
         return purchased_energy, cost
 
-    def calculate_cost(self, purchased_energy: float, timestep: int) -> float:
-        cost: float = purchased_energy * self.get_current_tariff(timestep)
+    def calculate_cost(
+        self, purchased_energy: float, timestep: int, tariff: float = None
+    ) -> float:
+        if tariff is None:
+            tariff = self.get_current_tariff(timestep)
+        cost: float = purchased_energy * tariff
         return cost
 
-    def setup_tariff_structure(self, input_file) -> list:
-        # Might find a way of either setting rules and generating these or just reading from a list with timestamps and values.
-
-        if input_file != "":
-            try:
-                data = pd.read_csv(input_file)
-            except (FileNotFoundError, pd.error.ParserError) as e:
-                raise GridError(
-                    f"Could not reach grid input file: {input_file}: {e}"
-                )
-        else:
-            try:
-                data = pd.read_csv(INPUT_FILE)
-            except (FileNotFoundError, pd.error.ParserError) as e:
-                raise GridError(
-                    f"Please provide a valid input path for grid path."
-                )
-
-        tariffs = data["tou_tariff"].tolist()
+    def setup_tariff_structure(
+        self,
+        input_file,
+        time_interval: float = None,
+        tariff: Tariff = None,
+        time_index: TimeIndex = None,
+    ) -> np.ndarray:
+        """
+        Use: Tariff per step, from the tou_tariff column or, when a Tariff is given, generated from its rules
+            (see Tariff.build) for the dates of the profiles.
+        """
+        try:
+            profiles = load_profiles(input_file, time_interval)
+        except ProfileError as e:
+            raise GridError(f"Invalid grid input file: {input_file}: {e}")
+        except (FileNotFoundError, pd.errors.ParserError) as e:
+            raise GridError(
+                f"Could not reach grid input file: {input_file}: {e}"
+            )
+
+        if tariff is not None:
+            if time_index is None:
+                time_index = get_time_index(profiles)
+                self.time_index = time_index
+            return self._build_tariff(tariff, time_index, len(profiles))
+
+        if "tou_tariff" not in profiles:
+            raise GridError(
+                f"Missing required col 'tou_tariff' in input_file. Actual columns are: {profiles.get_column_names()}"
+            )
+
+        tariffs = profiles["tou_tariff"]
 
         return tariffs
 
+    def set_tariff(self, tariff: Tariff, time_index: TimeIndex) -> None:
+        """
+        Use: Swap in a rule based tariff, e.g. between the runs of a tariff sweep. The prices are cached
+            per rule set, so setting a tariff that was used before costs a dict lookup.
+        """
+        if self.tariffs is None:
+            raise GridError(
+                "A rule based tariff needs the profiles, it can't be set in streaming mode."
+            )
+        self.tariffs = self._build_tariff(
+            tariff, time_index, len(self.tariffs)
+        )
+        self.tariff = tariff
+        self.time_index = time_index
+        self.feed_in_tariffs = self.setup_feed_in_tariffs()
+        self.setup_demand_charge()
+
+    def setup_demand_charge(self) -> None:
+        """Demand charge rate and the steps the peak is measured in (None is every step), from the tariff if there is one."""
+        if self.tariff is None:
+            return
+        self.demand_charge = self.tariff.demand_charge
+        self.demand_mask = (
+            self.tariff.get_demand_mask(self.time_index)
+            if self.tariff.demand_periods is not None
+            else None
+        )
+
+    def setup_feed_in_tariffs(self) -> np.ndarray:
+        """Export credit per kWh per step, from the tariff rules or the flat feed_in_tariff (None in streaming mode)."""
+        if self.tariffs is None:
+            return None
+        if self.tariff is not None:
+            return self.tariff.build_feed_in(self.time_index)
+        feed_in_tariffs = np.full(
+            len(self.tariffs), float(self.feed_in_tariff)
+        )
+        feed_in_tariffs.flags.writeable = False
+        return feed_in_tariffs
+
+    def export_energy(
+        self, excess: float, timestep: int, interval: float = 1
+    ) -> Tuple[float, float]:
+        """
+        Use: Export excess energy, up to the feed in rating. Nothing is exported during loadshedding.
+            The export is credited when the episode is settled (see microgrid.settlement), not per step.
+
+        Args:
+            excess (float): energy left over after the battery (and generator).
+            timestep (int): step of the export.
+            interval (float): step length in hours.
+
+        Returns:
+            Tuple[float, float]: (exported, curtailed) energy.
+        """
+        if excess <= 0 or not self.is_available(timestep):
+            return 0.0, max(excess, 0.0)
+        exported = min(excess, self.feed_in_power_rating * interval)
+        return exported, excess - exported
+
+    def export_trace(
+        self, excess: np.ndarray, start_step: int = 0, interval: float = 1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """export_energy for a run of steps from start_step, vectorised (for rollouts)."""
+        excess = np.maximum(excess, 0.0)
+        exported = np.minimum(excess, self.feed_in_power_rating * interval)
+        if self.availability is not None:
+            available = self.availability[
+                start_step : start_step + len(excess)
+            ]
+            exported = np.where(available, exported, 0.0)
+        return exported, excess - exported
+
+    def _build_tariff(
+        self, tariff: Tariff, time_index: TimeIndex, n_steps: int
+    ) -> np.ndarray:
+        if time_index.n_steps != n_steps:
+            raise GridError(
+                f"The time index has {time_index.n_steps} steps, the profiles have {n_steps}"
+            )
+        return tariff.build(time_index)
+
     def get_current_tariff(self, timestep: int) -> float:
-        return self.tariffs[timestep]
+        return float(self.tariffs[timestep])
 
-    ##### To do #######
     def get_tariff_forecast(
-        self, current_step: int, forecast_length: int = 24
-    ):
-        # How is data going to be stored?
-        # is it going to have timestamps? I kinda like this as a way of making sure alles is doing the right thing across modules.
-        tariff_forecast = self.tariffs[
-            current_step : current_step + forecast_length
-        ]
+        self, current_step: int, forecast_length: int = 24, mode: str = "wrap"
+    ) -> np.ndarray:
+        """Tariff per kWh for the next forecast_length steps from current_step. mode is "wrap" or "edge" past the end."""
+        tariff_forecast = get_forecast_windows(
+            self.tariffs, forecast_length, mode
+        )[current_step]
         return tariff_forecast
 
-    def loadshedding_forecast(self):
-        pass
+    def loadshedding_forecast(
+        self, current_step: int, forecast_length: int = 24, mode: str = "wrap"
+    ) -> np.ndarray:
+        """Grid availability for the next forecast_length steps from current_step, False is loadshedding."""
+        if self.availability is None:
+            return np.ones(forecast_length, dtype=bool)
+        return get_forecast_windows(self.availability, forecast_length, mode)[
+            current_step
+        ]
+
+    ##### To do #######
 
     def transformer(self):
         pass
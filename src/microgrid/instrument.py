@@ -0,0 +1,288 @@
+import json
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Methods timed by default: (attribute path from the Control, method name).
+# The balance branches are called once per balance_energy, so their call counts are the branch hit counts.
+CONTROL_METHODS: Tuple[Tuple[str, str], ...] = (
+    ('', 'update_state'),
+    ('', 'balance_energy'),
+    ('', 'calculate_to_purchase'),
+    ('', 'positive_energy_balance'),
+    ('', 'artificial_positive_energy_balance'),
+    ('', 'negative_energy_balance'),
+    ('', 'balance_with_battery'),
+    ('battery', 'charge'),
+    ('battery', 'discharge'),
+)
+BRANCH_METHODS: Tuple[str, ...] = (
+    'positive_energy_balance',
+    'artificial_positive_energy_balance',
+    'negative_energy_balance',
+    'battery.charge',
+    'battery.discharge',
+)
+
+
+class InstrumentError(Exception):
+    """Custom exception for the hot path instrumentation. Found in microgrid/instrument.py"""
+
+    pass
+
+
+class LatencyHistogram:
+    """
+    HDR style latency histogram in fixed memory. Values (integer nanoseconds) go into log-linear buckets:
+    exact below 2**significant_bits, then 2**(significant_bits - 1) buckets per power of two, so every
+    bucket is within ~1/2**(significant_bits - 1) of its values. Values above max_value go in the top bucket.
+    """
+
+    def __init__(self, significant_bits: int = 5, max_value: int = 2**36):
+        """
+        Args:
+            significant_bits (int): resolution, 5 is ~3% relative error.
+            max_value (int): largest value (ns) that gets its own bucket, 2**36 ns is ~69 s.
+        """
+        if significant_bits < 2:
+            raise InstrumentError("significant_bits must be at least 2.")
+        self.significant_bits = significant_bits
+        self._sub_buckets = 1 << (significant_bits - 1)
+        self.max_value = max_value
+        self._top = self.get_index(max_value)
+        # A list of ints, one increment is cheaper than on a numpy array.
+        self.counts: List[int] = [0] * (self._top + 1)
+        self.total_count: int = 0
+        self.total: int = 0
+        self.min: int = None
+        self.max: int = 0
+
+    def get_index(self, value: int) -> int:
+        """Bucket of a value."""
+        shift = value.bit_length() - self.significant_bits
+        if shift <= 0:
+            return value
+        return (shift + 1) * self._sub_buckets + (
+            (value >> shift) - self._sub_buckets
+        )
+
+    def get_lower_bound(self, index: int) -> int:
+        """Smallest value in a bucket."""
+        if index < 2 * self._sub_buckets:
+            return index
+        shift = index // self._sub_buckets - 1
+        return (index % self._sub_buckets + self._sub_buckets) << shift
+
+    def get_upper_bound(self, index: int) -> int:
+        """Largest value in a bucket."""
+        return self.get_lower_bound(index + 1) - 1
+
+    def record(self, value: int) -> None:
+        if value < 0:
+            value = 0
+        index = self.get_index(value) if value <= self.max_value else self._top
+        self.counts[index] += 1
+        self.total_count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def reset(self) -> None:
+        self.counts = [0] * (self._top + 1)
+        self.total_count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.total_count if self.total_count else 0.0
+
+    def get_percentile(self, percentile: float) -> int:
+        """Upper bound of the bucket holding the percentile (0 -> 100), clamped to the largest value seen."""
+        if not self.total_count:
+            return 0
+        cumulative = np.cumsum(self.counts)
+        rank = max(int(np.ceil(percentile / 100 * self.total_count)), 1)
+        index = int(np.searchsorted(cumulative, rank))
+        if index == self._top:
+            # The top bucket also holds everything above max_value.
+            return self.max
+        return min(self.get_upper_bound(index), self.max)
+
+    def get_buckets(self) -> List[Tuple[int, int]]:
+        """(upper bound, count) of the non empty buckets."""
+        return [
+            (self.get_upper_bound(i), count)
+            for i, count in enumerate(self.counts)
+            if count
+        ]
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'count': self.total_count,
+            'mean_ns': self.mean,
+            'min_ns': self.min or 0,
+            'max_ns': self.max,
+            'p50_ns': self.get_percentile(50),
+            'p90_ns': self.get_percentile(90),
+            'p99_ns': self.get_percentile(99),
+            'p999_ns': self.get_percentile(99.9),
+        }
+
+
+class Instrumentation:
+    """
+    Per call latency histograms and hit counts for the Control hot path. attach() swaps the class of the
+    control (and its battery) for a subclass with timed methods and detach() puts the class back, so an
+    uninstrumented Control runs the plain methods with no overhead at all.
+
+        with Instrumentation(control) as instrumentation:
+            ... run the policy ...
+        print(instrumentation.to_prometheus())
+    """
+
+    def __init__(
+        self,
+        control=None,
+        methods: Tuple[Tuple[str, str], ...] = CONTROL_METHODS,
+        significant_bits: int = 5,
+    ):
+        """
+        Args:
+            control (Control, optional): attached straight away when given.
+            methods (Tuple[Tuple[str, str], ...]): (attribute path from the control, method name) to time.
+            significant_bits (int): histogram resolution, see LatencyHistogram.
+        """
+        self.methods = methods
+        self.histograms: Dict[str, LatencyHistogram] = {
+            self._get_name(path, name): LatencyHistogram(significant_bits)
+            for path, name in methods
+        }
+        self._attached: List[Tuple[object, type]] = []
+        if control is not None:
+            self.attach(control)
+
+    @staticmethod
+    def _get_name(path: str, name: str) -> str:
+        return f"{path}.{name}" if path else name
+
+    def attach(self, control) -> None:
+        """Time the methods of control (and its battery)."""
+        if self._attached:
+            raise InstrumentError("Already attached, detach() first.")
+        # Group the methods by the object they belong to.
+        targets: Dict[str, List[str]] = {}
+        for path, name in self.methods:
+            targets.setdefault(path, []).append(name)
+        for path, names in targets.items():
+            target = control
+            for attribute in filter(None, path.split('.')):
+                target = getattr(target, attribute)
+            cls = type(target)
+            if getattr(cls, '_instrumented', False):
+                self.detach()
+                raise InstrumentError(
+                    f"{path or 'control'} is already instrumented."
+                )
+            # Swap in a subclass with the timed methods, the instance __dict__ is never touched
+            # and detach() is just putting the class back.
+            wrapped = {
+                name: self._wrap(
+                    getattr(cls, name),
+                    self.histograms[self._get_name(path, name)],
+                )
+                for name in names
+            }
+            wrapped['_instrumented'] = True
+            target.__class__ = type(cls.__name__, (cls,), wrapped)
+            self._attached.append((target, cls))
+
+    def detach(self) -> None:
+        """Put the original classes back, the plain methods are used again."""
+        for target, cls in self._attached:
+            target.__class__ = cls
+        self._attached = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.detach()
+
+    @staticmethod
+    def _wrap(method, histogram: LatencyHistogram):
+        clock = time.perf_counter_ns
+        record = histogram.record
+
+        def timed(self, *args, **kwargs):
+            start = clock()
+            result = method(self, *args, **kwargs)
+            record(clock() - start)
+            return result
+
+        return timed
+
+    def reset(self) -> None:
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def get_branch_hits(self) -> Dict[str, int]:
+        """Calls per balance branch (and battery charge/discharge)."""
+        return {
+            name: self.histograms[name].total_count
+            for name in BRANCH_METHODS
+            if name in self.histograms
+        }
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'latency': {
+                name: histogram.to_dict()
+                for name, histogram in self.histograms.items()
+            },
+            'branch_hits': self.get_branch_hits(),
+        }
+
+    def to_json(self, path: str = None) -> str:
+        """The histogram summaries and branch hits as JSON, written to path when given."""
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def to_prometheus(self, prefix: str = "microgrid") -> str:
+        """Prometheus text exposition: a histogram (seconds) per method and a branch hit counter."""
+        lines = [
+            f"# HELP {prefix}_call_seconds Latency of the instrumented Control methods.",
+            f"# TYPE {prefix}_call_seconds histogram",
+        ]
+        for name, histogram in self.histograms.items():
+            label = f'method="{name}"'
+            cumulative = 0
+            for upper, count in histogram.get_buckets():
+                cumulative += count
+                lines.append(
+                    f'{prefix}_call_seconds_bucket{{{label},le="{upper / 1e9:.9g}"}} {cumulative}'
+                )
+            lines.append(
+                f'{prefix}_call_seconds_bucket{{{label},le="+Inf"}} {histogram.total_count}'
+            )
+            lines.append(
+                f"{prefix}_call_seconds_sum{{{label}}} {histogram.total / 1e9:.9g}"
+            )
+            lines.append(
+                f"{prefix}_call_seconds_count{{{label}}} {histogram.total_count}"
+            )
+        lines.append(
+            f"# HELP {prefix}_branch_hits_total Calls per balance branch."
+        )
+        lines.append(f"# TYPE {prefix}_branch_hits_total counter")
+        for name, hits in self.get_branch_hits().items():
+            lines.append(
+                f'{prefix}_branch_hits_total{{branch="{name}"}} {hits}'
+            )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,137 @@
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+
+# One column per metric, one row per timestep.
+LEDGER_KEYS: Tuple[str, ...] = (
+    'purchased',
+    'cost',
+    'charged',
+    'discharged',
+    'excess',
+    'unmet_demand',
+    'soc',
+    'generated',
+    'generator_cost',
+    'exported',
+    'curtailed',
+    'demand_charge',
+)
+LEDGER_DTYPE = np.dtype([(key, np.float64) for key in LEDGER_KEYS])
+
+
+class Ledger:
+    """
+    Episode accounting. A preallocated (n_steps, len(LEDGER_KEYS)) array that Control fills in place
+    each step, so long runs don't create a dict (or any other object) per step.
+    With wrap=True it only keeps the last n_steps rows (timestep % n_steps), for unbounded streaming runs.
+    """
+
+    def __init__(self, n_steps: int, wrap: bool = False):
+        self.n_steps = n_steps
+        self.wrap = wrap
+        self.data: np.ndarray = np.zeros((n_steps, len(LEDGER_KEYS)))
+        # Range of timesteps that have been written [start, end)
+        self.start: int = n_steps
+        self.end: int = 0
+
+    def record(
+        self,
+        timestep: int,
+        purchased: float,
+        cost: float,
+        charged: float,
+        discharged: float,
+        excess: float,
+        unmet_demand: float,
+        soc: float,
+        generated: float = 0.0,
+        generator_cost: float = 0.0,
+        exported: float = 0.0,
+        curtailed: float = 0.0,
+        demand_charge: float = 0.0,
+    ) -> None:
+        """Write the row for timestep (overwrites it if the step is balanced again)."""
+        row = timestep % self.n_steps if self.wrap else timestep
+        self.data[row] = (
+            purchased,
+            cost,
+            charged,
+            discharged,
+            excess,
+            unmet_demand,
+            soc,
+            generated,
+            generator_cost,
+            exported,
+            curtailed,
+            demand_charge,
+        )
+        if self.end <= self.start or timestep < self.start:
+            self.start = timestep
+        if timestep >= self.end:
+            self.end = timestep + 1
+        if self.wrap and self.end - self.start > self.n_steps:
+            # Older rows have been overwritten.
+            self.start = self.end - self.n_steps
+
+    def clear(self) -> None:
+        """Forget what has been recorded."""
+        if self.wrap:
+            self.data[:] = 0
+        elif self.end > self.start:
+            self.data[self.start : self.end] = 0
+        self.start = self.n_steps
+        self.end = 0
+
+    def get_snapshot(self, from_step: int) -> tuple:
+        """
+        Use: What restore needs to undo everything recorded from from_step on: the written range and a copy of
+            the rows from from_step to the end (usually none or one), not the whole array.
+        """
+        rows = self.data[from_step : self.end].copy()
+        return self.start, self.end, from_step, rows
+
+    def restore(self, snapshot: tuple) -> None:
+        """Put the ledger back to a snapshot from get_snapshot (rows before from_step are untouched)."""
+        start, end, from_step, rows = snapshot
+        if self.end > from_step:
+            self.data[from_step : self.end] = 0
+        self.data[from_step : from_step + len(rows)] = rows
+        self.start = start
+        self.end = end
+
+    def get_rows(self) -> np.ndarray:
+        """The recorded rows (a view, unless a wrapped ledger has gone round the end of its array)."""
+        if self.end <= self.start:
+            return self.data[:0]
+        if not self.wrap:
+            return self.data[self.start : self.end]
+        first, last = self.start % self.n_steps, self.end % self.n_steps
+        if first < last or last == 0:
+            return self.data[first : last or self.n_steps]
+        return np.concatenate([self.data[first:], self.data[:last]])
+
+    def to_records(self) -> np.ndarray:
+        """Recorded rows as a structured array with LEDGER_DTYPE (a view, no copy)."""
+        return self.get_rows().view(LEDGER_DTYPE).reshape(-1)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Recorded rows as a DataFrame indexed by timestep (wraps the array, no copy)."""
+        rows = self.get_rows()
+        start = min(self.start, self.end)
+        return pd.DataFrame(
+            rows,
+            columns=list(LEDGER_KEYS),
+            index=pd.RangeIndex(start, start + len(rows), name='timestep'),
+            copy=False,
+        )
+
+    def get_totals(self) -> Dict[str, float]:
+        """Sum of every column over the recorded rows (soc is the final soc)."""
+        rows = self.get_rows()
+        totals = dict(zip(LEDGER_KEYS, rows.sum(axis=0).tolist()))
+        totals['soc'] = (
+            float(rows[-1, LEDGER_KEYS.index('soc')]) if len(rows) else 0.0
+        )
+        return totals
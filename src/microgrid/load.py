@@ -1,6 +1,11 @@
 from typing import Tuple
+import numpy as np
 import pandas as pd
-from microgrid import INPUT_FILE
+from microgrid.profiles import (
+    load_profiles,
+    get_forecast_windows,
+    ProfileError,
+)
 
 
 class LoadError(Exception):
@@ -11,39 +16,39 @@ class LoadError(Exception):
 
 class Load:
 
-    def __init__(self, input_file: str = ""):
+    def __init__(self, input_file: str = "", time_interval: float = None):
         # Super keen to set up some aircon units that would get initialised here!!!
-        self.load_values = self.setup_loads(input_file)
+        self.load_values = self.setup_loads(input_file, time_interval)
 
     def get_current_load(self, timestep: int) -> float:
-        current_load: float = self.load_values[timestep]
+        current_load: float = float(self.load_values[timestep])
         return current_load
 
-    def setup_loads(self, input_file: str) -> list:
-        # I want to add timesteps to the data.
-        if input_file != "":
-            try:
-                df = pd.read_csv(input_file)
-            except (FileNotFoundError, pd.error.ParserError) as e:
-                raise LoadError(
-                    f"Failed to read input file {input_file} : {e}"
-                )
-        else:
-            try:
-                print("Using Test Load input file.")
-                df = pd.read_csv(INPUT_FILE)
-            except:
-                raise LoadError(
-                    "No input file provided for the electricity load data."
-                )
-
-        loads = df["load"].tolist()
+    def setup_loads(
+        self, input_file: str, time_interval: float = None
+    ) -> np.ndarray:
+        if input_file == "":
+            print("Using Test Load input file.")
+        try:
+            profiles = load_profiles(input_file, time_interval)
+        except (FileNotFoundError, pd.errors.ParserError, ProfileError) as e:
+            raise LoadError(f"Failed to read input file {input_file} : {e}")
+
+        if "load" not in profiles:
+            raise LoadError(
+                f"Missing required col 'load' in input_file. Actual columns are: {profiles.get_column_names()}"
+            )
+
+        # Kept for the timestamps of the data (see Control.time_index).
+        self.profiles = profiles
+        loads = profiles["load"]
         return loads
 
-    def get_load_forecast(self, current_step: int, forecast_length: int = 24):
-        # How is data going to be stored?
-        # is it going to have timestamps? I kinda like this as a way of making sure alles is doing the right thing across modules.
-        load_forecast = self.load_values[
-            current_step : current_step + forecast_length
-        ]
+    def get_load_forecast(
+        self, current_step: int, forecast_length: int = 24, mode: str = "wrap"
+    ) -> np.ndarray:
+        """Load for the next forecast_length steps from current_step, wrapping to the start of the year by default."""
+        load_forecast = get_forecast_windows(
+            self.load_values, forecast_length, mode
+        )[current_step]
         return load_forecast
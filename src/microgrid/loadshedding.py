@@ -0,0 +1,114 @@
+from pathlib import Path
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+# Eskom style schedule: the day is cut into 2 hour slots and the area is split into 16 blocks.
+# At stage s every block is off in s of every 16 slots, so stage s is s/16 of the time off.
+SLOT_HOURS: float = 2
+N_BLOCKS: int = 16
+MAX_STAGE: int = 8
+# Position of each slot in the rotation. A stride of 5 (coprime with 16) spreads a block's outages
+# over the cycle instead of running them back to back, and every outage at stage s is also one at stage s + 1.
+_SLOT_ORDER: np.ndarray = (np.arange(N_BLOCKS) * 5) % N_BLOCKS
+
+
+class LoadsheddingError(Exception):
+    """Custom exception for loadshedding schedules. Found in microgrid/loadshedding.py"""
+
+    pass
+
+
+def generate_availability(
+    n_steps: int,
+    stage,
+    block: int = 1,
+    time_interval: float = 1,
+    start_hour: float = 0,
+) -> np.ndarray:
+    """
+    Use: Grid availability mask for a stage schedule, built for the whole horizon in one go.
+
+    Args:
+        n_steps (int): steps in the horizon.
+        stage (int or array like): loadshedding stage (0 -> MAX_STAGE), one for the whole horizon or one per step.
+        block (int): the site's block (1 -> N_BLOCKS), it shifts the rotation.
+        time_interval (float): step length in hours.
+        start_hour (float): hours into the rotation of the first step.
+
+    Returns:
+        np.ndarray: bool (n_steps,), True where the grid is available.
+    """
+    stage = np.asarray(stage)
+    if np.any(stage < 0) or np.any(stage > MAX_STAGE):
+        raise LoadsheddingError(
+            f"Loadshedding stage must be between 0 and {MAX_STAGE}."
+        )
+    if not 1 <= block <= N_BLOCKS:
+        raise LoadsheddingError(
+            f"Block must be between 1 and {N_BLOCKS}, got {block}"
+        )
+    hours = start_hour + np.arange(n_steps) * time_interval
+    slots = (hours // SLOT_HOURS).astype(np.int64)
+    position = _SLOT_ORDER[(slots - (block - 1)) % N_BLOCKS]
+    return position >= stage
+
+
+def outage_availability(
+    outages, n_steps: int, time_interval: float = 1
+) -> np.ndarray:
+    """
+    Use: Grid availability mask from a list of outages.
+
+    Args:
+        outages (array like): (start_hour, end_hour) per outage, in hours from the first step. The end isn't included.
+        n_steps (int): steps in the horizon.
+        time_interval (float): step length in hours.
+
+    Returns:
+        np.ndarray: bool (n_steps,), True where the grid is available.
+    """
+    outages = np.asarray(outages, dtype=np.float64).reshape(-1, 2)
+    if np.any(outages[:, 1] < outages[:, 0]):
+        raise LoadsheddingError("Every outage has to end after it starts.")
+    # A step is out if it starts inside an outage. +1 at each start, -1 at each end, then a running sum.
+    starts = np.ceil(outages[:, 0] / time_interval - 1e-9).astype(np.int64)
+    ends = np.ceil(outages[:, 1] / time_interval - 1e-9).astype(np.int64)
+    change = np.zeros(n_steps + 1, dtype=np.int64)
+    np.add.at(change, np.clip(starts, 0, n_steps), 1)
+    np.add.at(change, np.clip(ends, 0, n_steps), -1)
+    return np.cumsum(change[:-1]) == 0
+
+
+def read_outages(
+    input_file: str, n_steps: int, time_interval: float = 1
+) -> np.ndarray:
+    """
+    Use: Grid availability mask from a csv of outages with start_hour and end_hour columns (see outage_availability).
+    """
+    try:
+        outages = pd.read_csv(Path(input_file))
+    except (FileNotFoundError, pd.errors.ParserError) as e:
+        raise LoadsheddingError(
+            f"Could not read outage file {input_file}: {e}"
+        )
+    missing = [col for col in ('start_hour', 'end_hour') if col not in outages]
+    if missing:
+        raise LoadsheddingError(
+            f"Missing required col(s) {missing} in {input_file}. Actual columns are: {list(outages.columns)}"
+        )
+    return outage_availability(
+        outages[['start_hour', 'end_hour']].to_numpy(),
+        n_steps,
+        time_interval,
+    )
+
+
+def get_outage_hours(
+    availability: np.ndarray, time_interval: float = 1
+) -> Tuple[float, int]:
+    """(hours without grid, number of outages) for an availability mask."""
+    availability = np.asarray(availability, dtype=bool)
+    out = ~availability
+    n_outages = int(np.count_nonzero(out[1:] & ~out[:-1]) + out[:1].sum())
+    return float(out.sum() * time_interval), n_outages
@@ -0,0 +1,67 @@
+import pandas as pd
+from microgrid.control import Control
+from microgrid.optimize import DispatchLP
+
+
+class MPCController:
+    """
+    Receding horizon (model predictive) dispatch. Every step it solves the dispatch LP over the forecast
+    and passes the first purchase to Control.balance_energy. Gives a baseline to compare RL policies against.
+    """
+
+    def __init__(
+        self,
+        control: Control,
+        horizon: int = 24,
+        unmet_demand_penalty: float = 100,
+        solver: str = "auto",
+    ):
+        """
+        Args:
+            control (Control): the microgrid to dispatch.
+            horizon (int): forecast length in steps.
+            unmet_demand_penalty (float): cost per unit of unmet demand in the LP.
+            solver (str): see DispatchLP.
+        """
+        self.control = control
+        self.horizon = horizon
+        # One LP for the life of the controller, only the forecasts and soc change between steps.
+        self.lp = DispatchLP(
+            n_steps=horizon,
+            efficiency=control.battery.efficiency,
+            unmet_demand_penalty=unmet_demand_penalty,
+            solver=solver,
+        )
+
+    def get_action(self) -> float:
+        """Purchase request for the current step."""
+        battery = self.control.battery
+        forecast = self.control.get_forecast(self.horizon)
+        solution = self.lp.solve(
+            load=forecast[:, 0],
+            solar_gen=forecast[:, 1],
+            tariffs=forecast[:, 2],
+            soc=battery.get_soc(),
+            capacity=battery.capacity,
+            C_rate=battery.C_rate,
+            soc_cuttoff=battery.soc_cuttoff,
+            interval=battery.interval,
+            max_purchase=self.control.grid.take_off_power_rating
+            * battery.interval,
+            available=self.control.get_loadshedding_forecast(self.horizon),
+        )
+        # Small negative values are solver tolerance.
+        return max(float(solution['grid'][0]), 0.0)
+
+    def run(self, n_steps: int) -> pd.DataFrame:
+        """
+        Use: Dispatch n_steps from the current step (the Control is left on the last step).
+
+        Returns:
+            pd.DataFrame: the Control's ledger for the run.
+        """
+        for i in range(n_steps):
+            self.control.balance_energy(action=self.get_action())
+            if i < n_steps - 1:
+                self.control.step()
+        return self.control.ledger.to_dataframe()
@@ -0,0 +1,283 @@
+from typing import Dict, Tuple
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+
+# highspy is optional. It keeps the HiGHS model between solves so it can warm start,
+# scipy's linprog (also HiGHS) rebuilds the model every call.
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+# Variable blocks of the dispatch LP, each one is n_steps long.
+#   grid: energy bought, charge: energy stored in the battery, discharge: energy delivered by the battery,
+#   excess: energy that can't be used, unmet: demand that isn't met, energy: energy in the battery at the end of the step.
+LP_VARIABLES: Tuple[str, ...] = (
+    'grid',
+    'charge',
+    'discharge',
+    'excess',
+    'unmet',
+    'energy',
+)
+
+
+class OptimizeError(Exception):
+    """Custom exception for the dispatch optimisers. Found in microgrid/optimize.py"""
+
+    pass
+
+
+def build_dispatch_matrix(
+    n_steps: int, efficiency: float
+) -> sparse.csc_matrix:
+    """
+    Use: Equality constraints of the dispatch LP, assembled in COO form with array ops (no loop over steps).
+        rows [0, n): energy balance   grid - charge/efficiency + discharge - excess + unmet = load - solar_gen
+        rows [n, 2n): battery energy  energy[t] - energy[t-1] - charge + discharge/efficiency = 0 (energy[-1] is the start energy)
+        The efficiencies match Battery.charge/discharge: charge is what ends up in the battery, discharge is what comes out.
+
+    Returns:
+        sparse.csc_matrix: (2 * n_steps, len(LP_VARIABLES) * n_steps)
+    """
+    steps = np.arange(n_steps)
+    grid, charge, discharge, excess, unmet, energy = (
+        steps + block * n_steps for block in range(len(LP_VARIABLES))
+    )
+    balance_rows = steps
+    energy_rows = steps + n_steps
+    ones = np.ones(n_steps)
+
+    rows = np.concatenate(
+        [np.tile(balance_rows, 5), np.tile(energy_rows, 3), energy_rows[1:]]
+    )
+    cols = np.concatenate(
+        [grid, charge, discharge, excess, unmet]
+        + [energy, charge, discharge, energy[:-1]]
+    )
+    values = np.concatenate(
+        [ones, -ones / efficiency, ones, -ones, ones]
+        + [ones, -ones, ones / efficiency, -ones[1:]]
+    )
+    return sparse.coo_matrix(
+        (values, (rows, cols)),
+        shape=(2 * n_steps, len(LP_VARIABLES) * n_steps),
+    ).tocsc()
+
+
+class DispatchLP:
+    """
+    Linear program for the cheapest dispatch of the battery and grid over n_steps with known profiles.
+    The constraint matrix is built once; each solve only changes the costs, right hand sides and bounds.
+    """
+
+    def __init__(
+        self,
+        n_steps: int,
+        efficiency: float,
+        unmet_demand_penalty: float = 100,
+        solver: str = "auto",
+    ):
+        """
+        Args:
+            n_steps (int): length of the horizon.
+            efficiency (float): battery charge/discharge efficiency.
+            unmet_demand_penalty (float): cost per unit of unmet demand.
+            solver (str): "auto" (highspy if installed, otherwise scipy), "highspy" or "scipy".
+        """
+        self.n_steps = n_steps
+        self.efficiency = efficiency
+        self.unmet_demand_penalty = unmet_demand_penalty
+        self.n_variables = len(LP_VARIABLES) * n_steps
+        self.A_eq = build_dispatch_matrix(n_steps, efficiency)
+
+        if solver == "auto":
+            solver = "highspy" if highspy is not None else "scipy"
+        if solver not in ("highspy", "scipy"):
+            raise OptimizeError(
+                f"Unknown solver {solver}, use 'auto', 'highspy' or 'scipy'."
+            )
+        if solver == "highspy" and highspy is None:
+            raise OptimizeError("The highspy solver needs highspy installed.")
+        self.solver = solver
+
+        self._highs = None
+        self._all_cols = np.arange(self.n_variables, dtype=np.int32)
+        self._all_rows = np.arange(2 * n_steps, dtype=np.int32)
+
+    def _setup_highs(self, cost, b_eq, lower, upper) -> None:
+        """Pass the model to HiGHS once. Later solves change it in place and warm start from the last basis."""
+        lp = highspy.HighsLp()
+        lp.num_col_ = self.n_variables
+        lp.num_row_ = 2 * self.n_steps
+        lp.col_cost_ = cost
+        lp.col_lower_ = lower
+        lp.col_upper_ = upper
+        lp.row_lower_ = b_eq
+        lp.row_upper_ = b_eq
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = self.A_eq.indptr
+        lp.a_matrix_.index_ = self.A_eq.indices
+        lp.a_matrix_.value_ = self.A_eq.data
+
+        self._highs = highspy.Highs()
+        self._highs.setOptionValue("output_flag", False)
+        self._highs.passModel(lp)
+
+    def _solve_highs(
+        self, cost, b_eq, lower, upper
+    ) -> Tuple[np.ndarray, float]:
+        if self._highs is None:
+            self._setup_highs(cost, b_eq, lower, upper)
+        else:
+            n_cols, n_rows = self.n_variables, 2 * self.n_steps
+            self._highs.changeColsCost(n_cols, self._all_cols, cost)
+            self._highs.changeColsBounds(n_cols, self._all_cols, lower, upper)
+            self._highs.changeRowsBounds(n_rows, self._all_rows, b_eq, b_eq)
+
+        self._highs.run()
+        status = self._highs.getModelStatus()
+        if status != highspy.HighsModelStatus.kOptimal:
+            raise OptimizeError(
+                f"Dispatch LP failed: {self._highs.modelStatusToString(status)}"
+            )
+        x = np.array(self._highs.getSolution().col_value)
+        return x, self._highs.getInfo().objective_function_value
+
+    def _solve_scipy(
+        self, cost, b_eq, lower, upper
+    ) -> Tuple[np.ndarray, float]:
+        upper = np.where(np.isinf(upper), None, upper)
+        result = linprog(
+            cost,
+            A_eq=self.A_eq,
+            b_eq=b_eq,
+            bounds=list(zip(lower, upper)),
+            method="highs",
+        )
+        if result.status != 0:
+            raise OptimizeError(f"Dispatch LP failed: {result.message}")
+        return result.x, result.fun
+
+    def solve(
+        self,
+        load: np.ndarray,
+        solar_gen: np.ndarray,
+        tariffs: np.ndarray,
+        soc: float,
+        capacity: float,
+        C_rate: float,
+        soc_cuttoff: float,
+        interval: float = 1,
+        max_purchase: float = np.inf,
+        available: np.ndarray = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Use: Cheapest dispatch for the given profiles and battery limits.
+
+        Args:
+            load, solar_gen, tariffs (np.ndarray): profiles over the horizon (n_steps long).
+            soc (float): battery soc at the start.
+            capacity, C_rate, soc_cuttoff, interval (float): Battery limits, same meaning as in Battery.
+            max_purchase (float): most energy that can be bought in one step.
+            available (np.ndarray, optional): grid availability per step, nothing can be bought where it is False
+                (loadshedding). Defaults to always available.
+
+        Returns:
+            Dict[str, np.ndarray]: one array per LP_VARIABLES entry, plus 'objective' (float).
+                'grid' is the purchase request to pass to Control.balance_energy.
+        """
+        n = self.n_steps
+        start_energy = soc * capacity
+        max_rate = C_rate * capacity * interval
+
+        cost = np.zeros(self.n_variables)
+        cost[:n] = tariffs
+        cost[4 * n : 5 * n] = self.unmet_demand_penalty
+
+        b_eq = np.zeros(2 * n)
+        b_eq[:n] = np.asarray(load) - np.asarray(solar_gen)
+        b_eq[n] = start_energy
+
+        # Don't make the LP infeasible if the battery starts below its cutoff.
+        min_energy = min(soc_cuttoff * capacity, start_energy)
+        lower = np.zeros(self.n_variables)
+        lower[5 * n :] = min_energy
+        max_grid = np.full(n, max_purchase)
+        if available is not None:
+            max_grid[~np.asarray(available, dtype=bool)] = 0.0
+        upper = np.concatenate(
+            [
+                max_grid,
+                np.full(n, max_rate),
+                np.full(n, max_rate * self.efficiency),
+                np.full(n, np.inf),
+                np.full(n, np.inf),
+                np.full(n, capacity),
+            ]
+        )
+
+        if self.solver == "highspy":
+            x, objective = self._solve_highs(cost, b_eq, lower, upper)
+        else:
+            x, objective = self._solve_scipy(cost, b_eq, lower, upper)
+
+        solution: Dict[str, np.ndarray] = {
+            name: x[i * n : (i + 1) * n] for i, name in enumerate(LP_VARIABLES)
+        }
+        solution['objective'] = objective
+        return solution
+
+
+def solve_perfect_foresight(
+    control,
+    n_steps: int = None,
+    unmet_demand_penalty: float = 100,
+    solver: str = "auto",
+) -> Dict[str, np.ndarray]:
+    """
+    Use: Optimal dispatch with full knowledge of the profiles, one LP over every step from control.current_step.
+        Gives the upper bound on the savings for a site. The actions can be replayed with control.rollout(actions)
+        to validate them against the simulator.
+
+    Args:
+        control (Control): the site (profiles, battery and grid limits). It isn't changed.
+        n_steps (int, optional): number of steps. Defaults to the rest of the profiles.
+        unmet_demand_penalty (float): cost per unit of unmet demand.
+        solver (str): see DispatchLP.
+
+    Returns:
+        Dict[str, np.ndarray]: the LP solution (see DispatchLP.solve) plus 'actions', the purchase request per step.
+    """
+    start = control.current_step
+    if n_steps is None:
+        n_steps = len(control.load.load_values) - start
+    end = start + n_steps
+    if n_steps < 1 or end > len(control.load.load_values):
+        raise OptimizeError(
+            f"Can't optimise {n_steps} steps from step {start}, the profiles are {len(control.load.load_values)} steps long."
+        )
+
+    battery = control.battery
+    lp = DispatchLP(
+        n_steps=n_steps,
+        efficiency=battery.efficiency,
+        unmet_demand_penalty=unmet_demand_penalty,
+        solver=solver,
+    )
+    solution = lp.solve(
+        load=control.load.load_values[start:end],
+        solar_gen=control.solar.solar_generation[start:end],
+        tariffs=control.grid.tariffs[start:end],
+        soc=battery.get_soc(),
+        capacity=battery.capacity,
+        C_rate=battery.C_rate,
+        soc_cuttoff=battery.soc_cuttoff,
+        interval=battery.interval,
+        max_purchase=control.grid.take_off_power_rating * battery.interval,
+        available=control.grid.availability[start:end],
+    )
+    # Solver tolerance can leave tiny negative purchases.
+    solution['actions'] = np.maximum(solution['grid'], 0.0)
+    return solution
@@ -0,0 +1,509 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+from microgrid import INPUT_FILE
+from microgrid.schema import (
+    PROFILE_SCHEMA,
+    Schema,
+    SchemaError,
+    check_cached,
+    clear_validation_cache,
+    hash_file,
+)
+
+
+class ProfileError(Exception):
+    """Custom exception for problems loading the input profiles. Found in microgrid/profiles.py"""
+
+    pass
+
+
+class Profiles:
+    """
+    Read-only columnar store of the input time series (load, solar_gen, tou_tariff, ...).
+    One column is one NumPy array, shared by every Solar, Load and Grid built from the same file.
+    """
+
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        source: str = "",
+        interval: float = 1,
+        timestamps: np.ndarray = None,
+        file_hash: str = None,
+        timestamps_utc: bool = False,
+    ):
+        self.source = source
+        # Length of one row in hours.
+        self.interval = interval
+        # Key of the file for the schema validation cache (see _get_file_key), None until a schema needs it.
+        self.file_hash = file_hash
+        # datetime64 per row when the file has a TIMESTAMP_COLUMN (kept out of the float columns).
+        if timestamps is not None:
+            timestamps = np.asarray(timestamps, dtype="datetime64[ns]")
+            timestamps.flags.writeable = False
+        self.timestamps: np.ndarray = timestamps
+        # True if the file had UTC offsets (the timestamps are UTC), otherwise they are local time.
+        self.timestamps_utc = timestamps_utc
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, values in columns.items():
+            values = np.ascontiguousarray(values, dtype=np.float64)
+            # The arrays are shared between components so nobody is allowed to write to them.
+            values.flags.writeable = False
+            self.columns[name] = values
+
+        self.n_steps: int = len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __len__(self) -> int:
+        return self.n_steps
+
+    def get_column_names(self) -> list:
+        return list(self.columns.keys())
+
+
+# Cache of parsed files. Keyed by (resolved path, modification time, time interval, resample method)
+# so an edited file gets re-read and each resampling is only done once.
+_PROFILE_CACHE: Dict[tuple, Profiles] = {}
+
+# Optional column of row timestamps. It isn't a profile, it is kept apart as datetime64.
+TIMESTAMP_COLUMN = "timestamp"
+# Rows of a csv without timestamps are hourly unless load_profiles is told otherwise.
+PROFILE_INTERVAL: float = 1
+# Columns that are energy per step (kWh). They are scaled with the step length when resampling,
+# everything else (tariffs, ...) is a rate that is held or averaged. Fleet columns ("<site>/load") go by their field.
+ENERGY_COLUMNS: Tuple[str, ...] = ("load", "solar_gen")
+FIELD_SEPARATOR = "/"
+# "interpolate": linear between step midpoints (wraps around the year). "hold": repeat each value.
+RESAMPLE_METHODS: Tuple[str, ...] = ("interpolate", "hold")
+
+# A bundle is a directory with one .npy file per column and this manifest (written last).
+BUNDLE_MANIFEST = "profiles.json"
+
+
+def convert_csv_to_bundle(
+    csv_file: str,
+    bundle_dir: str,
+    interval: float = None,
+    schema: Schema = PROFILE_SCHEMA,
+) -> Path:
+    """
+    Use: Convert an input csv to the binary bundle format. Each column becomes a float64 .npy file
+        that load_profiles memory maps, so processes share the pages instead of parsing their own copy.
+
+    Args:
+        csv_file (str): input csv, same schema as assets/data.csv
+        bundle_dir (str): directory to write the bundle to (created if needed)
+        interval (float, optional): length of one row of the csv in hours. Defaults to the spacing of the timestamps,
+            or PROFILE_INTERVAL when the csv has none.
+        schema (Schema, optional): rules the csv has to follow (see load_profiles), checked before anything
+            is written. None to skip.
+
+    Returns:
+        Path: the bundle directory
+
+    Raises:
+        ProfileError: the csv doesn't match the schema or has a column that isn't numeric.
+    """
+    df = pd.read_csv(csv_file)
+    timestamps, timestamps_utc = None, False
+    if TIMESTAMP_COLUMN in df:
+        timestamps, timestamps_utc = _parse_timestamps(
+            df.pop(TIMESTAMP_COLUMN)
+        )
+    interval = _get_interval(timestamps, interval)
+    columns = {name: df[name].to_numpy() for name in df.columns}
+    if schema is not None:
+        _check_schema(schema, None, columns, timestamps, interval, csv_file)
+    for name, values in columns.items():
+        try:
+            columns[name] = values.astype(np.float64)
+        except (ValueError, TypeError) as e:
+            raise ProfileError(
+                f"Col '{name}' of {csv_file} can't be converted to float: {e}"
+            )
+
+    bundle_dir = Path(bundle_dir)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    if timestamps is not None:
+        np.save(bundle_dir / f"{TIMESTAMP_COLUMN}.npy", timestamps)
+    for name, values in columns.items():
+        np.save(bundle_dir / f"{name}.npy", values)
+
+    manifest = {
+        "columns": list(df.columns),
+        "n_steps": len(df),
+        "interval": interval,
+        # "utc", "local" or None (no timestamps)
+        "timestamps": (
+            None
+            if timestamps is None
+            else "utc" if timestamps_utc else "local"
+        ),
+    }
+    (bundle_dir / BUNDLE_MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return bundle_dir
+
+
+def _read_bundle(
+    bundle_dir: Path,
+) -> Tuple[Dict[str, np.ndarray], float, np.ndarray, bool]:
+    """
+    Memory map every column of a bundle (read only, nothing is read until it is used).
+    Returns (columns, interval, timestamps, timestamps_utc)
+    """
+    try:
+        manifest = json.loads((bundle_dir / BUNDLE_MANIFEST).read_text())
+        columns = {
+            name: np.load(bundle_dir / f"{name}.npy", mmap_mode="r")
+            for name in manifest["columns"]
+        }
+        timestamps = (
+            np.load(bundle_dir / f"{TIMESTAMP_COLUMN}.npy", mmap_mode="r")
+            if manifest.get("timestamps")
+            else None
+        )
+        return (
+            columns,
+            manifest.get("interval", PROFILE_INTERVAL),
+            timestamps,
+            manifest.get("timestamps") == "utc",
+        )
+    except (KeyError, ValueError, OSError) as e:
+        raise ProfileError(f"Could not read profile bundle {bundle_dir}: {e}")
+
+
+def _get_modified_time(path: Path) -> int:
+    if path.is_dir():
+        return os.stat(path / BUNDLE_MANIFEST).st_mtime_ns
+    return os.stat(path).st_mtime_ns
+
+
+def _get_file_key(path: Path) -> str:
+    """
+    Key of a file for the schema validation cache. A csv is content hashed (it was just parsed anyway).
+    A bundle is keyed on its manifest and the size and modification time of every file, so the
+    memory mapped columns are never read just to find the key.
+    """
+    if not path.is_dir():
+        return hash_file(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update((path / BUNDLE_MANIFEST).read_bytes())
+    for file in sorted(path.iterdir()):
+        stat = os.stat(file)
+        digest.update(
+            f"{file.name}:{stat.st_size}:{stat.st_mtime_ns};".encode()
+        )
+    return digest.hexdigest()
+
+
+def resample_columns(
+    columns: Dict[str, np.ndarray],
+    source_interval: float,
+    time_interval: float,
+    method: str = "interpolate",
+) -> Dict[str, np.ndarray]:
+    """
+    Use: Resample profiles to a new step length in one vectorised pass per column.
+        Upsampling (e.g. hourly -> 15 min) interpolates or holds, downsampling sums the ENERGY_COLUMNS and averages the rest.
+        The ratio between the intervals must be a whole number.
+
+    Args:
+        columns (Dict[str, np.ndarray]): profiles with source_interval long steps.
+        source_interval (float): step length of the columns in hours.
+        time_interval (float): step length to resample to in hours.
+        method (str): how to upsample the energy columns, see RESAMPLE_METHODS. Rates are always held.
+
+    Returns:
+        Dict[str, np.ndarray]: the resampled columns.
+    """
+    if method not in RESAMPLE_METHODS:
+        raise ProfileError(
+            f"Unknown resample method {method}, expected one of {RESAMPLE_METHODS}"
+        )
+    if time_interval == source_interval:
+        return dict(columns)
+
+    upsample = time_interval < source_interval
+    ratio = (
+        source_interval / time_interval
+        if upsample
+        else time_interval / source_interval
+    )
+    factor = int(round(ratio))
+    if factor < 1 or not np.isclose(ratio, factor):
+        raise ProfileError(
+            f"Can't resample {source_interval} h steps to {time_interval} h, the ratio must be a whole number."
+        )
+
+    resampled: Dict[str, np.ndarray] = {}
+    for name, values in columns.items():
+        values = np.asarray(values, dtype=np.float64)
+        n_steps = len(values)
+        is_energy = name.rsplit(FIELD_SEPARATOR, 1)[-1] in ENERGY_COLUMNS
+
+        if not upsample:
+            if n_steps % factor:
+                raise ProfileError(
+                    f"Can't aggregate {n_steps} steps into groups of {factor}."
+                )
+            groups = values.reshape(-1, factor)
+            resampled[name] = (
+                groups.sum(axis=1) if is_energy else groups.mean(axis=1)
+            )
+        elif is_energy and method == "interpolate":
+            # Energy -> average power at the step midpoints, interpolate, back to energy per new step.
+            period = n_steps * source_interval
+            midpoints = (np.arange(n_steps) + 0.5) * source_interval
+            new_midpoints = (np.arange(n_steps * factor) + 0.5) * time_interval
+            power = values / source_interval
+            resampled[name] = (
+                np.interp(new_midpoints, midpoints, power, period=period)
+                * time_interval
+            )
+        elif is_energy:
+            resampled[name] = np.repeat(values / factor, factor)
+        else:
+            resampled[name] = np.repeat(values, factor)
+    return resampled
+
+
+def _parse_timestamps(values) -> Tuple[np.ndarray, bool]:
+    """Timestamps column -> (datetime64[ns], utc). Timestamps with an offset are converted to UTC."""
+    try:
+        timestamps = pd.to_datetime(values)
+    except (ValueError, TypeError) as e:
+        raise ProfileError(f"Could not parse the {TIMESTAMP_COLUMN} col: {e}")
+    utc = timestamps.dt.tz is not None
+    if utc:
+        timestamps = timestamps.dt.tz_convert(None)
+    return timestamps.to_numpy("datetime64[ns]"), utc
+
+
+def _get_interval(timestamps: np.ndarray, interval: float = None) -> float:
+    """Row length in hours: interval if given, else the spacing of the first two timestamps, else PROFILE_INTERVAL."""
+    if interval is not None:
+        return interval
+    if timestamps is None or len(timestamps) < 2:
+        return PROFILE_INTERVAL
+    # The schema checks that the rest of the rows are spaced the same.
+    interval = float((timestamps[1] - timestamps[0]) / np.timedelta64(1, "h"))
+    if interval <= 0:
+        raise ProfileError(
+            f"The {TIMESTAMP_COLUMN} col has to increase, the first two rows are {interval} h apart."
+        )
+    return interval
+
+
+def _read_profiles(
+    path: Path, schema: Schema = None, interval: float = None
+) -> Profiles:
+    timestamps, timestamps_utc = None, False
+    if path.is_dir():
+        columns, interval, timestamps, timestamps_utc = _read_bundle(path)
+    else:
+        df = pd.read_csv(path)
+        if TIMESTAMP_COLUMN in df:
+            timestamps, timestamps_utc = _parse_timestamps(
+                df.pop(TIMESTAMP_COLUMN)
+            )
+        columns = {name: df[name].to_numpy() for name in df.columns}
+        interval = _get_interval(timestamps, interval)
+
+    # Validate the raw columns, before they are converted to float. Without a schema the key isn't needed.
+    file_hash = None
+    if schema is not None:
+        file_hash = _get_file_key(path)
+        _check_schema(schema, file_hash, columns, timestamps, interval, path)
+    return Profiles(
+        columns,
+        source=str(path),
+        interval=interval,
+        timestamps=timestamps,
+        file_hash=file_hash,
+        timestamps_utc=timestamps_utc,
+    )
+
+
+def _check_schema(
+    schema: Schema, file_hash, columns, timestamps, interval, path
+) -> None:
+    try:
+        check_cached(
+            file_hash, schema, columns, timestamps, interval, source=str(path)
+        )
+    except SchemaError as e:
+        raise ProfileError(str(e))
+
+
+def load_profiles(
+    input_file: str = "",
+    time_interval: float = None,
+    method: str = "interpolate",
+    schema: Schema = PROFILE_SCHEMA,
+    interval: float = None,
+) -> Profiles:
+    """
+    Use: Load the input profiles, parsing the file at most once per process (per modification of the file).
+        The file is checked against the schema when it is parsed, the result is cached by the file key
+        (content hash of a csv, manifest and file stats of a bundle).
+
+    Args:
+        input_file (str): path to the input csv, or to a bundle directory (see convert_csv_to_bundle).
+            Defaults to microgrid.INPUT_FILE when empty.
+        time_interval (float, optional): step length in hours to resample to (see resample_columns).
+            Defaults to the interval of the file.
+        method (str): upsampling method, see RESAMPLE_METHODS.
+        schema (Schema, optional): rules the file has to follow, see microgrid.schema. None to skip.
+        interval (float, optional): row length of a csv in hours. Defaults to the spacing of its timestamps,
+            or PROFILE_INTERVAL when it has none. A bundle's interval comes from its manifest.
+
+    Returns:
+        Profiles: the shared columnar store for the file (and interval).
+
+    Raises:
+        FileNotFoundError, pd.errors.ParserError, ProfileError: passed through so each component can raise its own error.
+    """
+    path = Path(input_file) if input_file != "" else INPUT_FILE
+    path = path.resolve()
+    file_key = (str(path), _get_modified_time(path), interval)
+
+    profiles = _PROFILE_CACHE.get(file_key + (None, None))
+    if profiles is None:
+        profiles = _read_profiles(path, schema, interval)
+        # Drop stale entries for the same file so edited files don't pile up.
+        for old_key in [
+            k
+            for k in _PROFILE_CACHE
+            if k[0] == file_key[0] and k[1] != file_key[1]
+        ]:
+            del _PROFILE_CACHE[old_key]
+        _PROFILE_CACHE[file_key + (None, None)] = profiles
+    elif schema is not None:
+        # Parsed before, usually with the same schema (then this is a dict lookup).
+        if profiles.file_hash is None:
+            profiles.file_hash = _get_file_key(path)
+        _check_schema(
+            schema,
+            profiles.file_hash,
+            profiles.columns,
+            profiles.timestamps,
+            profiles.interval,
+            path,
+        )
+
+    if time_interval is None or time_interval == profiles.interval:
+        return profiles
+
+    key = file_key + (time_interval, method)
+    resampled = _PROFILE_CACHE.get(key)
+    if resampled is None:
+        columns = resample_columns(
+            profiles.columns, profiles.interval, time_interval, method
+        )
+        timestamps = None
+        if profiles.timestamps is not None:
+            n_steps = len(next(iter(columns.values())))
+            timestamps = profiles.timestamps[0] + (
+                np.arange(n_steps) * int(round(time_interval * 3600e9))
+            ).astype("timedelta64[ns]")
+        resampled = Profiles(
+            columns,
+            source=profiles.source,
+            interval=time_interval,
+            timestamps=timestamps,
+            file_hash=profiles.file_hash,
+            timestamps_utc=profiles.timestamps_utc,
+        )
+        _PROFILE_CACHE[key] = resampled
+    return resampled
+
+
+def clear_profile_cache() -> None:
+    """Forget every parsed file. Mostly useful for tests."""
+    _PROFILE_CACHE.clear()
+    _WINDOW_CACHE.clear()
+    clear_validation_cache()
+
+
+# How forecasts are filled in past the end of the profiles.
+# "wrap": the profiles are a typical year so carry on from the start. "edge": repeat the last value.
+FORECAST_MODES: Tuple[str, ...] = ("wrap", "edge")
+
+# Sliding window matrices, keyed by (ids of the columns, horizon, mode).
+# The columns are kept in the value so the ids can't be reused while the entry exists.
+_WINDOW_CACHE: Dict[tuple, Tuple[tuple, np.ndarray]] = {}
+_WINDOW_CACHE_SIZE = 32
+
+
+def get_forecast_windows(
+    columns, horizon: int = 24, mode: str = "wrap"
+) -> np.ndarray:
+    """
+    Use: Every forecast window of the columns as one read-only matrix, built once with stride tricks.
+        windows[t] is the forecast from timestep t, a view, so fetching a forecast allocates nothing.
+
+    Args:
+        columns (np.ndarray or tuple of np.ndarray): one profile, or several profiles of the same length.
+        horizon (int): forecast length in steps.
+        mode (str): how to fill past the end of the profiles, see FORECAST_MODES.
+
+    Returns:
+        np.ndarray: (T, horizon) for one profile or (T, horizon, features) for a tuple of profiles.
+    """
+    if mode not in FORECAST_MODES:
+        raise ProfileError(
+            f"Unknown forecast mode {mode}, expected one of {FORECAST_MODES}"
+        )
+    if horizon < 1:
+        raise ProfileError(
+            f"Forecast horizon must be at least 1, got {horizon}"
+        )
+
+    stacked = isinstance(columns, tuple)
+    columns = columns if stacked else (columns,)
+    key = (tuple(id(column) for column in columns), horizon, mode)
+    cached = _WINDOW_CACHE.get(key)
+    if cached is not None:
+        return cached[1]
+
+    n_steps = len(columns[0])
+    steps = np.arange(n_steps + horizon - 1)
+    if mode == "wrap":
+        steps = steps % n_steps
+    else:
+        steps = np.minimum(steps, n_steps - 1)
+    # (T + horizon - 1, features), the only copy that is made.
+    extended = np.column_stack(columns)[steps]
+
+    # (T, features, horizon) -> (T, horizon, features), both views of extended.
+    windows = np.lib.stride_tricks.sliding_window_view(
+        extended, horizon, axis=0
+    ).transpose(0, 2, 1)
+    if not stacked:
+        windows = windows[:, :, 0]
+    windows.flags.writeable = False
+
+    if len(_WINDOW_CACHE) >= _WINDOW_CACHE_SIZE:
+        del _WINDOW_CACHE[next(iter(_WINDOW_CACHE))]
+    _WINDOW_CACHE[key] = (columns, windows)
+    return windows
+
+
+if __name__ == "__main__":
+    # python -m microgrid.profiles <input.csv> <bundle_dir>
+    if len(sys.argv) != 3:
+        sys.exit(
+            "Usage: python -m microgrid.profiles <input.csv> <bundle_dir>"
+        )
+    print(f"Wrote {convert_csv_to_bundle(sys.argv[1], sys.argv[2])}")
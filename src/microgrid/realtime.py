@@ -0,0 +1,250 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Tuple
+from microgrid.control import Control
+from microgrid.stream import QueueSource
+
+# What to do with an output record when the output queue is full.
+#   "block": wait for the sink (the tick takes longer), "drop": throw the record away and count it.
+BACKPRESSURE_POLICIES: Tuple[str, ...] = ("block", "drop")
+
+
+class RealtimeError(Exception):
+    """Custom exception for the real-time runner. Found in microgrid/realtime.py"""
+
+    pass
+
+
+class TickMetrics:
+    """Counters for the real-time loop. Times are in seconds."""
+
+    def __init__(self):
+        self.ticks: int = 0
+        # Ticks that finished after their deadline.
+        self.missed_deadlines: int = 0
+        # Ticks with no meter read before the deadline (the last read was used again).
+        self.missed_inputs: int = 0
+        # Meter reads that were replaced by a newer one before they were used.
+        self.dropped_inputs: int = 0
+        # Output records thrown away by the "drop" backpressure policy.
+        self.dropped_records: int = 0
+        # Output records the sink raised on (the record is lost, the loop carries on).
+        self.sink_errors: int = 0
+        # Jitter: how late each tick started compared to its schedule.
+        self.jitter_total: float = 0.0
+        self.jitter_max: float = 0.0
+        # Time from the scheduled start to the end of the tick.
+        self.tick_time_max: float = 0.0
+
+    def record_tick(
+        self, jitter: float, tick_time: float, missed: bool
+    ) -> None:
+        self.ticks += 1
+        self.jitter_total += jitter
+        if jitter > self.jitter_max:
+            self.jitter_max = jitter
+        if tick_time > self.tick_time_max:
+            self.tick_time_max = tick_time
+        if missed:
+            self.missed_deadlines += 1
+
+    @property
+    def jitter_mean(self) -> float:
+        return self.jitter_total / self.ticks if self.ticks else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'ticks': self.ticks,
+            'missed_deadlines': self.missed_deadlines,
+            'missed_inputs': self.missed_inputs,
+            'dropped_inputs': self.dropped_inputs,
+            'dropped_records': self.dropped_records,
+            'sink_errors': self.sink_errors,
+            'jitter_mean': self.jitter_mean,
+            'jitter_max': self.jitter_max,
+            'tick_time_max': self.tick_time_max,
+        }
+
+
+class RealtimeRunner:
+    """
+    Soft real-time loop around a streaming Control (Control(source=QueueSource(...))).
+    Every tick it takes the newest meter read and tariff from asyncio queues, steps the Control,
+    balances it with the policy's action and hands a record to a bounded output queue. A sink task
+    writes the records out so slow logging never blocks the dispatch (unless backpressure="block").
+    """
+
+    def __init__(
+        self,
+        control: Control,
+        policy: Callable[[Control], float],
+        tick_interval: float = 1.0,
+        deadline: float = None,
+        sink: Callable[[dict], Awaitable[None]] = None,
+        output_maxsize: int = 1024,
+        backpressure: str = "block",
+        input_timeout: float = None,
+    ):
+        """
+        Args:
+            control (Control): in streaming mode with a QueueSource. The first tick balances the sample it was built with.
+            policy (Callable[[Control], float]): returns the purchase request for the current state.
+            tick_interval (float): seconds between ticks.
+            deadline (float, optional): seconds after the scheduled start that a tick must finish by. Defaults to tick_interval.
+            sink (async Callable[[dict], None], optional): called with every output record. Without a sink
+                the records stay in runner.output for the caller to consume.
+            output_maxsize (int): size of the output queue.
+            backpressure (str): see BACKPRESSURE_POLICIES.
+            input_timeout (float, optional): seconds after the scheduled start to wait for a meter read before the
+                last read is used again. Must be shorter than the deadline so a late read still leaves time to dispatch.
+                Defaults to half the deadline.
+        """
+        if not isinstance(control.source, QueueSource):
+            raise RealtimeError(
+                "RealtimeRunner needs a Control in streaming mode with a QueueSource."
+            )
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise RealtimeError(
+                f"Unknown backpressure policy {backpressure}, expected one of {BACKPRESSURE_POLICIES}"
+            )
+        self.control = control
+        self.policy = policy
+        self.tick_interval = tick_interval
+        self.deadline = deadline if deadline is not None else tick_interval
+        self.input_timeout = (
+            input_timeout if input_timeout is not None else self.deadline / 2
+        )
+        if not 0 <= self.input_timeout < self.deadline:
+            raise RealtimeError(
+                f"input_timeout ({self.input_timeout}) must be between 0 and the deadline ({self.deadline})"
+            )
+        self.sink = sink
+        self.backpressure = backpressure
+
+        # Inputs: meter reads (load, solar_gen) and tariff updates.
+        self.meter: asyncio.Queue = asyncio.Queue()
+        self.tariffs: asyncio.Queue = asyncio.Queue()
+        self.output: asyncio.Queue = asyncio.Queue(maxsize=output_maxsize)
+
+        self.metrics = TickMetrics()
+        state = control.get_current_state()
+        self._last_read: Tuple[float, float] = (
+            state['load'],
+            state['solar_gen'],
+        )
+        self._tariff: float = state['tou_tariff']
+        self._first_tick = True
+        self._stopped = False
+        # The last exception raised by the sink (see TickMetrics.sink_errors).
+        self.sink_error: Exception = None
+
+    def stop(self) -> None:
+        """Finish the current tick and return from run()."""
+        self._stopped = True
+
+    async def _next_read(self, timeout: float) -> Tuple[float, float]:
+        """The newest meter read, waiting up to timeout for one. Falls back to the last read."""
+        try:
+            read = await asyncio.wait_for(self.meter.get(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            self.metrics.missed_inputs += 1
+            return self._last_read
+        while not self.meter.empty():
+            read = self.meter.get_nowait()
+            self.metrics.dropped_inputs += 1
+        if isinstance(read, dict):
+            read = (read['load'], read['solar_gen'])
+        self._last_read = (float(read[0]), float(read[1]))
+        return self._last_read
+
+    async def _emit(self, record: dict) -> None:
+        if self.backpressure == "block":
+            await self.output.put(record)
+            return
+        try:
+            self.output.put_nowait(record)
+        except asyncio.QueueFull:
+            self.metrics.dropped_records += 1
+
+    async def _write_output(self) -> None:
+        while True:
+            record = await self.output.get()
+            if record is None:
+                return
+            try:
+                await self.sink(record)
+            except Exception as e:
+                # A failing sink must not stop the writer, a "block" loop would hang on the full queue.
+                self.metrics.sink_errors += 1
+                self.sink_error = e
+
+    async def _tick(self, scheduled: float) -> dict:
+        loop = asyncio.get_running_loop()
+        control = self.control
+        while not self.tariffs.empty():
+            self._tariff = float(self.tariffs.get_nowait())
+
+        if self._first_tick:
+            self._first_tick = False
+        else:
+            load, solar_gen = await self._next_read(
+                scheduled + self.input_timeout - loop.time()
+            )
+            control.source.put((load, solar_gen, self._tariff))
+            control.step()
+
+        action = self.policy(control)
+        result = control.balance_energy(action=action)
+        return {
+            'step': control.current_step,
+            'action': action,
+            **result,
+            'battery_soc': control.battery.get_soc(),
+        }
+
+    async def run(self, n_ticks: int = None) -> TickMetrics:
+        """
+        Use: Run ticks every tick_interval seconds until stop() is called or n_ticks have run.
+
+        Returns:
+            TickMetrics: the loop metrics (also runner.metrics).
+        """
+        loop = asyncio.get_running_loop()
+        writer = (
+            asyncio.create_task(self._write_output())
+            if self.sink is not None
+            else None
+        )
+        self._stopped = False
+        next_tick = loop.time()
+        ticks = 0
+        try:
+            while not self._stopped and (n_ticks is None or ticks < n_ticks):
+                delay = next_tick - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                started = loop.time()
+                deadline = next_tick + self.deadline
+                if writer is not None and writer.done():
+                    # Only ends early if it was cancelled or broke outside the sink call.
+                    raise RealtimeError(
+                        "The output writer stopped, records can't be written."
+                    ) from (None if writer.cancelled() else writer.exception())
+
+                record = await self._tick(next_tick)
+                record['time'] = started
+                await self._emit(record)
+
+                finished = loop.time()
+                self.metrics.record_tick(
+                    jitter=started - next_tick,
+                    tick_time=finished - next_tick,
+                    missed=finished > deadline,
+                )
+                ticks += 1
+                next_tick += self.tick_interval
+        finally:
+            if writer is not None and not writer.done():
+                # Let the sink finish what is queued.
+                await self.output.put(None)
+                await writer
+        return self.metrics
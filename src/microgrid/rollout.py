@@ -0,0 +1,271 @@
+from typing import Dict, Tuple
+import numpy as np
+
+# numba is optional, the pure Python kernel is used when it isn't installed.
+try:
+    from numba import njit
+    from numba.extending import register_jitable
+except ImportError:
+    njit = None
+
+    def register_jitable(fn):
+        return fn
+
+
+# Columns of the array returned by the rollout kernel.
+ROLLOUT_KEYS: Tuple[str, ...] = (
+    'to_purchase',
+    'charged',
+    'discharged',
+    'excess',
+    'unmet_demand',
+    'soc',
+    'cost',
+)
+
+
+class RolloutError(Exception):
+    """Custom exception for the rollout fast-path. Found in microgrid/rollout.py"""
+
+    pass
+
+
+@register_jitable
+def _split(a):
+    # Veltkamp split of a float into two halves of 26 bits, their products are exact.
+    c = 134217729.0 * a
+    high = c - (c - a)
+    return high, a - high
+
+
+@register_jitable
+def round_digits(x, digits):
+    """
+    Use: round(x, digits) exactly as CPython rounds a float (half to even on the exact binary value), in
+        Python and in numba. numba's own round scales and rounds in floating point, so it is off by an
+        ulp for some values, which is enough for the kernel to drift from the step loop.
+        Needs abs(x) * 10**digits below 2**52 (fine for soc).
+    """
+    scale = 10.0**digits
+    scaled = x * scale
+    # Dekker's product: error is what the multiplication rounded off, scaled + error is x * scale exactly.
+    x_high, x_low = _split(x)
+    scale_high, scale_low = _split(scale)
+    error = (
+        (x_high * scale_high - scaled)
+        + x_high * scale_low
+        + x_low * scale_high
+    ) + x_low * scale_low
+    rounded = float(round(scaled))
+    # round broke a tie (to even) of the rounded product, the exact product may not be a tie.
+    if scaled - rounded == 0.5 and error > 0:
+        rounded += 1.0
+    elif scaled - rounded == -0.5 and error < 0:
+        rounded -= 1.0
+    # Both are exact integers, so the division is the float nearest the decimal, like float(str).
+    return rounded / scale
+
+
+def _rollout_kernel(
+    load,
+    solar_gen,
+    tariffs,
+    available,
+    actions,
+    start_step,
+    soc,
+    capacity,
+    C_rate,
+    efficiency,
+    soc_cuttoff,
+    interval,
+    out,
+):
+    """
+    Use: Runs Control.balance_energy + Control.step for every action, one tight loop with plain floats.
+        Written so that the same source runs as Python (lists) or compiled by numba (arrays).
+        Every expression mirrors the order of operations in Control/Battery so the results match exactly
+        (round_digits stands in for round, which numba doesn't round the same way).
+
+    Args:
+        load, solar_gen, tariffs: full profiles (indexable by timestep)
+        available: grid availability per timestep (False is loadshedding)
+        actions: purchase request per step
+        start_step (int): timestep of the first action
+        soc (float): battery soc before the first action
+        capacity, C_rate, efficiency, soc_cuttoff, interval (float): battery parameters
+        out: (n, len(ROLLOUT_KEYS)) rows to write the results into
+
+    Returns:
+        float: soc after the last action
+    """
+    max_charge_rate = C_rate * capacity * interval
+    for i in range(len(actions)):
+        timestep = start_step + i
+        purchase_request = actions[i]
+        energy_balance = solar_gen[timestep] - load[timestep]
+
+        # Battery.get_charge_capacity / get_discharge_capacity
+        charge_capacity = min(max_charge_rate, capacity - capacity * soc)
+        discharge_capacity = min(
+            max_charge_rate, capacity * round_digits(soc - soc_cuttoff, 6)
+        )
+
+        # Control.calculate_to_purchase
+        if energy_balance > 0:
+            usable_charge = charge_capacity / efficiency
+            if usable_charge - energy_balance > 0:
+                to_purchase = min(
+                    purchase_request, usable_charge - energy_balance
+                )
+            else:
+                to_purchase = 0.0
+        elif energy_balance + purchase_request > 0:
+            to_purchase = min(
+                -energy_balance + charge_capacity, purchase_request
+            )
+        else:
+            usable_discharge = discharge_capacity * efficiency
+            if usable_discharge > abs(energy_balance + purchase_request):
+                to_discharge = abs(energy_balance + purchase_request)
+            else:
+                to_discharge = usable_discharge
+            to_purchase = purchase_request + abs(
+                energy_balance + purchase_request + to_discharge
+            )
+        # No purchase during loadshedding.
+        if not available[timestep]:
+            to_purchase = 0.0
+
+        # Control.balance_with_battery
+        energy_balance_with_grid = energy_balance + to_purchase
+        charged = 0.0
+        discharged = 0.0
+        excess = 0.0
+        unmet_demand = 0.0
+        if energy_balance_with_grid > 0:
+            max_charge_energy = charge_capacity / efficiency
+            if energy_balance_with_grid < max_charge_energy:
+                charged = energy_balance_with_grid * efficiency
+            else:
+                charged = max_charge_energy * efficiency
+                excess = energy_balance_with_grid - max_charge_energy
+            soc = round_digits(soc + charged / capacity, 12)
+        else:
+            discharge_energy = abs(energy_balance_with_grid)
+            max_discharge_energy = discharge_capacity * efficiency
+            if discharge_energy < max_discharge_energy:
+                discharged = discharge_energy
+            else:
+                discharged = max_discharge_energy
+                unmet_demand = discharge_energy - max_discharge_energy
+            soc = round_digits(soc + -discharged / efficiency / capacity, 12)
+
+        row = out[i]
+        row[0] = to_purchase
+        row[1] = charged
+        row[2] = discharged
+        row[3] = excess
+        row[4] = unmet_demand
+        row[5] = soc
+        # Grid.calculate_cost
+        row[6] = to_purchase * tariffs[timestep]
+
+    return soc
+
+
+_numba_kernel = None
+
+
+def _get_numba_kernel():
+    """Compile the kernel on first use (cached on disk by numba)."""
+    global _numba_kernel
+    if _numba_kernel is None:
+        _numba_kernel = njit(cache=True)(_rollout_kernel)
+    return _numba_kernel
+
+
+def run_rollout(
+    load: np.ndarray,
+    solar_gen: np.ndarray,
+    tariffs: np.ndarray,
+    actions: np.ndarray,
+    start_step: int,
+    soc: float,
+    capacity: float,
+    C_rate: float,
+    efficiency: float,
+    soc_cuttoff: float,
+    interval: float,
+    backend: str = "auto",
+    available: np.ndarray = None,
+) -> Tuple[np.ndarray, float]:
+    """
+    Use: Evaluate a fixed action sequence from start_step. Picks numba when it is installed ("auto").
+
+    Args:
+        backend (str): "auto", "numba" or "python"
+        available (np.ndarray, optional): grid availability mask per timestep. Defaults to always available.
+
+    Returns:
+        Tuple[np.ndarray, float]: ((n, len(ROLLOUT_KEYS)) results, final soc)
+    """
+    actions = np.asarray(actions, dtype=np.float64)
+    if actions.ndim != 1:
+        raise RolloutError(f"actions must be 1D, got shape {actions.shape}")
+    if start_step < 0 or start_step + len(actions) > len(load):
+        raise RolloutError(
+            f"{len(actions)} actions from step {start_step} run past the end of the profiles ({len(load)} steps)"
+        )
+
+    if backend == "auto":
+        backend = "numba" if njit is not None else "python"
+    if available is None:
+        available = np.ones(len(load), dtype=np.bool_)
+
+    args = (
+        start_step,
+        float(soc),
+        float(capacity),
+        float(C_rate),
+        float(efficiency),
+        float(soc_cuttoff),
+        float(interval),
+    )
+    if backend == "numba":
+        if njit is None:
+            raise RolloutError("The numba backend needs numba installed.")
+        out = np.empty((len(actions), len(ROLLOUT_KEYS)))
+        final_soc = _get_numba_kernel()(
+            np.asarray(load, dtype=np.float64),
+            np.asarray(solar_gen, dtype=np.float64),
+            np.asarray(tariffs, dtype=np.float64),
+            np.asarray(available, dtype=np.bool_),
+            actions,
+            *args,
+            out,
+        )
+    elif backend == "python":
+        # Lists of Python floats are much quicker to index one at a time than arrays.
+        rows = [[0.0] * len(ROLLOUT_KEYS) for _ in range(len(actions))]
+        final_soc = _rollout_kernel(
+            load.tolist(),
+            solar_gen.tolist(),
+            tariffs.tolist(),
+            np.asarray(available, dtype=bool).tolist(),
+            actions.tolist(),
+            *args,
+            rows,
+        )
+        out = np.array(rows, dtype=np.float64).reshape(-1, len(ROLLOUT_KEYS))
+    else:
+        raise RolloutError(
+            f"Unknown backend {backend}, use 'auto', 'numba' or 'python'."
+        )
+
+    return out, final_soc
+
+
+def rollout_columns(out: np.ndarray) -> Dict[str, np.ndarray]:
+    """Name the columns of the rollout array (views, no copies)."""
+    return {key: out[:, i] for i, key in enumerate(ROLLOUT_KEYS)}
@@ -0,0 +1,250 @@
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+
+
+class SchemaError(Exception):
+    """Custom exception for input files that don't match their schema. Found in microgrid/schema.py"""
+
+    pass
+
+
+class Column:
+    """One rule set of a Schema. Also applies to the site columns of a fleet file ("<site>/<name>")."""
+
+    def __init__(
+        self,
+        name: str,
+        required: bool = True,
+        allow_nan: bool = False,
+        min_value: float = None,
+        max_value: float = None,
+    ):
+        """
+        Args:
+            name (str): column (or field of the site columns).
+            required (bool): the file needs at least one column with this name.
+            allow_nan (bool): NaN values are allowed.
+            min_value, max_value (float, optional): allowed range (inclusive).
+        """
+        self.name = name
+        self.required = required
+        self.allow_nan = allow_nan
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def get_key(self) -> tuple:
+        return (
+            self.name,
+            self.required,
+            self.allow_nan,
+            self.min_value,
+            self.max_value,
+        )
+
+
+class Schema:
+    """
+    Declarative schema for the input profiles. check() runs every rule as a vectorised NumPy reduction
+    (one pass per column), collects every problem and raises them together.
+    """
+
+    def __init__(
+        self,
+        columns: Tuple[Column, ...],
+        n_steps: int = None,
+        check_timestamps: bool = True,
+        separator: str = "/",
+    ):
+        """
+        Args:
+            columns (Tuple[Column, ...]): column rules. Columns without a rule must still be numeric.
+            n_steps (int, optional): exact number of rows.
+            check_timestamps (bool): timestamps (when the file has them) must increase by exactly one interval per row.
+            separator (str): between the site and field in fleet column names.
+        """
+        self.columns = tuple(columns)
+        self.n_steps = n_steps
+        self.check_timestamps = check_timestamps
+        self.separator = separator
+        # Everything the result of a check depends on, for the validation cache.
+        self.key: tuple = (
+            tuple(column.get_key() for column in self.columns),
+            n_steps,
+            check_timestamps,
+            separator,
+        )
+
+    def _get_rule(self, name: str) -> Column:
+        field = name.rsplit(self.separator, 1)[-1]
+        for column in self.columns:
+            if column.name == field:
+                return column
+        return None
+
+    def validate(
+        self,
+        columns: Dict[str, np.ndarray],
+        timestamps: np.ndarray = None,
+        interval: float = 1,
+    ) -> List[str]:
+        """
+        Use: Run every rule.
+
+        Args:
+            columns (Dict[str, np.ndarray]): the profiles.
+            timestamps (np.ndarray, optional): datetime64 per row.
+            interval (float): step length in hours.
+
+        Returns:
+            List[str]: the problems, empty if the columns match the schema.
+        """
+        problems: List[str] = []
+        names = list(columns)
+        for column in self.columns:
+            if column.required and not any(
+                name.rsplit(self.separator, 1)[-1] == column.name
+                for name in names
+            ):
+                problems.append(f"missing required col '{column.name}'")
+
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            problems.append(f"columns have different lengths {lengths}")
+        n_rows = lengths.pop() if len(lengths) == 1 else 0
+        if self.n_steps is not None and n_rows != self.n_steps:
+            problems.append(f"{n_rows} rows, expected {self.n_steps}")
+
+        for name, values in columns.items():
+            values = np.asarray(values)
+            if values.dtype.kind not in "biuf":
+                problems.append(
+                    f"col '{name}' is not numeric (dtype {values.dtype})"
+                )
+                continue
+            problems.extend(self._check_values(name, values))
+
+        if timestamps is not None and self.check_timestamps:
+            problems.extend(
+                self._check_timestamps(timestamps, n_rows, interval)
+            )
+        return problems
+
+    def _check_values(self, name: str, values: np.ndarray) -> List[str]:
+        rule = self._get_rule(name)
+        if rule is None or not len(values):
+            return []
+        problems = []
+        # NaN propagates through min, so two reductions cover the NaN and range rules.
+        # The slower passes (counting, finding the row) only run for a column that fails.
+        low, high = values.min(), values.max()
+        if values.dtype.kind == "f" and np.isnan(low):
+            nan = np.isnan(values)
+            if not rule.allow_nan:
+                problems.append(
+                    f"col '{name}' has {int(nan.sum())} NaN value(s), first at row {int(nan.argmax())}"
+                )
+            if nan.all():
+                return problems
+            low, high = np.nanmin(values), np.nanmax(values)
+        if rule.min_value is not None and low < rule.min_value:
+            row = int(np.argmax(values < rule.min_value))
+            problems.append(
+                f"col '{name}' has values below {rule.min_value} ({low}), first at row {row}"
+            )
+        if rule.max_value is not None and high > rule.max_value:
+            row = int(np.argmax(values > rule.max_value))
+            problems.append(
+                f"col '{name}' has values above {rule.max_value} ({high}), first at row {row}"
+            )
+        return problems
+
+    def _check_timestamps(
+        self, timestamps: np.ndarray, n_rows: int, interval: float
+    ) -> List[str]:
+        if len(timestamps) != n_rows:
+            return [f"{len(timestamps)} timestamps for {n_rows} rows"]
+        if n_rows < 2:
+            return []
+        step = np.diff(timestamps.astype("datetime64[ns]").view(np.int64))
+        expected = int(round(interval * 3600e9))
+        # Evenly spaced is one comparison, the details only for a file that fails.
+        if step.min() == expected and step.max() == expected:
+            return []
+        problems = []
+        if step.min() <= 0:
+            row = int(np.argmax(step <= 0)) + 1
+            problems.append(f"timestamps are not increasing at row {row}")
+        row = int(np.argmax(step != expected)) + 1
+        problems.append(
+            f"timestamps are not {interval} h apart (a gap or duplicate) at row {row}"
+        )
+        return problems
+
+    def check(
+        self,
+        columns: Dict[str, np.ndarray],
+        timestamps: np.ndarray = None,
+        interval: float = 1,
+        source: str = "",
+    ) -> None:
+        """validate(), raising SchemaError with every problem if there are any."""
+        problems = self.validate(columns, timestamps, interval)
+        if problems:
+            raise SchemaError(
+                f"{source or 'Input'} doesn't match the schema: "
+                + "; ".join(problems)
+            )
+
+
+# The input profiles. Energy and tariffs can't be negative. None of them are required here: a file
+# can be solar or load only, or have no tou_tariff when a Tariff is given, so each component
+# (Solar, Load, Grid) checks for the columns it actually uses.
+PROFILE_SCHEMA = Schema(
+    (
+        Column("load", required=False, min_value=0),
+        Column("solar_gen", required=False, min_value=0),
+        Column("tou_tariff", required=False, min_value=0),
+    )
+)
+
+
+def hash_file(path: Path) -> str:
+    """Content hash of a file, or of every file in a bundle directory."""
+    path = Path(path)
+    digest = hashlib.blake2b(digest_size=16)
+    files = sorted(path.iterdir()) if path.is_dir() else [path]
+    for file in files:
+        if file != path:
+            # Bundle: the column names are part of the content.
+            digest.update(file.name.encode())
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+# (file hash, schema key) of the files that passed, so a file is only validated once per schema.
+_VALIDATED: Dict[Tuple[str, tuple], bool] = {}
+
+
+def check_cached(
+    file_hash: str,
+    schema: Schema,
+    columns: Dict[str, np.ndarray],
+    timestamps: np.ndarray = None,
+    interval: float = 1,
+    source: str = "",
+) -> None:
+    """Schema.check, skipped if the same content already passed the same schema."""
+    key = (file_hash, schema.key)
+    if file_hash is not None and key in _VALIDATED:
+        return
+    schema.check(columns, timestamps, interval, source)
+    if file_hash is not None:
+        _VALIDATED[key] = True
+
+
+def clear_validation_cache() -> None:
+    _VALIDATED.clear()
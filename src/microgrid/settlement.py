@@ -0,0 +1,113 @@
+from typing import Dict, Tuple
+import numpy as np
+from microgrid.demand import get_period_peaks
+
+# net_billing: every exported kWh is credited at the feed-in tariff of its step.
+# net_metering: exports are credited at the retail tariff of their step, up to the import cost of the
+#   billing period. Whatever is left over (a net exporter) is credited at the feed-in tariff.
+SETTLEMENT_MODES: Tuple[str, ...] = ('net_billing', 'net_metering')
+# Columns of the result of settle(), one value per billing period.
+SETTLEMENT_KEYS: Tuple[str, ...] = (
+    'start',
+    'imported',
+    'exported',
+    'import_cost',
+    'export_credit',
+    'peak_import',
+    'demand_charge',
+    'bill',
+)
+
+
+class SettlementError(Exception):
+    """Custom exception for export settlement. Found in microgrid/settlement.py"""
+
+    pass
+
+
+def settle(
+    purchased: np.ndarray,
+    cost: np.ndarray,
+    exported: np.ndarray,
+    tariffs: np.ndarray,
+    feed_in_tariffs: np.ndarray,
+    starts: np.ndarray = None,
+    mode: str = "net_billing",
+    demand_charge: float = 0.0,
+    demand_mask: np.ndarray = None,
+    interval: float = 1,
+) -> Dict[str, np.ndarray]:
+    """
+    Use: Settle imports and exports per billing period in one vectorised pass (np.add.reduceat per column),
+        for a ledger or a rollout trace. Nothing here runs per step.
+
+    Args:
+        purchased, cost, exported (np.ndarray): energy bought, its cost and energy exported per step.
+        tariffs, feed_in_tariffs (np.ndarray): retail and feed-in tariff of the same steps.
+        starts (np.ndarray, optional): first step (index into the arrays) of each billing period,
+            see TimeIndex.get_period_starts. Defaults to one period.
+        mode (str): see SETTLEMENT_MODES.
+        demand_charge (float): charge per kW of peak import per billing period.
+        demand_mask (np.ndarray, optional): bool per step, the steps the peak is measured in.
+        interval (float): step length in hours.
+
+    Returns:
+        Dict[str, np.ndarray]: SETTLEMENT_KEYS, one value per billing period. bill is import_cost - export_credit
+            + demand_charge, negative when the period is a net credit.
+    """
+    if mode not in SETTLEMENT_MODES:
+        raise SettlementError(
+            f"Unknown settlement mode {mode!r}, use one of {SETTLEMENT_MODES}"
+        )
+    n_steps = len(purchased)
+    if starts is None:
+        starts = np.zeros(1, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    if n_steps == 0:
+        return {key: np.zeros(0) for key in SETTLEMENT_KEYS}
+    if starts[0] != 0 or np.any(np.diff(starts) <= 0) or starts[-1] >= n_steps:
+        raise SettlementError(
+            "Billing periods must start at 0 and increase, inside the steps."
+        )
+
+    exported = np.asarray(exported)
+    imported = np.add.reduceat(purchased, starts)
+    import_cost = np.add.reduceat(cost, starts)
+    total_exported = np.add.reduceat(exported, starts)
+    feed_in_credit = np.add.reduceat(exported * feed_in_tariffs, starts)
+    if mode == "net_billing":
+        export_credit = feed_in_credit
+    else:
+        retail_credit = np.add.reduceat(exported * tariffs, starts)
+        offset = np.minimum(retail_credit, import_cost)
+        # The share of the exports that was left over after offsetting the imports.
+        surplus = np.divide(
+            retail_credit - offset,
+            retail_credit,
+            out=np.zeros_like(retail_credit),
+            where=retail_credit > 0,
+        )
+        export_credit = offset + surplus * feed_in_credit
+
+    peak_import = get_period_peaks(purchased, starts, interval, demand_mask)
+    demand = peak_import * demand_charge
+
+    return {
+        'start': starts,
+        'imported': imported,
+        'exported': total_exported,
+        'import_cost': import_cost,
+        'export_credit': export_credit,
+        'peak_import': peak_import,
+        'demand_charge': demand,
+        'bill': import_cost - export_credit + demand,
+    }
+
+
+def get_window_starts(
+    period_starts: np.ndarray, start: int, end: int
+) -> np.ndarray:
+    """Billing period starts of the steps [start, end), as indices into that window (0 is always a start)."""
+    period_starts = np.asarray(period_starts)
+    inside = period_starts[(period_starts > start) & (period_starts < end)]
+    return np.concatenate(([0], inside - start)).astype(np.int64)
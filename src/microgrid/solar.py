@@ -1,6 +1,11 @@
 from typing import Tuple
+import numpy as np
 import pandas as pd
-from microgrid import INPUT_FILE
+from microgrid.profiles import (
+    load_profiles,
+    get_forecast_windows,
+    ProfileError,
+)
 
 
 class SolarError(Exception):
@@ -9,6 +14,19 @@ class SolarError(Exception):
     pass
 
 
+# The solar_gen profile in the input file is for a system with these specs.
+# A Solar with a different kw_peak or inverter_efficiency scales the profile.
+PROFILE_KW_PEAK: float = 2500
+PROFILE_INVERTER_EFFICIENCY: float = 0.9
+
+
+def get_solar_scale(kw_peak: float, inverter_efficiency: float) -> float:
+    """Factor between the input profile and a system of kw_peak with inverter_efficiency."""
+    return (kw_peak / PROFILE_KW_PEAK) * (
+        inverter_efficiency / PROFILE_INVERTER_EFFICIENCY
+    )
+
+
 class Solar:
 
     def __init__(
@@ -16,46 +34,50 @@ class Solar:
         input_file: str = "",
         kw_peak: float = 2500,
         inverter_efficiency: float = 0.9,
+        time_interval: float = None,
     ):
         self.kw_peak = kw_peak
         self.inverter_efficiency = inverter_efficiency
-        self.solar_generation = self.setup_solar_generation(input_file)
-
-    def setup_solar_generation(self, input_file) -> list:
-        """Load the solar generation"""
-
-        if input_file != "":
-            try:
-                df = pd.read_csv(input_file)
-            except (FileNotFoundError, pd.errors.ParserError) as e:
-                raise SolarError(
-                    f"Please input a valid path to the Solar Load file.{input_file} : {e} "
-                )
-        else:
-            try:
-                df = pd.read_csv(INPUT_FILE)
-            except (FileNotFoundError, pd.errors.ParserError) as e:
-                raise SolarError(
-                    f"Please input a valid path to the Solar Load File. {input_file} : {e}"
-                )
-
-        if "solar_gen" not in df.columns:
+        self.solar_generation = self.setup_solar_generation(
+            input_file, time_interval
+        )
+
+    def setup_solar_generation(
+        self, input_file, time_interval: float = None
+    ) -> np.ndarray:
+        """Load the solar generation (resampled to time_interval hours if given)"""
+
+        try:
+            profiles = load_profiles(input_file, time_interval)
+        except ProfileError as e:
+            raise SolarError(f"Invalid Solar input file {input_file} : {e}")
+        except (FileNotFoundError, pd.errors.ParserError) as e:
             raise SolarError(
-                f"Missing required col 'solar_gen' in input_file. Actual columns are: {df.columns}"
+                f"Please input a valid path to the Solar Load file.{input_file} : {e} "
+            )
+
+        if "solar_gen" not in profiles:
+            raise SolarError(
+                f"Missing required col 'solar_gen' in input_file. Actual columns are: {profiles.get_column_names()}"
             )
 
         # could also check data type and a bunch of other things here.
 
-        solar_generation = df["solar_gen"].tolist()
+        solar_generation = profiles["solar_gen"]
+        # Only make a copy of the profile if this system is sized differently to the profile.
+        scale = get_solar_scale(self.kw_peak, self.inverter_efficiency)
+        if scale != 1:
+            solar_generation = solar_generation * scale
         return solar_generation
 
     def get_current_solar_generation(self, timestep: int) -> float:
-        return self.solar_generation[timestep]
-
-    def get_solar_forecast(self, current_step: int, forecast_length: int = 24):
-        # How is data going to be stored?
-        # is it going to have timestamps? I kinda like this as a way of making sure alles is doing the right thing across modules.
-        solar_forecast = self.solar_generation[
-            current_step : current_step + forecast_length
-        ]
+        return float(self.solar_generation[timestep])
+
+    def get_solar_forecast(
+        self, current_step: int, forecast_length: int = 24, mode: str = "wrap"
+    ) -> np.ndarray:
+        """Solar generation for the next forecast_length steps from current_step (mode: see get_forecast_windows)"""
+        solar_forecast = get_forecast_windows(
+            self.solar_generation, forecast_length, mode
+        )[current_step]
         return solar_forecast
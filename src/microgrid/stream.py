@@ -0,0 +1,210 @@
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from pathlib import Path
+from typing import Tuple
+import numpy as np
+
+# Fields of a sample, in order. Same order as Control.get_forecast.
+STREAM_KEYS: Tuple[str, ...] = ('load', 'solar_gen', 'tou_tariff')
+
+
+class StreamError(Exception):
+    """Custom exception for streaming data sources. Found in microgrid/stream.py"""
+
+    pass
+
+
+class StreamEnd(StreamError):
+    """The source has no more samples (iterator exhausted, nothing queued or the file stopped growing)."""
+
+    pass
+
+
+def to_sample(item) -> Tuple[float, float, float]:
+    """A dict with STREAM_KEYS or a (load, solar_gen, tou_tariff) sequence -> tuple of floats."""
+    try:
+        if isinstance(item, dict):
+            return tuple(float(item[key]) for key in STREAM_KEYS)
+        load, solar_gen, tou_tariff = item
+        return float(load), float(solar_gen), float(tou_tariff)
+    except (KeyError, TypeError, ValueError) as e:
+        raise StreamError(f"Bad sample {item!r}, expected {STREAM_KEYS}: {e}")
+
+
+class StreamSource(ABC):
+    """
+    A live feed of samples for Control(source=...). Subclasses implement next_sample, which returns
+    (load, solar_gen, tou_tariff) for the next step or raises StreamEnd.
+    """
+
+    @abstractmethod
+    def next_sample(self) -> Tuple[float, float, float]:
+        pass
+
+
+class IteratorSource(StreamSource):
+    """Samples from any iterable or generator of dicts / (load, solar_gen, tou_tariff) tuples."""
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+
+    def next_sample(self) -> Tuple[float, float, float]:
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            raise StreamEnd("The sample iterator is exhausted.")
+        return to_sample(item)
+
+
+class QueueSource(StreamSource):
+    """
+    Push source: samples are put() by a producer (a meter callback, an async task) and taken by Control.step.
+    maxlen bounds the queue, the oldest samples are dropped when it is full.
+    """
+
+    def __init__(self, maxlen: int = None):
+        self._queue = deque(maxlen=maxlen)
+
+    def put(self, sample) -> None:
+        self._queue.append(to_sample(sample))
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def next_sample(self) -> Tuple[float, float, float]:
+        try:
+            return self._queue.popleft()
+        except IndexError:
+            raise StreamEnd("No sample queued.")
+
+
+class TailingCsvSource(StreamSource):
+    """
+    Reads a csv (with a header containing STREAM_KEYS) that another process appends to, like `tail -f`.
+    Only the line being read is held in memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        follow: bool = True,
+        poll_interval: float = 0.05,
+        timeout: float = None,
+    ):
+        """
+        Args:
+            path (str): csv file to read.
+            follow (bool): wait for more lines at the end of the file. Otherwise StreamEnd at the end.
+            poll_interval (float): seconds between checks for new lines.
+            timeout (float, optional): seconds to wait for a new line before StreamEnd. Defaults to waiting forever.
+        """
+        self.path = Path(path)
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        try:
+            self._file = open(self.path, 'r', newline='')
+        except OSError as e:
+            raise StreamError(f"Could not open stream file {path}: {e}")
+        self._partial = ""
+        self._indices: Tuple[int, ...] = None
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _read_line(self) -> str:
+        """Next complete line. A line that is still being written is kept until its newline arrives."""
+        waited = 0.0
+        while True:
+            chunk = self._file.readline()
+            if chunk:
+                self._partial += chunk
+                if self._partial.endswith("\n"):
+                    line, self._partial = self._partial, ""
+                    return line
+                continue
+            if not self.follow:
+                if self._partial:
+                    line, self._partial = self._partial, ""
+                    return line
+                raise StreamEnd(f"End of {self.path}")
+            if self.timeout is not None and waited >= self.timeout:
+                raise StreamEnd(
+                    f"No new line in {self.path} for {self.timeout}s"
+                )
+            time.sleep(self.poll_interval)
+            waited += self.poll_interval
+
+    def next_sample(self) -> Tuple[float, float, float]:
+        if self._indices is None:
+            header = self._read_line().strip().split(',')
+            missing = [key for key in STREAM_KEYS if key not in header]
+            if missing:
+                raise StreamError(
+                    f"Missing required col(s) {missing} in {self.path}. Actual columns are: {header}"
+                )
+            self._indices = tuple(header.index(key) for key in STREAM_KEYS)
+
+        line = self._read_line().strip()
+        while line == "":
+            line = self._read_line().strip()
+        values = line.split(',')
+        try:
+            return tuple(float(values[i]) for i in self._indices)
+        except (IndexError, ValueError) as e:
+            raise StreamError(f"Bad line in {self.path}: {line!r}: {e}")
+
+
+class RingBuffer:
+    """
+    The last `length` rows of a stream in constant memory. Every row is written twice (at i and i + length)
+    so the window of the last `length` rows, oldest first, is always one contiguous view. No copy on read.
+    """
+
+    def __init__(self, length: int, n_features: int):
+        if length < 1:
+            raise StreamError(
+                f"Ring buffer length must be at least 1, got {length}"
+            )
+        self.length = length
+        self.data: np.ndarray = np.zeros((2 * length, n_features))
+        # Next position to write, and total rows appended.
+        self.head: int = 0
+        self.count: int = 0
+
+    def append(self, row) -> None:
+        if self.count == 0:
+            # Fill with the first row so the window is defined before the buffer is full.
+            self.data[:] = row
+        self.data[self.head] = row
+        self.data[self.head + self.length] = row
+        self.head = (self.head + 1) % self.length
+        self.count += 1
+
+    def window(self) -> np.ndarray:
+        """The last `length` rows, oldest first (a read-only view)."""
+        window = self.data[self.head : self.head + self.length]
+        window.flags.writeable = False
+        return window
+
+    def latest(self) -> np.ndarray:
+        """The newest row."""
+        return self.data[self.head + self.length - 1]
+
+    def get_forecast(self, forecast_length: int) -> np.ndarray:
+        """
+        Use: Seasonal persistence forecast, the next forecast_length steps repeat what happened `length` steps earlier
+            (with length = a day of steps: tomorrow looks like today). A view into the buffer.
+        """
+        if not 0 < forecast_length <= self.length:
+            raise StreamError(
+                f"Forecast length must be between 1 and {self.length} (the buffer length), got {forecast_length}"
+            )
+        return self.window()[:forecast_length]
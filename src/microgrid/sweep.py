@@ -0,0 +1,287 @@
+import hashlib
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from microgrid.profiles import load_profiles
+from microgrid.rollout import ROLLOUT_KEYS, run_rollout
+from microgrid.solar import get_solar_scale
+
+# Parameters that make up one configuration, with the defaults of Battery and Solar.
+SWEEP_DEFAULTS: Dict[str, float] = {
+    'capacity': 1,
+    'C_rate': 0.2,
+    'efficiency': 0.9,
+    'soc_cuttoff': 0.4,
+    'soc': 0.5,
+    'kw_peak': 2500,
+    'inverter_efficiency': 0.9,
+}
+KPI_KEYS = (
+    'grid_energy_bought',
+    'cost',
+    'unmet_demand',
+    'excess',
+    'cycles',
+    'final_soc',
+)
+# Column of the results file with the key of the run (profiles, actions, start step and interval)
+# each row came from, so a resumed sweep only reuses rows of the same run.
+RUN_KEY = 'run_key'
+
+
+class SweepError(Exception):
+    """Custom exception for parameter sweeps. Found in microgrid/sweep.py"""
+
+    pass
+
+
+def make_sweep_grid(**params) -> List[Dict[str, float]]:
+    """
+    Use: Every combination of the given parameter values. Anything not given takes the default from SWEEP_DEFAULTS.
+        Example: make_sweep_grid(capacity=[100, 500], kw_peak=[1000, 2500]) -> 4 configs
+
+    Returns:
+        List[Dict[str, float]]: one dict per configuration
+    """
+    unknown = set(params) - set(SWEEP_DEFAULTS)
+    if unknown:
+        raise SweepError(
+            f"Unknown sweep parameters {sorted(unknown)}, expected some of {list(SWEEP_DEFAULTS)}"
+        )
+    names = list(SWEEP_DEFAULTS)
+    values = [
+        list(np.atleast_1d(params.get(n, SWEEP_DEFAULTS[n]))) for n in names
+    ]
+    return [
+        dict(zip(names, (float(v) for v in combo)))
+        for combo in itertools.product(*values)
+    ]
+
+
+def evaluate_config(
+    config: Dict[str, float],
+    load: np.ndarray,
+    solar_gen: np.ndarray,
+    tariffs: np.ndarray,
+    actions: np.ndarray,
+    start_step: int = 0,
+    interval: float = 1,
+) -> Dict[str, float]:
+    """
+    Use: Run the fixed actions for one configuration and reduce the rollout to KPIs.
+
+    Returns:
+        Dict[str, float]: the config with the KPIs added.
+    """
+    config = {**SWEEP_DEFAULTS, **config}
+    scale = get_solar_scale(config['kw_peak'], config['inverter_efficiency'])
+    out, final_soc = run_rollout(
+        load=load,
+        solar_gen=solar_gen * scale if scale != 1 else solar_gen,
+        tariffs=tariffs,
+        actions=actions,
+        start_step=start_step,
+        soc=config['soc'],
+        capacity=config['capacity'],
+        C_rate=config['C_rate'],
+        efficiency=config['efficiency'],
+        soc_cuttoff=config['soc_cuttoff'],
+        interval=interval,
+    )
+    totals = dict(zip(ROLLOUT_KEYS, out.sum(axis=0)))
+
+    # Equivalent full cycles: energy taken out of the cells over the capacity.
+    cycles = totals['discharged'] / config['efficiency'] / config['capacity']
+    kpis = {
+        'grid_energy_bought': totals['to_purchase'],
+        'cost': totals['cost'],
+        'unmet_demand': totals['unmet_demand'],
+        'excess': totals['excess'],
+        'cycles': cycles,
+        'final_soc': final_soc,
+    }
+    return {**config, **{k: float(v) for k, v in kpis.items()}}
+
+
+# Worker side: views into the shared memory block, set up once per process by _init_worker.
+_shared: Dict[str, object] = {}
+
+
+def _init_worker(
+    shm_name: str, n_steps: int, n_actions: int, start_step, interval
+):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    data = np.ndarray(
+        (3 * n_steps + n_actions,), dtype=np.float64, buffer=shm.buf
+    )
+    _shared['shm'] = shm  # keep the block mapped for the life of the worker
+    _shared['load'] = data[:n_steps]
+    _shared['solar_gen'] = data[n_steps : 2 * n_steps]
+    _shared['tariffs'] = data[2 * n_steps : 3 * n_steps]
+    _shared['actions'] = data[3 * n_steps :]
+    _shared['start_step'] = start_step
+    _shared['interval'] = interval
+
+
+def _evaluate_chunk(configs: List[Dict[str, float]]) -> List[Dict[str, float]]:
+    return [
+        evaluate_config(
+            config,
+            load=_shared['load'],
+            solar_gen=_shared['solar_gen'],
+            tariffs=_shared['tariffs'],
+            actions=_shared['actions'],
+            start_step=_shared['start_step'],
+            interval=_shared['interval'],
+        )
+        for config in configs
+    ]
+
+
+def _config_key(config: Dict[str, float]) -> tuple:
+    return tuple(float(config[name]) for name in SWEEP_DEFAULTS)
+
+
+def _get_run_key(profiles, actions: np.ndarray, start_step, interval) -> str:
+    """Hash of everything a result depends on apart from the config."""
+    digest = hashlib.blake2b(digest_size=8)
+    for values in (
+        profiles['load'],
+        profiles['solar_gen'],
+        profiles['tou_tariff'],
+        actions,
+    ):
+        digest.update(np.ascontiguousarray(values, dtype=np.float64).data)
+    digest.update(f"{start_step}:{float(interval)}".encode())
+    return digest.hexdigest()
+
+
+def run_sweep(
+    configs: List[Dict[str, float]],
+    actions,
+    input_file: str = "",
+    start_step: int = 0,
+    n_workers: int = None,
+    chunksize: int = 16,
+    results_file: str = "",
+    time_interval: float = 1,
+) -> pd.DataFrame:
+    """
+    Use: Run a fixed dispatch policy (one action per step) over every configuration on a process pool.
+        The profiles and actions are put in one shared memory block that the workers map, so only the
+        small config dicts are pickled per task.
+
+    Args:
+        configs (List[Dict[str, float]]): configurations, see make_sweep_grid.
+        actions (array like): purchase request for every step from start_step.
+        input_file (str): profiles to use. Defaults to microgrid.INPUT_FILE.
+        start_step (int): timestep of the first action.
+        n_workers (int): number of processes. Defaults to os.cpu_count(). 1 runs in this process.
+        chunksize (int): configurations per task.
+        results_file (str, optional): csv that results are appended to as they finish. Configurations
+            already in the file are skipped, so an interrupted sweep can be resumed by running it again.
+            Rows are tagged with RUN_KEY, only rows of the same profiles, actions, start_step and
+            time_interval are reused.
+        time_interval (float): step length in hours, the profiles are resampled to it if needed.
+
+    Returns:
+        pd.DataFrame: one row per configuration with its parameters and KPI_KEYS.
+    """
+    profiles = load_profiles(input_file, time_interval)
+    actions = np.asarray(actions, dtype=np.float64)
+    configs = [{**SWEEP_DEFAULTS, **config} for config in configs]
+
+    run_key = _get_run_key(profiles, actions, start_step, time_interval)
+
+    done = pd.DataFrame()
+    if results_file != "" and os.path.exists(results_file):
+        done = pd.read_csv(results_file, dtype={RUN_KEY: str})
+        if RUN_KEY not in done:
+            raise SweepError(
+                f"{results_file} has no {RUN_KEY} col, so its rows can't be matched to this run. Use a new results file."
+            )
+        # Only the rows of this run and the configs asked for this time, the file can hold other sweeps too.
+        done = done[done[RUN_KEY] == run_key].drop(columns=RUN_KEY)
+        requested = {_config_key(c) for c in configs}
+        keys = [_config_key(row) for row in done.to_dict('records')]
+        done = done[[key in requested for key in keys]]
+        done = done.drop_duplicates(list(SWEEP_DEFAULTS), ignore_index=True)
+        done_keys = set(keys) & requested
+        configs = [c for c in configs if _config_key(c) not in done_keys]
+
+    results: List[Dict[str, float]] = []
+
+    def save(rows: List[Dict[str, float]]) -> None:
+        results.extend(rows)
+        if results_file != "":
+            write_header = not os.path.exists(results_file)
+            pd.DataFrame(rows).assign(**{RUN_KEY: run_key}).to_csv(
+                results_file, mode='a', header=write_header, index=False
+            )
+
+    n_workers = n_workers or os.cpu_count() or 1
+    chunks = [
+        configs[i : i + chunksize] for i in range(0, len(configs), chunksize)
+    ]
+
+    if n_workers == 1:
+        for chunk in chunks:
+            save(
+                [
+                    evaluate_config(
+                        config,
+                        load=profiles['load'],
+                        solar_gen=profiles['solar_gen'],
+                        tariffs=profiles['tou_tariff'],
+                        actions=actions,
+                        start_step=start_step,
+                        interval=time_interval,
+                    )
+                    for config in chunk
+                ]
+            )
+    elif chunks:
+        n_steps = len(profiles)
+        shm = shared_memory.SharedMemory(
+            create=True, size=(3 * n_steps + len(actions)) * 8
+        )
+        data = np.ndarray(
+            (3 * n_steps + len(actions),), dtype=np.float64, buffer=shm.buf
+        )
+        try:
+            data[:n_steps] = profiles['load']
+            data[n_steps : 2 * n_steps] = profiles['solar_gen']
+            data[2 * n_steps : 3 * n_steps] = profiles['tou_tariff']
+            data[3 * n_steps :] = actions
+
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_worker,
+                initargs=(
+                    shm.name,
+                    n_steps,
+                    len(actions),
+                    start_step,
+                    time_interval,
+                ),
+            ) as executor:
+                futures = [
+                    executor.submit(_evaluate_chunk, chunk) for chunk in chunks
+                ]
+                for future in as_completed(futures):
+                    save(future.result())
+        finally:
+            # The view has to go before the block can be closed.
+            del data
+            shm.close()
+            shm.unlink()
+
+    df = pd.concat([done, pd.DataFrame(results)], ignore_index=True)
+    if df.empty:
+        return df
+    # as_completed hands back results in any order, sort them like a grid.
+    return df.sort_values(list(SWEEP_DEFAULTS), ignore_index=True)
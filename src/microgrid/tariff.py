@@ -0,0 +1,273 @@
+from typing import Dict, Tuple
+import numpy as np
+from microgrid.timeindex import TimeIndex, SEASONS
+
+# Day names a period can use, as weekdays (Monday is 0).
+DAYS: Dict[str, Tuple[int, ...]] = {
+    'weekday': (0, 1, 2, 3, 4),
+    'weekend': (5, 6),
+    'saturday': (5,),
+    'sunday': (6,),
+}
+
+
+class TariffError(Exception):
+    """Custom exception for tariff rules. Found in microgrid/tariff.py"""
+
+    pass
+
+
+class TariffPeriod:
+    """
+    One time of use window (peak, standard, ...) of a Tariff. A step is in the period when it matches every
+    rule that is set, a rule left as None matches every step.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        hours: Tuple[Tuple[float, float], ...] = None,
+        days: Tuple = None,
+        seasons: Tuple[str, ...] = None,
+        months: Tuple[int, ...] = None,
+        feed_in_rate: float = None,
+    ):
+        """
+        Args:
+            name (str): period name (peak, standard, off_peak, ...).
+            rate (float): energy price per kWh.
+            hours (Tuple[Tuple[float, float], ...], optional): (start, end) local hours, the end isn't included.
+                A window can wrap past midnight, (22, 6) is 22:00 -> 06:00.
+            days (Tuple, optional): 'weekday', 'weekend', 'saturday', 'sunday' or weekdays (Monday is 0).
+            seasons (Tuple[str, ...], optional): names from timeindex.SEASONS.
+            months (Tuple[int, ...], optional): months (1 -> 12).
+            feed_in_rate (float, optional): export credit per kWh in this period, defaults to the tariff's.
+        """
+        self.name = name
+        self.rate = float(rate)
+        self.hours = (
+            None
+            if hours is None
+            else tuple((float(start), float(end)) for start, end in hours)
+        )
+        self.days = None if days is None else self._get_weekdays(days)
+        if seasons is not None:
+            unknown = [season for season in seasons if season not in SEASONS]
+            if unknown:
+                raise TariffError(
+                    f"Unknown season(s) {unknown} in period {name}, use {SEASONS}"
+                )
+            seasons = tuple(SEASONS.index(season) for season in seasons)
+        self.seasons = seasons
+        if months is not None and not all(1 <= m <= 12 for m in months):
+            raise TariffError(f"Months must be 1 -> 12 in period {name}")
+        self.months = None if months is None else tuple(months)
+        self.feed_in_rate = feed_in_rate
+
+    def _get_weekdays(self, days) -> Tuple[int, ...]:
+        weekdays = set()
+        for day in days:
+            if isinstance(day, str):
+                if day not in DAYS:
+                    raise TariffError(
+                        f"Unknown day {day!r} in period {self.name}, use {list(DAYS)} or 0 -> 6"
+                    )
+                weekdays.update(DAYS[day])
+            elif 0 <= day <= 6:
+                weekdays.add(int(day))
+            else:
+                raise TariffError(
+                    f"Weekdays must be 0 -> 6 in period {self.name}"
+                )
+        return tuple(sorted(weekdays))
+
+    def get_window_key(self) -> tuple:
+        """The rules that decide which steps are in the period (not the rates)."""
+        return (self.hours, self.days, self.seasons, self.months)
+
+    def get_mask(self, calendar: Dict[str, np.ndarray]) -> np.ndarray:
+        """Bool per step, True where the step is in the period. Vectorised over the calendar arrays."""
+        mask = np.ones(len(calendar['hour']), dtype=bool)
+        if self.hours is not None:
+            hour = calendar['hour']
+            in_hours = np.zeros(len(hour), dtype=bool)
+            for start, end in self.hours:
+                if start <= end:
+                    in_hours |= (hour >= start) & (hour < end)
+                else:
+                    in_hours |= (hour >= start) | (hour < end)
+            mask &= in_hours
+        if self.days is not None:
+            mask &= np.isin(calendar['weekday'], self.days)
+        if self.seasons is not None:
+            mask &= np.isin(calendar['season'], self.seasons)
+        if self.months is not None:
+            mask &= np.isin(calendar['month'], self.months)
+        return mask
+
+
+class Tariff:
+    """
+    Rule based time of use tariff. The first period a step matches sets its price, steps that match no
+    period get default_rate. The prices for a TimeIndex are built with vectorised calendar masks and cached:
+    the period of every step is cached per set of windows, so a tariff variant that only changes rates
+    (or the demand charge) is one np.take.
+    """
+
+    def __init__(
+        self,
+        periods: Tuple[TariffPeriod, ...] = (),
+        default_rate: float = 0.0,
+        feed_in_rate: float = 0.0,
+        demand_charge: float = 0.0,
+        demand_periods: Tuple[str, ...] = None,
+        name: str = "",
+    ):
+        """
+        Args:
+            periods (Tuple[TariffPeriod, ...]): time of use periods, in priority order.
+            default_rate (float): price per kWh of steps in no period.
+            feed_in_rate (float): export credit per kWh, unless a period sets its own.
+            demand_charge (float): charge per kW of peak import per billing period.
+            demand_periods (Tuple[str, ...], optional): names of the periods the peak is measured in,
+                None measures it over every step.
+            name (str): for reports.
+        """
+        self.periods = tuple(periods)
+        self.default_rate = float(default_rate)
+        self.feed_in_rate = float(feed_in_rate)
+        self.demand_charge = float(demand_charge)
+        self.name = name
+        names = [period.name for period in self.periods]
+        if len(set(names)) != len(names):
+            raise TariffError(f"Period names must be unique, got {names}")
+        if demand_periods is not None:
+            unknown = [p for p in demand_periods if p not in names]
+            if unknown:
+                raise TariffError(
+                    f"Unknown demand period(s) {unknown}, the periods are {names}"
+                )
+            demand_periods = tuple(demand_periods)
+        self.demand_periods = demand_periods
+
+        self.window_key: tuple = tuple(
+            period.get_window_key() for period in self.periods
+        )
+        self.rates: np.ndarray = np.array(
+            [period.rate for period in self.periods] + [self.default_rate]
+        )
+        self.feed_in_rates: np.ndarray = np.array(
+            [
+                (
+                    self.feed_in_rate
+                    if period.feed_in_rate is None
+                    else period.feed_in_rate
+                )
+                for period in self.periods
+            ]
+            + [self.feed_in_rate]
+        )
+        # Everything the price arrays depend on, for the cache.
+        self.key: tuple = (
+            self.window_key,
+            tuple(self.rates),
+            tuple(self.feed_in_rates),
+        )
+
+    @classmethod
+    def from_dict(cls, rules: Dict) -> "Tariff":
+        """
+        Use: Tariff from plain data (json, yaml, ...):
+            {"default_rate": 1.2, "feed_in_rate": 0.5, "demand_charge": 80, "demand_periods": ["peak"],
+             "periods": [{"name": "peak", "rate": 4.0, "hours": [[7, 10], [18, 20]], "days": ["weekday"]}, ...]}
+        """
+        rules = dict(rules)
+        try:
+            periods = tuple(
+                TariffPeriod(**period) for period in rules.pop('periods', ())
+            )
+            return cls(periods=periods, **rules)
+        except TypeError as e:
+            raise TariffError(f"Invalid tariff rules: {e}")
+
+    def get_period_index(self, time_index: TimeIndex) -> np.ndarray:
+        """
+        Use: Period of every step, an index into periods (len(periods) is no period). Read-only, cached
+            per set of windows and TimeIndex.
+        """
+        key = (self.window_key, time_index.key)
+        index = _PERIOD_CACHE.get(key)
+        if index is None:
+            calendar = time_index.get_calendar()
+            n_periods = len(self.periods)
+            index = np.full(time_index.n_steps, n_periods, dtype=np.int64)
+            # Highest priority last, so the first period a step matches is the one that sticks.
+            for i in range(n_periods - 1, -1, -1):
+                index[self.periods[i].get_mask(calendar)] = i
+            index.flags.writeable = False
+            _store(_PERIOD_CACHE, key, index)
+        return index
+
+    def get_period_names(self, time_index: TimeIndex) -> np.ndarray:
+        """Name of the period of every step ('default' for no period)."""
+        names = np.array(
+            [period.name for period in self.periods] + ['default']
+        )
+        return names[self.get_period_index(time_index)]
+
+    def build(self, time_index: TimeIndex) -> np.ndarray:
+        """
+        Use: Price per kWh of every step of time_index (read-only, cached per rule set).
+
+        Args:
+            time_index (TimeIndex): dates of the steps.
+
+        Returns:
+            np.ndarray: (n_steps,) prices, a drop in for the tou_tariff column.
+        """
+        return self._build(self.rates, 'price', time_index)
+
+    def build_feed_in(self, time_index: TimeIndex) -> np.ndarray:
+        """Export credit per kWh of every step (read-only, cached per rule set)."""
+        return self._build(self.feed_in_rates, 'feed_in', time_index)
+
+    def _build(
+        self, rates: np.ndarray, kind: str, time_index: TimeIndex
+    ) -> np.ndarray:
+        key = (self.key, kind, time_index.key)
+        prices = _PRICE_CACHE.get(key)
+        if prices is None:
+            prices = rates[self.get_period_index(time_index)]
+            prices.flags.writeable = False
+            _store(_PRICE_CACHE, key, prices)
+        return prices
+
+    def get_demand_mask(self, time_index: TimeIndex) -> np.ndarray:
+        """Bool per step, True where imports count towards the billed peak (see demand_periods)."""
+        if self.demand_periods is None:
+            return np.ones(time_index.n_steps, dtype=bool)
+        demand = [
+            i
+            for i, period in enumerate(self.periods)
+            if period.name in self.demand_periods
+        ]
+        return np.isin(self.get_period_index(time_index), demand)
+
+
+# Period indices per (windows, TimeIndex) and prices per (rule set, TimeIndex). A sweep over tariff
+# variants builds each price array once, and variants with the same windows share the period index.
+_PERIOD_CACHE: Dict[tuple, np.ndarray] = {}
+_PRICE_CACHE: Dict[tuple, np.ndarray] = {}
+_CACHE_SIZE = 512
+
+
+def _store(cache: Dict[tuple, np.ndarray], key: tuple, value) -> None:
+    if len(cache) >= _CACHE_SIZE:
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+
+def clear_tariff_cache() -> None:
+    _PERIOD_CACHE.clear()
+    _PRICE_CACHE.clear()
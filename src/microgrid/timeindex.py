@@ -0,0 +1,223 @@
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+
+# The profiles in assets/data.csv have no timestamps: they are a typical year from midnight on the 1st of January,
+# for a site in South Africa (no daylight saving, so every day has 24 hours).
+DEFAULT_START = "2023-01-01 00:00"
+DEFAULT_TIMEZONE = "Africa/Johannesburg"
+
+# Calendar features, in the column order of TimeIndex.get_calendar_matrix.
+CALENDAR_KEYS: Tuple[str, ...] = (
+    'hour',
+    'weekday',
+    'month',
+    'day_of_year',
+    'season',
+    'is_weekend',
+)
+# Southern hemisphere seasons, indexed by the season feature (Dec-Feb is 0).
+SEASONS: Tuple[str, ...] = ('summer', 'autumn', 'winter', 'spring')
+# Periods for TimeIndex.get_period_starts (billing periods). Weeks start on Monday.
+PERIODS: Tuple[str, ...] = ('day', 'week', 'month', 'year')
+
+_NS_PER_HOUR = 3600 * 10**9
+
+
+class TimeIndexError(Exception):
+    """Custom exception for the timestamp index. Found in microgrid/timeindex.py"""
+
+    pass
+
+
+class TimeIndex:
+    """
+    Timezone aware timestamps of evenly spaced profiles. The steps are evenly spaced, so the step of a datetime
+    is arithmetic on its epoch nanoseconds (O(1), nothing is searched). Timestamps and calendar features are
+    built once for the whole horizon, in local time.
+    """
+
+    def __init__(
+        self,
+        start,
+        n_steps: int,
+        interval: float = 1,
+        tz: str = DEFAULT_TIMEZONE,
+    ):
+        """
+        Args:
+            start (str, datetime, pd.Timestamp or np.datetime64): time of step 0. A naive start is local time in tz.
+            n_steps (int): steps in the profiles.
+            interval (float): step length in hours.
+            tz (str): timezone of the site.
+        """
+        self.tz = tz
+        self.n_steps = n_steps
+        self.interval = interval
+        self.step_ns: int = int(round(interval * _NS_PER_HOUR))
+        if self.step_ns <= 0:
+            raise TimeIndexError(f"Interval must be positive, got {interval}")
+        self.start: pd.Timestamp = self._to_timestamp(start)
+        self.start_ns: int = self.start.value
+        # Everything the dates of the steps depend on, for caches of arrays built from the calendar.
+        self.key: tuple = (self.start_ns, n_steps, self.step_ns, tz)
+
+        self._timestamps: pd.DatetimeIndex = None
+        self._calendar: Dict[str, np.ndarray] = None
+        self._calendar_matrix: np.ndarray = None
+        self._period_starts: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_profiles(
+        cls, profiles, tz: str = DEFAULT_TIMEZONE, start=DEFAULT_START
+    ) -> "TimeIndex":
+        """
+        Use: Index for a Profiles store. Uses the timestamps from the file when it has them (naive ones are local
+            time in tz, ones with an offset were converted to UTC when the file was read), otherwise starts at start.
+        """
+        timestamps = profiles.timestamps
+        if timestamps is None:
+            return cls(start, len(profiles), profiles.interval, tz)
+
+        step_ns = int(round(profiles.interval * _NS_PER_HOUR))
+        if len(timestamps) > 1 and np.any(
+            np.diff(timestamps.view(np.int64)) != step_ns
+        ):
+            raise TimeIndexError(
+                f"The timestamps of {profiles.source} are not evenly spaced {profiles.interval} h apart."
+            )
+        first = pd.Timestamp(timestamps[0])
+        if profiles.timestamps_utc:
+            first = first.tz_localize('UTC')
+        return cls(first, len(timestamps), profiles.interval, tz)
+
+    def _to_timestamp(self, when) -> pd.Timestamp:
+        try:
+            timestamp = pd.Timestamp(when)
+        except (ValueError, TypeError) as e:
+            raise TimeIndexError(f"Not a date/time: {when!r}: {e}")
+        if timestamp.tzinfo is None:
+            return timestamp.tz_localize(self.tz)
+        return timestamp.tz_convert(self.tz)
+
+    def get_step(self, when, exact: bool = False) -> int:
+        """
+        Use: The step a datetime falls in (the step that contains it). O(1).
+
+        Args:
+            when (str, datetime, pd.Timestamp or np.datetime64): naive values are local time in tz.
+            exact (bool): raise if when isn't the start of a step.
+
+        Returns:
+            int: the step.
+        """
+        offset = self._to_timestamp(when).value - self.start_ns
+        step, remainder = divmod(offset, self.step_ns)
+        if not 0 <= step < self.n_steps:
+            raise TimeIndexError(
+                f"{when} is outside the profiles ({self.get_timestamp(0)} to {self.get_timestamp(self.n_steps - 1)})"
+            )
+        if exact and remainder:
+            raise TimeIndexError(f"{when} is not the start of a step.")
+        return int(step)
+
+    def get_timestamp(self, step: int) -> pd.Timestamp:
+        """Local start time of a step."""
+        return pd.Timestamp(
+            self.start_ns + step * self.step_ns, tz='UTC'
+        ).tz_convert(self.tz)
+
+    @property
+    def timestamps(self) -> pd.DatetimeIndex:
+        """Local start time of every step (built on first use)."""
+        if self._timestamps is None:
+            utc = self.start_ns + np.arange(self.n_steps) * self.step_ns
+            self._timestamps = pd.DatetimeIndex(
+                utc.astype('datetime64[ns]'), tz='UTC'
+            ).tz_convert(self.tz)
+        return self._timestamps
+
+    def get_calendar(self) -> Dict[str, np.ndarray]:
+        """
+        Use: Calendar features of every step as read-only arrays (built once):
+            hour (of the day, with fractions for sub hourly steps), weekday (Monday is 0), month (1 -> 12),
+            day_of_year (1 -> 366), season (see SEASONS) and is_weekend (0/1).
+        """
+        if self._calendar is None:
+            local = self.timestamps
+            month = local.month.to_numpy()
+            weekday = local.dayofweek.to_numpy()
+            calendar = {
+                'hour': local.hour.to_numpy() + local.minute.to_numpy() / 60,
+                'weekday': weekday,
+                'month': month,
+                'day_of_year': local.dayofyear.to_numpy(),
+                'season': (month % 12) // 3,
+                'is_weekend': (weekday >= 5).astype(np.int64),
+            }
+            for values in calendar.values():
+                values.flags.writeable = False
+            self._calendar = calendar
+        return self._calendar
+
+    def get_calendar_matrix(self) -> np.ndarray:
+        """(n_steps, len(CALENDAR_KEYS)) float matrix of the calendar features, a row per step for observations."""
+        if self._calendar_matrix is None:
+            calendar = self.get_calendar()
+            matrix = np.column_stack(
+                [calendar[key] for key in CALENDAR_KEYS]
+            ).astype(np.float64)
+            matrix.flags.writeable = False
+            self._calendar_matrix = matrix
+        return self._calendar_matrix
+
+    def get_period_starts(self, period: str = "month") -> np.ndarray:
+        """
+        Use: First step of every (local) day, week, month or year in the index, for billing periods.
+            Step 0 is always a start, even part way through a period. Read-only, built once per period.
+
+        Returns:
+            np.ndarray: int64 start steps, ready for np.add.reduceat / np.maximum.reduceat.
+        """
+        starts = self._period_starts.get(period)
+        if starts is not None:
+            return starts
+        if period not in PERIODS:
+            raise TimeIndexError(
+                f"Unknown period {period!r}, use one of {PERIODS}"
+            )
+        local = self.timestamps
+        if period == "month":
+            key = local.year.to_numpy() * 12 + local.month.to_numpy()
+        elif period == "year":
+            key = local.year.to_numpy()
+        else:
+            # Days since the epoch in local time (1970-01-01 was a Thursday, +3 makes weeks start on Monday).
+            days = local.tz_localize(None).asi8 // (24 * _NS_PER_HOUR)
+            key = days if period == "day" else (days + 3) // 7
+        starts = np.flatnonzero(np.diff(key)) + 1
+        starts = np.concatenate(([0], starts)).astype(np.int64)
+        starts.flags.writeable = False
+        self._period_starts[period] = starts
+        return starts
+
+
+# TimeIndex per (profiles, tz, start), so every Control on the same profiles shares the calendar arrays.
+# The profiles are kept in the value so their id can't be reused while the entry exists.
+_TIME_INDEX_CACHE: Dict[tuple, Tuple[object, TimeIndex]] = {}
+_TIME_INDEX_CACHE_SIZE = 32
+
+
+def get_time_index(
+    profiles, tz: str = DEFAULT_TIMEZONE, start=DEFAULT_START
+) -> TimeIndex:
+    """TimeIndex.from_profiles, shared between every caller with the same profiles and timezone."""
+    key = (id(profiles), tz, str(start))
+    cached = _TIME_INDEX_CACHE.get(key)
+    if cached is not None:
+        return cached[1]
+    time_index = TimeIndex.from_profiles(profiles, tz, start)
+    if len(_TIME_INDEX_CACHE) >= _TIME_INDEX_CACHE_SIZE:
+        del _TIME_INDEX_CACHE[next(iter(_TIME_INDEX_CACHE))]
+    _TIME_INDEX_CACHE[key] = (profiles, time_index)
+    return time_index
@@ -0,0 +1,83 @@
+from microgrid.batch import BatchControl, RESULT_KEYS, GENERATOR_RESULT_KEYS
+from microgrid.control import Control
+from microgrid.generator import Generator
+import numpy as np
+import unittest
+
+
+class TestBatchControl(unittest.TestCase):
+
+    def setUp(self):
+        self.batch = BatchControl(n_envs=4)
+
+    def tearDown(self):
+        del self.batch
+
+    def test_get_current_state(self):
+        # Every env starts on the first row of data.csv
+        state = self.batch.get_current_state()
+        np.testing.assert_array_equal(state['load'], 96.855)
+        np.testing.assert_array_equal(state['tou_tariff'], 1.2103)
+        np.testing.assert_array_equal(state['battery_soc'], 0.5)
+
+        self.batch.reset(start_step=np.array([0, 1, 2, 8759]))
+        state = self.batch.get_current_state()
+        self.assertEqual(state['load'][-1], 86.085)
+
+    def test_matches_control(self):
+        # Cover the positive, artificial positive and negative branches (and the empty/full battery edges).
+        rng = np.random.default_rng(0)
+        n_envs = 500
+        load = rng.uniform(0, 20, n_envs)
+        solar_gen = rng.uniform(0, 20, n_envs)
+        soc = rng.uniform(0.3, 1, n_envs)
+        actions = rng.choice([0, 1, 2, 4, 8, 15], n_envs)
+
+        batch = BatchControl(n_envs=n_envs, capacity=100)
+        batch._set_state(
+            load=load, solar_gen=solar_gen, tou_tariff=1, battery_soc=soc
+        )
+        result = batch.balance_energy(actions)
+
+        control = Control()
+        control.battery._set_battery_capacity(100)
+        for i in range(n_envs):
+            control.battery._set_soc(soc[i])
+            control._set_state(
+                load=load[i],
+                solar_gen=solar_gen[i],
+                tou_tariff=1,
+                battery_soc=soc[i],
+            )
+            expected = control.balance_energy(action=actions[i])
+            for key in RESULT_KEYS:
+                self.assertAlmostEqual(result[key][i], expected[key], 9)
+            self.assertAlmostEqual(batch.soc[i], control.battery.get_soc(), 9)
+
+    def test_step(self):
+        self.batch.balance_energy(0)
+        self.batch.step()
+        np.testing.assert_array_equal(self.batch.current_step, 1)
+        np.testing.assert_array_equal(
+            self.batch.get_current_state()['load'], 97.053
+        )
+
+    def test_generator(self):
+        batch = BatchControl(
+            n_envs=3, generator=Generator(capacity=10, start_up_cost=5)
+        )
+        result = batch.balance_energy(0)
+        self.assertEqual(result.dtype.names, GENERATOR_RESULT_KEYS)
+        np.testing.assert_array_equal(result['generated_this_step'], 0)
+
+        # The generator only runs for unmet demand, start up is paid once.
+        generated, cost, excess, running = batch.generator.dispatch_batch(
+            np.array([0, 4, 12]), 1, np.array([False, True, False])
+        )
+        np.testing.assert_allclose(generated, [0, 4, 10])
+        np.testing.assert_allclose(cost, [0, 4 * 6, 10 * 6 + 5])
+        np.testing.assert_array_equal(running, [False, True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,6 @@
 from microgrid.control import Control
+from microgrid.generator import Generator
+import numpy as np
 from typing import Dict
 import unittest
 
@@ -19,12 +21,14 @@ class TestControl(unittest.TestCase):
             'solar_gen': 0.0,
             'tou_tariff': 1.2103,
             'battery_soc': 0.5,
+            'peak_import': 0.0,
         }
         last_state: Dict[str, float] = {
             'load': 86.085,
             'solar_gen': 0.0,
             'tou_tariff': 1.2103,
             'battery_soc': 0.5,
+            'peak_import': 0.0,
         }
 
         # Assert that the first state is correct (with battery_soc set to 0.5)
@@ -38,6 +42,91 @@ class TestControl(unittest.TestCase):
         state = self.control.get_current_state()
         self.assertDictEqual(state, last_state)
 
+    def test_get_forecast(self):
+        forecast = self.control.get_forecast(forecast_length=24)
+        self.assertEqual(forecast.shape, (24, 3))
+        self.assertEqual(forecast[0].tolist(), [96.855, 0.0, 1.2103])
+
+        self.control.step()
+        # Same matrix, just the next row.
+        self.assertEqual(self.control.get_forecast()[0, 0], 97.053)
+
+    def test_snapshot(self):
+        self.control.battery._set_battery_capacity(200)
+        for action in [0, 50, 0]:
+            self.control.balance_energy(action=action)
+            self.control.step()
+        snapshot = self.control.get_snapshot()
+
+        # Try a branch, go back and run another one.
+        for action in [150, 150, 150]:
+            self.control.balance_energy(action=action)
+            self.control.step()
+        self.control.restore(snapshot)
+        self.assertEqual(self.control.current_step, 3)
+        for action in [10, 20]:
+            self.control.balance_energy(action=action)
+            self.control.step()
+
+        expected = Control()
+        expected.battery._set_battery_capacity(200)
+        for action in [0, 50, 0, 10, 20]:
+            expected.balance_energy(action=action)
+            expected.step()
+        self.assertEqual(
+            self.control.get_current_state(), expected.get_current_state()
+        )
+        self.assertTrue(
+            self.control.ledger.to_dataframe().equals(
+                expected.ledger.to_dataframe()
+            )
+        )
+
+    def test_time_interval(self):
+        # 15 minute steps: 4x the steps, and the battery can only move a quarter as much energy per step.
+        control = Control(time_interval=0.25)
+        control.battery._set_battery_capacity(100)
+        self.assertEqual(len(control.load.load_values), 4 * 8760)
+        self.assertEqual(control.battery.interval, 0.25)
+        self.assertAlmostEqual(control.battery.get_charge_capacity(), 5)
+        self.assertEqual(control.get_current_state()['tou_tariff'], 1.2103)
+
+    def test_generator(self):
+        generator = Generator(capacity=10, min_load=0.5, start_up_cost=5)
+        control = Control(time_interval=0.5, generator=generator)
+
+        # 1 kWh unmet in half an hour is 2 kW, below the 5 kW min load.
+        generated, cost, excess, unmet = control.balance_with_generator(0, 1)
+        self.assertEqual(generated, 2.5)
+        self.assertAlmostEqual(cost, 2.5 * 0.3 * 20 + 5)
+        self.assertEqual((excess, unmet), (1.5, 0))
+        # More than the capacity can cover.
+        generated, cost, excess, unmet = control.balance_with_generator(0, 8)
+        self.assertEqual((generated, excess, unmet), (5, 0, 3))
+        self.assertAlmostEqual(cost, 5 * 0.3 * 20)
+
+        # Nothing unmet: the generator is off and the ledger has its columns.
+        result = control.balance_energy(action=0)
+        self.assertFalse(generator.running)
+        self.assertEqual(result['generated_this_step'], 0)
+        self.assertEqual(
+            control.ledger.to_dataframe()['generator_cost'].iloc[0], 0
+        )
+        out = control.rollout(np.zeros(24))
+        self.assertEqual(out['generated'].shape, (24,))
+
+    def test_reset_generator(self):
+        generator = Generator(capacity=10, min_load=0.5, start_up_cost=5)
+        control = Control(time_interval=0.5, generator=generator)
+        _, first_cost, _, _ = control.balance_with_generator(0, 1)
+        self.assertTrue(generator.running)
+
+        # A new episode starts with the generator off, so it pays the start up again.
+        control.reset()
+        self.assertFalse(generator.running)
+        _, cost, _, _ = control.balance_with_generator(0, 1)
+        self.assertAlmostEqual(cost, first_cost)
+
     # if the max usable energy is more thatn the available energy balance. Then you can purchase more energy.
     # if you can purchase more, then you can only purchase up to the available energy or less.
     # if the max usable energy is less than the energy balance then you can't request to purchase more because there will already be excess.
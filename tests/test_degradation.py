@@ -0,0 +1,108 @@
+from microgrid.degradation import (
+    DegradationModel,
+    RainflowCounter,
+    rainflow,
+    run_degradation_years,
+    turning_points,
+)
+from microgrid.battery import Battery
+from microgrid.control import Control
+import numpy as np
+import unittest
+
+
+class TestRainflow(unittest.TestCase):
+
+    def test_astm_example(self):
+        # Example from ASTM E1049-85 (rainflow counting).
+        ranges, counts = rainflow([-2, 1, -3, 5, -1, 3, -4, 4, -2])
+        totals = {}
+        for cycle_range, count in zip(ranges, counts):
+            totals[cycle_range] = totals.get(cycle_range, 0) + count
+        self.assertEqual(totals, {3: 0.5, 4: 1.5, 6: 0.5, 8: 1.0, 9: 0.5})
+
+    def test_turning_points(self):
+        points = turning_points([0, 1, 2, 2, 1, 1, 3, 4])
+        self.assertEqual(points.tolist(), [0, 2, 1, 4])
+
+    def test_streaming_matches_batch(self):
+        trace = np.random.default_rng(0).uniform(0.4, 1, 2000)
+        counter = RainflowCounter(exponent=1.5)
+        for value in trace:
+            counter.push(value)
+        ranges, counts = rainflow(trace, exponent=1.5)
+        cycles, damage_sum = counter.get_totals()
+        self.assertAlmostEqual(cycles, counts.sum())
+        self.assertAlmostEqual(damage_sum, (counts * ranges**1.5).sum())
+
+
+class TestDegradationModel(unittest.TestCase):
+
+    def test_battery_fades(self):
+        model = DegradationModel(throughput_life=None)
+        battery = Battery(capacity=100, soc_cuttoff=0, degradation=model)
+        # 20 full depth cycles at 1C.
+        battery.C_rate = 1
+        for _ in range(20):
+            battery.charge(1000)
+            battery.discharge(1000)
+        # 39 full depth half cycles (the last one is still open).
+        self.assertAlmostEqual(model.get_metrics()['cycles'], 19.5)
+        # Each full depth cycle uses 1 / cycle_life of the life, 20% fade at end of life.
+        closed = model.counter.cycles
+        self.assertAlmostEqual(
+            battery.capacity, 100 * (1 - 0.2 * closed / 4000), 9
+        )
+        self.assertLess(battery.capacity, battery.nominal_capacity)
+
+    def test_run_degradation_years(self):
+        control = Control()
+        control.battery._set_battery_capacity(200)
+        actions = np.tile([40.0] * 6 + [0.0] * 18, 365)
+        years = run_degradation_years(control, actions, n_years=3)
+
+        self.assertEqual(len(years), 3)
+        self.assertEqual(years['capacity'].iloc[0], 200)
+        self.assertTrue(years['state_of_health'].is_monotonic_decreasing)
+        self.assertAlmostEqual(
+            control.battery.capacity, 200 * years['state_of_health'].iloc[-1]
+        )
+        self.assertEqual(control.current_step, 0)
+
+    def test_snapshot(self):
+        control = Control()
+        control.battery = Battery(capacity=100, degradation=DegradationModel())
+        snapshot = control.get_snapshot()
+        for action in [100, 0, 100, 0]:
+            control.balance_energy(action=action)
+            control.step()
+        self.assertLess(control.battery.capacity, 100)
+        control.restore(snapshot)
+        self.assertEqual(control.battery.capacity, 100)
+        self.assertEqual(control.battery.degradation.throughput, 0)
+
+    def test_reset(self):
+        control = Control()
+        control.battery = Battery(capacity=100, degradation=DegradationModel())
+        for action in [100, 0, 100, 0]:
+            control.balance_energy(action=action)
+            control.step()
+        worn = control.battery.capacity
+        self.assertLess(worn, 100)
+
+        # Wear can carry across episodes.
+        control.reset(keep_degradation=True)
+        self.assertEqual(control.battery.capacity, worn)
+        self.assertGreater(control.battery.degradation.throughput, 0)
+
+        # By default every episode starts with a new battery.
+        control.reset()
+        model = control.battery.degradation
+        self.assertEqual(control.battery.capacity, 100)
+        self.assertEqual(model.throughput, 0)
+        self.assertEqual(model.state_of_health, 1)
+        self.assertEqual(model.counter.get_totals(), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
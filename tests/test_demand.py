@@ -0,0 +1,147 @@
+from microgrid.demand import (
+    DemandError,
+    PeakTracker,
+    get_period_ends,
+    get_period_peaks,
+)
+from microgrid.control import Control
+from microgrid.ledger import LEDGER_KEYS
+from microgrid.tariff import Tariff, TariffPeriod
+import numpy as np
+import unittest
+
+
+class TestPeaks(unittest.TestCase):
+
+    def test_period_ends(self):
+        np.testing.assert_array_equal(
+            get_period_ends(np.array([0, 2, 5]), 6),
+            [False, True, False, False, True, True],
+        )
+
+    def test_period_peaks(self):
+        purchased = np.array(
+            [[1.0, 4.0, 2.0, 0.0, 3.0], [5.0, 0.0, 0.0, 1.0, 0.0]]
+        )
+        starts = np.array([0, 2])
+        np.testing.assert_array_equal(
+            get_period_peaks(purchased, starts), [[4, 3], [5, 1]]
+        )
+        # Half hour steps: power is twice the energy.
+        np.testing.assert_array_equal(
+            get_period_peaks(purchased[0], starts, interval=0.5), [8, 6]
+        )
+        mask = np.array([True, False, True, True, False])
+        np.testing.assert_array_equal(
+            get_period_peaks(purchased[0], starts, demand_mask=mask), [1, 2]
+        )
+        np.testing.assert_array_equal(
+            get_period_peaks(purchased[0], starts, initial_peak=6), [6, 3]
+        )
+        with self.assertRaises(DemandError):
+            get_period_peaks(purchased[0], np.array([1, 3]))
+
+    def test_tracker(self):
+        ends = get_period_ends(np.array([0, 3]), 6)
+        tracker = PeakTracker(ends, demand_charge=10)
+        charges = [
+            tracker.update(step, purchased)
+            for step, purchased in enumerate([1, 3, 2, 1, 0.5, 0])
+        ]
+        self.assertEqual(charges, [0, 0, 30, 0, 0, 10])
+        self.assertEqual(tracker.last_peak, 1)
+        self.assertEqual(tracker.peak, 0)
+
+        # Streaming: tracked, never billed.
+        tracker = PeakTracker(demand_charge=10)
+        self.assertEqual(tracker.update(0, 4), 0)
+        self.assertEqual(tracker.peak, 4)
+
+    def test_trace(self):
+        rng = np.random.default_rng(0)
+        ends = get_period_ends(np.arange(0, 200, 24), 200)
+        mask = rng.random(200) > 0.3
+        purchased = rng.random(200) * 10
+        tracker = PeakTracker(ends, mask, demand_charge=3, interval=0.5)
+        tracker.update(9, 12.0)
+        # From part way through the first period, ending part way through another.
+        expected = PeakTracker(ends, mask, demand_charge=3, interval=0.5)
+        expected.restore(tracker.get_snapshot())
+        steps = range(10, 150)
+        loop = [expected.update(step, purchased[step]) for step in steps]
+        np.testing.assert_allclose(tracker.trace(purchased[10:150], 10), loop)
+        self.assertEqual(tracker.get_snapshot(), (24.0 if mask[9] else 0, 0))
+
+
+class TestControlDemand(unittest.TestCase):
+
+    def test_daily_billing(self):
+        control = Control(demand_charge=50, billing_period="day")
+        control.battery.soc_cuttoff = 0.5
+        peaks = []
+        for _ in range(48):
+            control.balance_energy(0)
+            peaks.append(control.get_current_state()['peak_import'])
+            control.step()
+        self.assertEqual(control.get_current_state()['peak_import'], 0)
+        rows = control.ledger.get_rows()
+        purchased = rows[:, LEDGER_KEYS.index('purchased')]
+        demand = rows[:, LEDGER_KEYS.index('demand_charge')]
+        expected = np.zeros(48)
+        expected[[23, 47]] = [
+            purchased[:24].max() * 50,
+            purchased[24:].max() * 50,
+        ]
+        np.testing.assert_allclose(demand, expected)
+        self.assertEqual(peaks[22], purchased[:23].max())
+
+        # Settled per day, the same as billed by the tracker.
+        bill = control.settle("net_billing", "day")
+        np.testing.assert_allclose(bill['demand_charge'], expected[[23, 47]])
+
+        # The rollout bills the same.
+        control.reset()
+        control.battery.soc_cuttoff = 0.5
+        columns = control.rollout(np.zeros(48))
+        np.testing.assert_allclose(columns['demand_charge'], expected)
+
+    def test_snapshot(self):
+        control = Control(demand_charge=50)
+        for _ in range(5):
+            control.balance_energy(0)
+            control.step()
+        snapshot = control.get_snapshot()
+        peak = control.get_current_state()['peak_import']
+        self.assertGreater(peak, 0)
+        for _ in range(5):
+            control.balance_energy(100)
+            control.step()
+        self.assertGreater(control.get_current_state()['peak_import'], peak)
+        control.restore(snapshot)
+        self.assertEqual(control.get_current_state()['peak_import'], peak)
+
+    def test_tariff_demand_periods(self):
+        tariff = Tariff(
+            (TariffPeriod('peak', 3, hours=((18, 20),)),),
+            default_rate=1,
+            demand_charge=80,
+            demand_periods=('peak',),
+        )
+        control = Control(tariff=tariff, billing_period="day")
+        self.assertEqual(control.peak_tracker.demand_charge, 80)
+        for _ in range(24):
+            control.balance_energy(0)
+            control.step()
+        rows = control.ledger.get_rows()
+        purchased = rows[:, LEDGER_KEYS.index('purchased')]
+        self.assertAlmostEqual(
+            rows[23, LEDGER_KEYS.index('demand_charge')],
+            purchased[18:20].max() * 80,
+        )
+        control.set_tariff(Tariff(default_rate=1))
+        self.assertEqual(control.peak_tracker.demand_charge, 0)
+        self.assertIsNone(control.peak_tracker.demand_mask)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+from microgrid.tariff import Tariff
+import importlib.util
+import numpy as np
+import unittest
+
+GYMNASIUM_INSTALLED = importlib.util.find_spec('gymnasium') is not None
+
+
+@unittest.skipUnless(GYMNASIUM_INSTALLED, "gymnasium is not installed")
+class TestMicrogridEnv(unittest.TestCase):
+
+    def setUp(self):
+        from microgrid.env import MicrogridEnv
+
+        self.env = MicrogridEnv(episode_length=24)
+
+    def tearDown(self):
+        del self.env
+
+    def test_check_env(self):
+        from gymnasium.utils.env_checker import check_env
+
+        check_env(self.env, skip_render_check=True)
+
+    def test_reset_reuses_control(self):
+        control = self.env.control
+        load_values = control.load.load_values
+
+        obs, info = self.env.reset(seed=3)
+        self.assertIs(self.env.control, control)
+        self.assertIs(control.load.load_values, load_values)
+        self.assertEqual(obs[self.env.obs_keys.index('battery_soc')], 0.5)
+
+        # Seeded starts are random but repeatable.
+        _, other_info = self.env.reset(seed=3)
+        self.assertEqual(info['timestep'], other_info['timestep'])
+
+        obs, info = self.env.reset(options={'start_step': 8759 - 23})
+        self.assertEqual(control.current_step, 8736)
+
+    def test_episode(self):
+        self.env.reset(options={'start_step': 100, 'soc': 0.9})
+        total_reward = 0.0
+        for i in range(24):
+            obs, reward, terminated, truncated, info = self.env.step(
+                np.array([50.0])
+            )
+            total_reward += reward
+            self.assertEqual(truncated, i == 23)
+
+        # The reward is the negative of the ledger's cost (no unmet demand with grid top up).
+        totals = self.env.control.ledger.get_totals()
+        self.assertAlmostEqual(total_reward, -totals['cost'], 6)
+
+    def test_tariff_change(self):
+        self.env.control.set_tariff(Tariff(default_rate=25.0))
+        obs, _ = self.env.reset(options={'start_step': 0})
+        self.assertTrue(self.env.observation_space.contains(obs))
+        index = self.env.obs_keys.index('tou_tariff')
+        self.assertEqual(self.env.observation_space.high[index], 25.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
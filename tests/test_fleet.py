@@ -0,0 +1,164 @@
+from microgrid.fleet import Fleet, FleetError, split_fleet_columns
+from microgrid.control import Control
+from microgrid.profiles import clear_profile_cache
+from microgrid import INPUT_FILE
+from pathlib import Path
+import tempfile
+import numpy as np
+import pandas as pd
+import unittest
+
+
+def make_fleet_frame(n_sites: int = 3) -> pd.DataFrame:
+    # Every site gets the data.csv profiles, with the load scaled per site.
+    df = pd.read_csv(INPUT_FILE)
+    frames = {}
+    for i in range(n_sites):
+        site = df[['load', 'solar_gen', 'tou_tariff']].copy()
+        site['load'] = site['load'] * (1 + i / 10)
+        frames[f"site_{i}"] = site
+    return pd.concat(frames, axis=1)
+
+
+class TestFleet(unittest.TestCase):
+
+    def setUp(self):
+        self.df = make_fleet_frame()
+        self.fleet = Fleet.from_frame(self.df, capacity=100)
+
+    def tearDown(self):
+        del self.fleet
+
+    def test_get_current_state(self):
+        state = self.fleet.get_current_state()
+        self.assertEqual(self.fleet.site_names, ['site_0', 'site_1', 'site_2'])
+        np.testing.assert_allclose(
+            state['load'], 96.855 * np.array([1, 1.1, 1.2])
+        )
+        np.testing.assert_array_equal(state['tou_tariff'], 1.2103)
+
+    def test_matches_control(self):
+        # Site 1 of the fleet should do exactly what a Control with the same profiles does.
+        actions = np.tile([20.0] * 6 + [0.0] * 18, 2)
+        fleet = Fleet.from_frame(
+            self.df,
+            site_parameters=pd.DataFrame(
+                {'capacity': [100, 200, 300]},
+                index=['site_0', 'site_1', 'site_2'],
+            ),
+        )
+        control = Control()
+        control.battery._set_battery_capacity(200)
+        for action in actions:
+            result = fleet.balance_energy(action)
+            state = fleet.get_current_state()
+            control._set_state(
+                load=state['load'][1],
+                solar_gen=state['solar_gen'][1],
+                tou_tariff=state['tou_tariff'][1],
+                battery_soc=control.battery.get_soc(),
+            )
+            expected = control.balance_energy(action=action)
+            for key, value in expected.items():
+                self.assertAlmostEqual(result[key][1], value, 9)
+            self.assertAlmostEqual(fleet.soc[1], control.battery.get_soc(), 9)
+            fleet.step()
+            control.step()
+
+    def test_aggregates(self):
+        for _ in range(24):
+            result = self.fleet.balance_energy(10)
+            purchased = result['to_purchase'].copy()
+            self.assertAlmostEqual(
+                self.fleet.grid_import[self.fleet.current_step],
+                purchased.sum(),
+            )
+            self.fleet.step()
+
+        aggregates = self.fleet.get_aggregates()
+        self.assertAlmostEqual(
+            aggregates['grid_import'], self.fleet.grid_import.sum()
+        )
+        self.assertAlmostEqual(
+            aggregates['peak_coincident_demand'],
+            self.fleet.grid_import.max(),
+        )
+        totals = self.fleet.get_site_totals()
+        self.assertAlmostEqual(
+            totals['grid_import'].sum(), aggregates['grid_import']
+        )
+        # The higher load sites buy more.
+        self.assertTrue(totals['grid_import'].is_monotonic_increasing)
+
+        self.fleet.reset()
+        self.assertEqual(self.fleet.get_aggregates()['grid_import'], 0)
+
+    def test_balance_step_again(self):
+        self.fleet.balance_energy(10)
+        # Balancing the same step again replaces it, nothing is counted twice.
+        self.fleet.balance_energy(50)
+        aggregates = self.fleet.get_aggregates()
+        self.assertAlmostEqual(
+            aggregates['grid_import'], self.fleet.grid_import.sum()
+        )
+        self.assertAlmostEqual(aggregates['cost'], self.fleet.fleet_cost.sum())
+        self.assertAlmostEqual(
+            aggregates['unmet_demand'], self.fleet.fleet_unmet_demand.sum()
+        )
+        self.fleet.step()
+        self.fleet.balance_energy(10)
+        self.assertAlmostEqual(
+            self.fleet.get_aggregates()['grid_import'],
+            self.fleet.grid_import.sum(),
+        )
+
+    def test_from_file(self):
+        # Wide csv with a shared tariff column.
+        df = self.df.copy()
+        df.columns = [f"{site}/{field}" for site, field in df.columns]
+        df = df.drop(columns=['site_1/tou_tariff', 'site_2/tou_tariff'])
+        df = df.rename(columns={'site_0/tou_tariff': 'tou_tariff'})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'fleet.csv'
+            df.to_csv(path, index=False)
+            fleet = Fleet.from_file(str(path), capacity=100)
+            clear_profile_cache()
+
+        self.assertEqual(fleet.n_sites, 3)
+        np.testing.assert_allclose(
+            fleet.get_current_state()['load'],
+            self.fleet.get_current_state()['load'],
+        )
+        np.testing.assert_array_equal(fleet.tariffs[:, 2], fleet.tariffs[:, 0])
+
+    def test_from_file_time_interval(self):
+        df = self.df.copy()
+        df.columns = [f"{site}/{field}" for site, field in df.columns]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'fleet.csv'
+            df.to_csv(path, index=False)
+            fleet = Fleet.from_file(
+                str(path), capacity=100, time_interval=0.25
+            )
+            clear_profile_cache()
+
+        # 4x the steps, the energy of each hour split over its 4 steps, the tariffs held.
+        self.assertEqual(fleet.time_interval, 0.25)
+        self.assertEqual(fleet.load_values.shape[0], 4 * 8760)
+        np.testing.assert_allclose(
+            fleet.load_values.sum(axis=0), self.fleet.load_values.sum(axis=0)
+        )
+        np.testing.assert_array_equal(fleet.tariffs[:4, 0], 1.2103)
+        control = Control(time_interval=0.25)
+        np.testing.assert_allclose(
+            fleet.load_values[:, 0], control.load.load_values
+        )
+
+    def test_missing_field(self):
+        columns = {'a/load': np.ones(3), 'a/solar_gen': np.ones(3)}
+        with self.assertRaises(FleetError):
+            split_fleet_columns(columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
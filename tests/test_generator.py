@@ -1,5 +1,6 @@
 from typing import Generator
-from microgrid.generator import Generator
+from microgrid.generator import Generator, GeneratorError
+import numpy as np
 import unittest
 
 
@@ -58,3 +59,68 @@ class TestGenerator(unittest.TestCase):
             500,
             'The generated power was not equal to the max capacity as expected.',
         )
+
+    def test_fuel_curve(self):
+        generator = Generator(
+            capacity=100,
+            cost_diesel=20,
+            fuel_curve=((0.25, 0.5, 1), (0.5, 0.4, 0.3)),
+        )
+        # 50 kW is the 0.5 point: 50 kWh * 0.4 l/kWh * 20
+        self.assertAlmostEqual(
+            generator.calculate_generator_cost(50, 1), 50 * 0.4 * 20
+        )
+        # 75 kW is halfway between 20 and 30 litres per hour
+        self.assertAlmostEqual(
+            generator.calculate_generator_cost(75, 0.5), 25 * 20 * 0.5
+        )
+        # Below the first point the first point's consumption is used.
+        self.assertAlmostEqual(
+            generator.calculate_generator_cost(10, 1), 10 * 0.5 * 20
+        )
+        with self.assertRaises(GeneratorError):
+            Generator(fuel_curve=((0.5, 0.25), (0.4, 0.5)))
+
+    def test_min_load_and_start_up(self):
+        generator = Generator(
+            capacity=100,
+            cost_diesel=20,
+            litre_diesel_per_kWh=0.3,
+            min_load=0.3,
+            start_up_cost=50,
+        )
+        power, cost = generator.run_generators(10, 1)
+        self.assertEqual(power, 30)
+        self.assertAlmostEqual(cost, 30 * 0.3 * 20 + 50)
+        # Already running, no start up cost.
+        power, cost = generator.run_generators(40, 1)
+        self.assertAlmostEqual(cost, 40 * 0.3 * 20)
+        generator.stop()
+        _, cost = generator.run_generators(40, 1)
+        self.assertAlmostEqual(cost, 40 * 0.3 * 20 + 50)
+
+    def test_dispatch_trace(self):
+        generator = Generator(
+            capacity=100,
+            min_load=0.3,
+            start_up_cost=50,
+            fuel_curve=((0.25, 1), (0.45, 0.3)),
+        )
+        unmet = np.array([0, 10, 50, 200, 0, 0, 40, 0.5])
+        interval = 0.5
+        generated, cost, excess = generator.dispatch_trace(unmet, interval)
+
+        # Same as running the generator step by step.
+        for i, demand in enumerate(unmet):
+            if demand > 0:
+                power, expected_cost = generator.run_generators(
+                    demand / interval, interval
+                )
+            else:
+                generator.stop()
+                power, expected_cost = 0, 0
+            self.assertAlmostEqual(generated[i], power * interval)
+            self.assertAlmostEqual(cost[i], expected_cost)
+            self.assertAlmostEqual(
+                excess[i], max(power * interval - demand, 0)
+            )
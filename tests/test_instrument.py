@@ -0,0 +1,98 @@
+from microgrid.instrument import (
+    InstrumentError,
+    Instrumentation,
+    LatencyHistogram,
+)
+from microgrid.battery import Battery
+from microgrid.control import Control
+import json
+import numpy as np
+import unittest
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+        histogram = LatencyHistogram(significant_bits=5)
+        # Neighbouring buckets join up and every value is in its own bucket.
+        for index in range(len(histogram.counts) - 1):
+            self.assertEqual(
+                histogram.get_upper_bound(index) + 1,
+                histogram.get_lower_bound(index + 1),
+            )
+        for value in [0, 31, 32, 1000, 123456789]:
+            index = histogram.get_index(value)
+            self.assertLessEqual(histogram.get_lower_bound(index), value)
+            self.assertGreaterEqual(histogram.get_upper_bound(index), value)
+            # ~3% resolution
+            self.assertLessEqual(
+                histogram.get_upper_bound(index) - value, value / 16 + 1
+            )
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        values = np.random.default_rng(0).integers(1000, 100000, 5000)
+        for value in values.tolist():
+            histogram.record(value)
+        histogram.record(2**50)  # above max_value, goes in the top bucket
+        self.assertEqual(histogram.total_count, 5001)
+        self.assertEqual(len(histogram.counts), histogram.get_index(2**36) + 1)
+        for percentile in [50, 90, 99]:
+            expected = np.percentile(values, percentile)
+            self.assertAlmostEqual(
+                histogram.get_percentile(percentile) / expected, 1, delta=0.05
+            )
+        self.assertEqual(histogram.get_percentile(100), 2**50)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_attach_detach(self):
+        control = Control()
+        control.battery._set_battery_capacity(100)
+        with Instrumentation(control) as instrumentation:
+            for action in [0, 50, 0, 200] * 5:
+                control.balance_energy(action=action)
+                control.step()
+            with self.assertRaises(InstrumentError):
+                instrumentation.attach(control)
+
+        hits = instrumentation.get_branch_hits()
+        self.assertEqual(
+            hits['positive_energy_balance']
+            + hits['artificial_positive_energy_balance']
+            + hits['negative_energy_balance'],
+            20,
+        )
+        self.assertEqual(
+            hits['battery.charge'] + hits['battery.discharge'], 20
+        )
+        self.assertEqual(
+            instrumentation.histograms['update_state'].total_count, 20
+        )
+
+        # Detached: the plain classes again, nothing is recorded.
+        self.assertIs(type(control), Control)
+        self.assertIs(type(control.battery), Battery)
+        control.balance_energy(action=0)
+        self.assertEqual(
+            instrumentation.histograms['balance_energy'].total_count, 20
+        )
+
+        summary = json.loads(instrumentation.to_json())
+        self.assertEqual(summary['latency']['balance_energy']['count'], 20)
+        self.assertEqual(summary['branch_hits'], hits)
+
+        text = instrumentation.to_prometheus()
+        self.assertIn(
+            'microgrid_call_seconds_count{method="balance_energy"} 20', text
+        )
+        self.assertIn(
+            'microgrid_call_seconds_bucket{method="update_state",le="+Inf"} 20',
+            text,
+        )
+        self.assertIn('microgrid_branch_hits_total{branch="', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
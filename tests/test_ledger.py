@@ -0,0 +1,59 @@
+from microgrid.control import Control
+from microgrid.ledger import Ledger, LEDGER_KEYS
+import numpy as np
+import unittest
+
+
+class TestLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.control = Control(start_step=10)
+        self.control.battery._set_battery_capacity(500)
+        self.actions = np.tile([0.0, 50.0, 150.0], 16)
+
+    def tearDown(self):
+        del self.control
+
+    def run_actions(self):
+        for action in self.actions:
+            self.control.balance_energy(action=action)
+            self.control.step()
+
+    def test_matches_rollout(self):
+        expected = self.control.rollout(self.actions)
+        self.run_actions()
+
+        df = self.control.ledger.to_dataframe()
+        self.assertEqual(df.index[0], 10)
+        self.assertEqual(len(df), len(self.actions))
+        np.testing.assert_array_equal(df['purchased'], expected['to_purchase'])
+        np.testing.assert_array_equal(df['cost'], expected['cost'])
+        np.testing.assert_array_equal(df['soc'], expected['soc'])
+
+        totals = self.control.ledger.get_totals()
+        self.assertAlmostEqual(totals['cost'], expected['cost'].sum(), 9)
+        self.assertEqual(totals['soc'], expected['soc'][-1])
+
+    def test_zero_copy_exports(self):
+        self.run_actions()
+        ledger = self.control.ledger
+
+        records = ledger.to_records()
+        self.assertEqual(records.dtype.names, LEDGER_KEYS)
+        self.assertTrue(np.shares_memory(records, ledger.data))
+        self.assertTrue(
+            np.shares_memory(ledger.to_dataframe().to_numpy(), ledger.data)
+        )
+
+    def test_clear(self):
+        ledger = Ledger(n_steps=5)
+        ledger.record(2, 1, 2, 3, 4, 5, 6, 0.5)
+        self.assertEqual(len(ledger.to_records()), 1)
+
+        ledger.clear()
+        self.assertEqual(len(ledger.to_records()), 0)
+        self.assertEqual(ledger.data.sum(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
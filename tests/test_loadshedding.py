@@ -0,0 +1,128 @@
+from microgrid.loadshedding import (
+    LoadsheddingError,
+    generate_availability,
+    get_outage_hours,
+    outage_availability,
+    read_outages,
+)
+from microgrid.batch import BatchControl
+from microgrid.control import Control
+from microgrid.generator import Generator
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestSchedule(unittest.TestCase):
+
+    def test_stage_fraction(self):
+        # One full rotation is 16 slots of 2 hours.
+        for stage in range(9):
+            availability = generate_availability(32 * 10, stage)
+            self.assertAlmostEqual(1 - availability.mean(), stage / 16)
+        # Every outage at stage 2 is also an outage at stage 4.
+        stage_2 = generate_availability(8760, 2, block=3)
+        stage_4 = generate_availability(8760, 4, block=3)
+        self.assertTrue(np.all(stage_2[stage_4]))
+        # Outages are whole 2 hour slots.
+        hours, n_outages = get_outage_hours(stage_2)
+        self.assertEqual(hours, 2 * n_outages)
+        with self.assertRaises(LoadsheddingError):
+            generate_availability(10, 9)
+
+    def test_blocks_and_stage_per_step(self):
+        block_1 = generate_availability(32, 1, block=1)
+        block_2 = generate_availability(32, 1, block=2)
+        self.assertFalse(np.array_equal(block_1, block_2))
+        # Stage changes during the horizon.
+        stage = np.repeat([0, 6], 16)
+        availability = generate_availability(32, stage)
+        self.assertTrue(np.all(availability[:16]))
+        self.assertEqual(
+            availability[16:].tolist(),
+            generate_availability(32, 6)[16:].tolist(),
+        )
+
+    def test_outages(self):
+        availability = outage_availability([(2, 4), (10.5, 11)], 12, 0.5)
+        self.assertEqual(np.flatnonzero(~availability).tolist(), [4, 5, 6, 7])
+        availability = outage_availability([(2, 4), (10.5, 11)], 24, 0.5)
+        self.assertEqual(
+            np.flatnonzero(~availability).tolist(), [4, 5, 6, 7, 21]
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'outages.csv')
+            with open(path, 'w') as f:
+                f.write("start_hour,end_hour\n2,4\n10.5,11\n")
+            np.testing.assert_array_equal(
+                read_outages(path, 24, 0.5), availability
+            )
+            with open(path, 'w') as f:
+                f.write("start,end\n2,4\n")
+            with self.assertRaises(LoadsheddingError):
+                read_outages(path, 24)
+
+
+class TestLoadshedding(unittest.TestCase):
+
+    def setUp(self):
+        self.availability = generate_availability(8760, 4, block=5)
+
+    def test_no_purchase_during_outage(self):
+        control = Control(availability=self.availability)
+        control.battery._set_battery_capacity(200)
+        self.assertEqual(
+            control.get_loadshedding_forecast(48).tolist(),
+            self.availability[:48].tolist(),
+        )
+        for _ in range(48):
+            result = control.balance_energy(action=50)
+            if not control.grid.is_available(control.current_step):
+                self.assertEqual(result['to_purchase'], 0)
+            control.step()
+        ledger = control.ledger.to_dataframe()
+        self.assertEqual(ledger['purchased'][~self.availability[:48]].sum(), 0)
+        self.assertGreater(ledger['unmet_demand'].sum(), 0)
+
+    def test_rollout_and_batch_match_control(self):
+        actions = np.random.default_rng(2).choice([0, 20, 80], 200)
+        generator = Generator(capacity=60, min_load=0.3, start_up_cost=10)
+        control = Control(
+            start_step=10, availability=self.availability, generator=generator
+        )
+        control.battery._set_battery_capacity(300)
+        out = control.rollout(actions)
+
+        batch = BatchControl(
+            n_envs=2,
+            start_step=10,
+            capacity=300,
+            C_rate=control.battery.C_rate,
+            efficiency=control.battery.efficiency,
+            soc_cuttoff=control.battery.soc_cuttoff,
+            availability=self.availability,
+            generator=Generator(capacity=60, min_load=0.3, start_up_cost=10),
+        )
+        for i, action in enumerate(actions):
+            expected = batch.balance_energy(action)
+            batch.step()
+            result = control.balance_energy(action=action)
+            control.step()
+            self.assertAlmostEqual(
+                out['to_purchase'][i], result['to_purchase']
+            )
+            self.assertAlmostEqual(
+                out['unmet_demand'][i], result['unmet_demand_this_step']
+            )
+            self.assertAlmostEqual(
+                out['generator_cost'][i], result['generator_cost_this_step']
+            )
+            for key, value in result.items():
+                self.assertAlmostEqual(expected[key][0], value)
+        self.assertGreater(out['generated'].sum(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
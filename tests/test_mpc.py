@@ -0,0 +1,53 @@
+from microgrid.control import Control
+from microgrid.mpc import MPCController
+import numpy as np
+import unittest
+
+
+class TestMPCController(unittest.TestCase):
+
+    def setUp(self):
+        self.control = Control(start_step=24 * 30)
+        self.control.battery._set_battery_capacity(1000)
+
+    def tearDown(self):
+        del self.control
+
+    def test_cheaper_than_doing_nothing(self):
+        n_steps = 72
+        # What it would cost to only buy what is needed.
+        baseline = self.control.rollout(np.zeros(n_steps))
+
+        ledger = MPCController(self.control, horizon=24).run(n_steps)
+
+        self.assertEqual(len(ledger), n_steps)
+        self.assertLess(ledger['cost'].sum(), baseline['cost'].sum())
+        self.assertAlmostEqual(ledger['unmet_demand'].sum(), 0, 6)
+
+    def test_outages(self):
+        available = np.ones(8760, dtype=bool)
+        available[
+            (np.arange(8760) % 24 >= 17) & (np.arange(8760) % 24 < 21)
+        ] = False
+        control = Control(start_step=24 * 30, availability=available)
+        control.battery._set_battery_capacity(3000)
+
+        # The LP knows the grid is off, so it doesn't plan a purchase it can't make.
+        control._set_step(24 * 30 + 17)
+        self.assertEqual(MPCController(control).get_action(), 0)
+        control._set_step(24 * 30)
+
+        ledger = MPCController(control, horizon=24).run(48)
+        off = ~available[24 * 30 : 24 * 30 + 48]
+        np.testing.assert_array_equal(ledger['purchased'].to_numpy()[off], 0)
+        # It charged ahead of the outages instead of leaving the load unmet.
+        self.assertAlmostEqual(ledger['unmet_demand'].sum(), 0, 6)
+
+    def test_solvers_agree(self):
+        scipy_action = MPCController(self.control, solver="scipy").get_action()
+        auto_action = MPCController(self.control).get_action()
+        self.assertAlmostEqual(scipy_action, auto_action, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
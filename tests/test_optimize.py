@@ -0,0 +1,116 @@
+from microgrid.control import Control
+from microgrid.optimize import (
+    DispatchLP,
+    build_dispatch_matrix,
+    solve_perfect_foresight,
+    highspy,
+    LP_VARIABLES,
+    OptimizeError,
+)
+import numpy as np
+import unittest
+
+
+class TestDispatchLP(unittest.TestCase):
+
+    def setUp(self):
+        # Cheap then expensive energy, the battery should cover the expensive step.
+        self.profiles = {
+            'load': np.array([10.0, 10.0, 10.0]),
+            'solar_gen': np.array([0.0, 0.0, 4.0]),
+            'tariffs': np.array([1.0, 10.0, 1.0]),
+        }
+        self.battery = {
+            'soc': 0.5,
+            'capacity': 100,
+            'C_rate': 0.2,
+            'soc_cuttoff': 0.4,
+        }
+
+    def test_build_dispatch_matrix(self):
+        A = build_dispatch_matrix(n_steps=3, efficiency=0.9)
+        self.assertEqual(A.shape, (6, 3 * len(LP_VARIABLES)))
+        # 5 entries per balance row, 3 per energy row plus the link to the previous step.
+        self.assertEqual(A.nnz, 5 * 3 + 3 * 3 + 2)
+
+    def check_solver(self, solver: str):
+        lp = DispatchLP(n_steps=3, efficiency=0.9, solver=solver)
+        solution = lp.solve(**self.profiles, **self.battery)
+
+        # The battery covers the expensive step, topped up at the cheap step before so it stays above the cutoff.
+        top_up = (10 / 0.9 - 10) / 0.9
+        self.assertAlmostEqual(solution['discharge'][1], 10.0, 6)
+        self.assertAlmostEqual(solution['grid'][1], 0.0, 6)
+        self.assertAlmostEqual(solution['grid'][0], 10 + top_up, 6)
+        self.assertAlmostEqual(solution['objective'], 10 + top_up + 6, 6)
+        self.assertTrue(np.all(solution['energy'] >= 40 - 1e-9))
+
+        # Solving again with other profiles reuses the model.
+        # Now there is no chance to top up first, so only the cutoff stops the battery covering all of it.
+        self.profiles['tariffs'] = np.array([10.0, 1.0, 1.0])
+        solution = lp.solve(**self.profiles, **self.battery)
+        self.assertAlmostEqual(solution['discharge'][0], 9.0, 6)
+        self.assertAlmostEqual(solution['grid'][0], 1.0, 6)
+
+    def test_scipy(self):
+        self.check_solver("scipy")
+
+    @unittest.skipIf(highspy is None, "highspy is not installed")
+    def test_highspy(self):
+        self.check_solver("highspy")
+
+
+class TestPerfectForesight(unittest.TestCase):
+
+    def setUp(self):
+        self.control = Control(start_step=24 * 100)
+        self.control.battery._set_battery_capacity(1000)
+
+    def tearDown(self):
+        del self.control
+
+    def test_replay(self):
+        n_steps = 24 * 7
+        solution = solve_perfect_foresight(self.control, n_steps=n_steps)
+        self.assertEqual(len(solution['actions']), n_steps)
+
+        replay = self.control.rollout(solution['actions'])
+        baseline = self.control.rollout(np.zeros(n_steps))
+
+        # The LP is a relaxation of the simulator, so it is a lower bound on the cost.
+        self.assertLessEqual(
+            solution['objective'], replay['cost'].sum() + 1e-6
+        )
+        self.assertLess(replay['cost'].sum(), baseline['cost'].sum())
+        # and the replayed dispatch should get close to it.
+        self.assertLess(replay['cost'].sum(), 1.05 * solution['objective'])
+        self.assertAlmostEqual(replay['unmet_demand'].sum(), 0, 6)
+
+    def test_outages(self):
+        # Loadshedding 17:00 -> 21:00 every day, the dearest hours.
+        available = np.ones(8760, dtype=bool)
+        available[
+            (np.arange(8760) % 24 >= 17) & (np.arange(8760) % 24 < 21)
+        ] = False
+        control = Control(start_step=24 * 100, availability=available)
+        control.battery._set_battery_capacity(3000)
+        n_steps = 24 * 7
+        solution = solve_perfect_foresight(control, n_steps=n_steps)
+        off = ~available[control.current_step : control.current_step + n_steps]
+        np.testing.assert_array_equal(solution['actions'][off], 0)
+
+        # Still a bound on the replayed cost, and the battery covers the outages.
+        replay = control.rollout(solution['actions'])
+        self.assertLessEqual(
+            solution['objective'], replay['cost'].sum() + 1e-6
+        )
+        self.assertLess(replay['cost'].sum(), 1.05 * solution['objective'])
+        self.assertAlmostEqual(replay['unmet_demand'].sum(), 0, 6)
+
+    def test_past_end_of_year(self):
+        with self.assertRaises(OptimizeError):
+            solve_perfect_foresight(self.control, n_steps=8760)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+from microgrid.profiles import (
+    load_profiles,
+    clear_profile_cache,
+    get_forecast_windows,
+    convert_csv_to_bundle,
+    resample_columns,
+    ProfileError,
+)
+import numpy as np
+from microgrid.solar import Solar
+from microgrid.load import Load
+from microgrid.grid import Grid
+import os
+import tempfile
+import unittest
+
+
+class TestProfiles(unittest.TestCase):
+
+    def setUp(self):
+        clear_profile_cache()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.tmp_dir.name, 'data.csv')
+        with open(self.input_file, 'w') as f:
+            f.write('load,solar_gen,tou_tariff\n1,2,3\n4,5,6\n')
+
+    def tearDown(self):
+        clear_profile_cache()
+        self.tmp_dir.cleanup()
+
+    def test_parsed_once(self):
+        # The same file should give back the exact same store.
+        first = load_profiles(self.input_file)
+        second = load_profiles(self.input_file)
+        self.assertIs(first, second)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(first['solar_gen'].tolist(), [2, 5])
+
+    def test_components_share_arrays(self):
+        solar = Solar(input_file=self.input_file)
+        load = Load(input_file=self.input_file)
+        grid = Grid(input_file=self.input_file)
+        profiles = load_profiles(self.input_file)
+
+        self.assertIs(solar.solar_generation, profiles['solar_gen'])
+        self.assertIs(load.load_values, profiles['load'])
+        self.assertIs(grid.tariffs, profiles['tou_tariff'])
+        self.assertEqual(load.get_current_load(1), 4)
+
+    def test_read_only(self):
+        profiles = load_profiles(self.input_file)
+        with self.assertRaises(ValueError):
+            profiles['load'][0] = 10
+
+    def test_modified_file_is_reloaded(self):
+        first = load_profiles(self.input_file)
+        with open(self.input_file, 'w') as f:
+            f.write('load,solar_gen,tou_tariff\n7,8,9\n')
+        # make sure the modification time moves even on coarse clocks.
+        stat = os.stat(self.input_file)
+        os.utime(
+            self.input_file,
+            ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000),
+        )
+
+        second = load_profiles(self.input_file)
+        self.assertIsNot(first, second)
+        self.assertEqual(second['load'].tolist(), [7])
+
+    def test_bundle(self):
+        bundle_dir = os.path.join(self.tmp_dir.name, 'bundle')
+        convert_csv_to_bundle(self.input_file, bundle_dir)
+
+        profiles = load_profiles(bundle_dir)
+        self.assertEqual(
+            profiles.get_column_names(), ['load', 'solar_gen', 'tou_tariff']
+        )
+        self.assertEqual(profiles['tou_tariff'].tolist(), [3, 6])
+        # The columns are memory mapped, not read into private memory.
+        self.assertIsInstance(profiles['load'].base, np.memmap)
+
+        grid = Grid(input_file=bundle_dir)
+        self.assertEqual(grid.get_current_tariff(1), 6)
+
+    def test_broken_bundle(self):
+        bundle_dir = os.path.join(self.tmp_dir.name, 'bundle')
+        convert_csv_to_bundle(self.input_file, bundle_dir)
+        os.remove(os.path.join(bundle_dir, 'load.npy'))
+        with self.assertRaises(ProfileError):
+            load_profiles(bundle_dir)
+
+    def test_invalid_csv_to_bundle(self):
+        bundle_dir = os.path.join(self.tmp_dir.name, 'bundle')
+        with open(self.input_file, 'w') as f:
+            f.write('load,solar_gen,tou_tariff\n1,2,x\n4,5,6\n')
+        with self.assertRaises(ProfileError) as error:
+            convert_csv_to_bundle(self.input_file, bundle_dir)
+        self.assertIn("col 'tou_tariff' is not numeric", str(error.exception))
+        # Nothing is written for a file that fails.
+        self.assertFalse(os.path.exists(bundle_dir))
+        with self.assertRaises(ProfileError) as error:
+            convert_csv_to_bundle(self.input_file, bundle_dir, schema=None)
+        self.assertIn("'tou_tariff'", str(error.exception))
+
+        with open(self.input_file, 'w') as f:
+            f.write('load,solar_gen,tou_tariff\n-1,2,3\n')
+        with self.assertRaises(ProfileError):
+            convert_csv_to_bundle(self.input_file, bundle_dir)
+
+
+class TestResample(unittest.TestCase):
+
+    def setUp(self):
+        clear_profile_cache()
+        self.columns = {
+            'load': np.array([4.0, 8.0, 0.0, 4.0]),
+            'tou_tariff': np.array([1.0, 2.0, 3.0, 4.0]),
+        }
+
+    def test_upsample(self):
+        # Hourly -> 15 min. Energy per step is divided over the new steps, tariffs are held.
+        held = resample_columns(self.columns, 1, 0.25, method="hold")
+        self.assertEqual(held['load'][:4].tolist(), [1, 1, 1, 1])
+        self.assertEqual(held['tou_tariff'][:5].tolist(), [1, 1, 1, 1, 2])
+        self.assertEqual(held['load'].sum(), self.columns['load'].sum())
+
+        interpolated = resample_columns(self.columns, 1, 0.5)
+        self.assertEqual(len(interpolated['load']), 8)
+        # Linear between the hour midpoints: (0.75 * 4 + 0.25 * 8) kW * 0.5 h
+        self.assertAlmostEqual(interpolated['load'][1], 2.5)
+        self.assertEqual(interpolated['tou_tariff'].tolist()[:2], [1, 1])
+
+    def test_downsample(self):
+        aggregated = resample_columns(self.columns, 1, 2)
+        self.assertEqual(aggregated['load'].tolist(), [12, 4])
+        self.assertEqual(aggregated['tou_tariff'].tolist(), [1.5, 3.5])
+
+        with self.assertRaises(ProfileError):
+            resample_columns(self.columns, 1, 3)
+        with self.assertRaises(ProfileError):
+            resample_columns(self.columns, 1, 0.4)
+
+    def test_load_profiles_cached(self):
+        hourly = load_profiles()
+        quarter_hourly = load_profiles(time_interval=0.25)
+        self.assertIs(load_profiles(time_interval=0.25), quarter_hourly)
+        self.assertIs(load_profiles(time_interval=1), hourly)
+        self.assertEqual(len(quarter_hourly), 4 * len(hourly))
+        self.assertEqual(quarter_hourly.interval, 0.25)
+        # Interpolating keeps (almost) the same energy over the year.
+        self.assertAlmostEqual(
+            quarter_hourly['load'].sum() / hourly['load'].sum(), 1, 3
+        )
+
+
+class TestForecastWindows(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.arange(10.0)
+
+    def test_wrap(self):
+        windows = get_forecast_windows(self.values, horizon=4)
+        self.assertEqual(windows.shape, (10, 4))
+        self.assertEqual(windows[0].tolist(), [0, 1, 2, 3])
+        # Past the end of the year it carries on from the start.
+        self.assertEqual(windows[8].tolist(), [8, 9, 0, 1])
+
+    def test_edge(self):
+        windows = get_forecast_windows(self.values, horizon=4, mode="edge")
+        self.assertEqual(windows[8].tolist(), [8, 9, 9, 9])
+
+    def test_views_are_cached(self):
+        windows = get_forecast_windows(self.values, horizon=4)
+        self.assertIs(get_forecast_windows(self.values, horizon=4), windows)
+        # Neighbouring windows share memory, so the matrix isn't T*horizon floats.
+        self.assertTrue(np.shares_memory(windows[0], windows[1]))
+        self.assertFalse(windows.flags.writeable)
+
+    def test_stacked(self):
+        windows = get_forecast_windows((self.values, -self.values), horizon=3)
+        self.assertEqual(windows.shape, (10, 3, 2))
+        self.assertEqual(windows[9].tolist(), [[9, -9], [0, 0], [1, -1]])
+
+    def test_bad_mode(self):
+        with self.assertRaises(ProfileError):
+            get_forecast_windows(self.values, mode="nearest")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+from microgrid.realtime import RealtimeRunner, RealtimeError
+from microgrid.control import Control
+from microgrid.stream import QueueSource, IteratorSource
+import asyncio
+import unittest
+
+
+def make_control() -> Control:
+    source = QueueSource()
+    source.put((10, 2, 1.0))
+    control = Control(source=source)
+    control.battery._set_battery_capacity(100)
+    return control
+
+
+class TestRealtimeRunner(unittest.TestCase):
+
+    def test_run(self):
+        records = []
+
+        async def sink(record):
+            await asyncio.sleep(0)
+            records.append(record)
+
+        async def main():
+            runner = RealtimeRunner(
+                make_control(),
+                policy=lambda control: 5.0,
+                tick_interval=0.05,
+                sink=sink,
+            )
+            for load in (20, 30):
+                runner.meter.put_nowait((load, 0))
+            runner.tariffs.put_nowait(2.0)
+            return await runner.run(n_ticks=4), runner
+
+        metrics, runner = asyncio.run(main())
+
+        self.assertEqual(metrics.ticks, 4)
+        self.assertEqual([r['step'] for r in records], [0, 1, 2, 3])
+        # The second read replaced the first before it was used, the last two ticks had no new read.
+        self.assertEqual(metrics.dropped_inputs, 1)
+        self.assertEqual(metrics.missed_inputs, 2)
+        # They gave up on the read at input_timeout and still finished on time.
+        self.assertEqual(metrics.missed_deadlines, 0)
+        state = runner.control.get_current_state()
+        self.assertEqual((state['load'], state['tou_tariff']), (30, 2.0))
+
+        # Same numbers as balancing a Control by hand.
+        control = Control(source=IteratorSource([(10, 2, 1.0), (30, 0, 2.0)]))
+        control.battery._set_battery_capacity(100)
+        self.assertEqual(
+            records[0]['to_purchase'],
+            control.balance_energy(action=5.0)['to_purchase'],
+        )
+        control.step()
+        self.assertEqual(
+            records[1]['to_purchase'],
+            control.balance_energy(action=5.0)['to_purchase'],
+        )
+
+    def test_drop_backpressure(self):
+        async def main():
+            runner = RealtimeRunner(
+                make_control(),
+                policy=lambda control: 0.0,
+                tick_interval=0.001,
+                output_maxsize=2,
+                backpressure="drop",
+            )
+            return await runner.run(n_ticks=5), runner
+
+        metrics, runner = asyncio.run(main())
+        self.assertEqual(runner.output.qsize(), 2)
+        self.assertEqual(metrics.dropped_records, 3)
+        self.assertEqual(metrics.to_dict()['ticks'], 5)
+
+    def test_sink_errors(self):
+        records = []
+
+        async def sink(record):
+            if record['step'] % 2:
+                raise IOError("disk full")
+            records.append(record)
+
+        async def main():
+            runner = RealtimeRunner(
+                make_control(),
+                policy=lambda control: 0.0,
+                tick_interval=0.001,
+                sink=sink,
+                output_maxsize=1,
+                backpressure="block",
+            )
+            # Would hang on the full queue if the writer died with the sink.
+            metrics = await asyncio.wait_for(runner.run(n_ticks=6), 5)
+            return metrics, runner
+
+        metrics, runner = asyncio.run(main())
+        self.assertEqual(metrics.ticks, 6)
+        self.assertEqual(metrics.sink_errors, 3)
+        self.assertIsInstance(runner.sink_error, IOError)
+        self.assertEqual([r['step'] for r in records], [0, 2, 4])
+
+    def test_needs_queue_source(self):
+        with self.assertRaises(RealtimeError):
+            RealtimeRunner(Control(), policy=lambda control: 0.0)
+        with self.assertRaises(RealtimeError):
+            RealtimeRunner(
+                make_control(),
+                policy=lambda control: 0.0,
+                deadline=0.01,
+                input_timeout=0.01,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+from microgrid.control import Control
+from microgrid.rollout import ROLLOUT_KEYS, RolloutError, njit, round_digits
+import numpy as np
+import unittest
+
+
+class TestRollout(unittest.TestCase):
+
+    def setUp(self):
+        self.control = Control(start_step=100)
+        self.control.battery._set_battery_capacity(500)
+        self.control.battery.C_rate = 0.25
+
+        rng = np.random.default_rng(1)
+        self.actions = rng.choice([0, 0, 10, 50, 150], 500).astype(float)
+
+    def tearDown(self):
+        del self.control
+
+    def step_by_step(self) -> np.ndarray:
+        """The slow reference: balance_energy + step for every action."""
+        control = Control(start_step=100)
+        control.battery._set_battery_capacity(500)
+        control.battery.C_rate = 0.25
+
+        rows = []
+        # Python floats, like the env passes: np.float64 would round like numba and hide a mismatch.
+        for action in self.actions.tolist():
+            result = control.balance_energy(action=action)
+            rows.append(
+                [
+                    result['to_purchase'],
+                    result['charged_this_step'],
+                    result['discharged_this_step'],
+                    result['excess_this_step'],
+                    result['unmet_demand_this_step'],
+                    control.battery.get_soc(),
+                    result['to_purchase'] * control.state['tou_tariff'],
+                ]
+            )
+            control.step()
+        return np.array(rows)
+
+    def check_backend(self, backend: str):
+        expected = self.step_by_step()
+        result = self.control.rollout(self.actions, backend=backend)
+
+        for i, key in enumerate(ROLLOUT_KEYS):
+            np.testing.assert_array_equal(result[key], expected[:, i])
+
+        # The rollout doesn't move the simulation on.
+        self.assertEqual(self.control.current_step, 100)
+        self.assertEqual(self.control.battery.get_soc(), 0.5)
+
+    def test_python_backend(self):
+        self.check_backend("python")
+
+    @unittest.skipIf(njit is None, "numba is not installed")
+    def test_numba_backend(self):
+        self.check_backend("numba")
+
+    def test_continuous_actions(self):
+        self.actions = np.random.default_rng(2).uniform(0, 60, 2000)
+        self.check_backend("python")
+        if njit is not None:
+            self.check_backend("numba")
+
+    def test_round_digits(self):
+        # 13 digit values, where numba's own round(x, 12) is often an ulp off.
+        values = np.round(np.random.default_rng(3).uniform(-1, 1, 5000), 13)
+        backends = [round_digits]
+        if njit is not None:
+            backends.append(njit(lambda x, digits: round_digits(x, digits)))
+        for value in values.tolist():
+            for digits in (6, 12):
+                for backend in backends:
+                    self.assertEqual(
+                        backend(value, digits), round(value, digits)
+                    )
+
+    def test_past_end_of_year(self):
+        with self.assertRaises(RolloutError):
+            self.control.rollout(np.zeros(8760))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+from microgrid.schema import (
+    Column,
+    PROFILE_SCHEMA,
+    Schema,
+    SchemaError,
+    hash_file,
+)
+from microgrid.profiles import (
+    load_profiles,
+    clear_profile_cache,
+    convert_csv_to_bundle,
+    ProfileError,
+)
+from microgrid import schema as schema_module
+from microgrid import profiles as profiles_module
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.columns = {
+            'a/load': np.array([1.0, 2.0, 3.0]),
+            'a/solar_gen': np.array([0.0, 1.0, 0.0]),
+            'tou_tariff': np.array([1.2, 1.2, 2.5]),
+        }
+        self.timestamps = np.datetime64('2024-01-01T00:00') + np.arange(
+            3
+        ) * np.timedelta64(30, 'm')
+
+    def test_valid(self):
+        # Fleet columns match the rules by their field.
+        self.assertEqual(
+            PROFILE_SCHEMA.validate(self.columns, self.timestamps, 0.5), []
+        )
+
+    def test_problems(self):
+        self.columns['a/load'][1] = np.nan
+        self.columns['tou_tariff'][2] = -1
+        del self.columns['a/solar_gen']
+        self.columns['name'] = np.array(['x', 'y', 'z'])
+        problems = PROFILE_SCHEMA.validate(self.columns, self.timestamps, 1)
+        self.assertEqual(
+            problems,
+            [
+                "col 'a/load' has 1 NaN value(s), first at row 1",
+                "col 'tou_tariff' has values below 0 (-1.0), first at row 2",
+                "col 'name' is not numeric (dtype <U1)",
+                "timestamps are not 1 h apart (a gap or duplicate) at row 1",
+            ],
+        )
+        with self.assertRaises(SchemaError):
+            PROFILE_SCHEMA.check(self.columns)
+
+    def test_custom_schema(self):
+        schema = Schema(
+            (
+                Column('load', max_value=2.5),
+                Column('price'),
+                Column('extra', required=False),
+            ),
+            n_steps=4,
+        )
+        timestamps = self.timestamps[[0, 2, 1]]
+        problems = schema.validate(self.columns, timestamps, 0.5)
+        self.assertEqual(
+            problems,
+            [
+                "missing required col 'price'",
+                "3 rows, expected 4",
+                "col 'a/load' has values above 2.5 (3.0), first at row 2",
+                "timestamps are not increasing at row 2",
+                "timestamps are not 0.5 h apart (a gap or duplicate) at row 1",
+            ],
+        )
+
+
+class TestLoadProfiles(unittest.TestCase):
+
+    def setUp(self):
+        clear_profile_cache()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.tmp_dir.name, 'data.csv')
+
+    def tearDown(self):
+        clear_profile_cache()
+        self.tmp_dir.cleanup()
+
+    def write(self, text: str, path: str = None) -> str:
+        path = path or self.input_file
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_timestamps(self):
+        self.write(
+            'timestamp,load,solar_gen,tou_tariff\n'
+            '2024-01-01 00:00,1,0,2\n2024-01-01 01:00,2,1,2\n'
+        )
+        profiles = load_profiles(self.input_file)
+        self.assertEqual(
+            profiles.get_column_names(), ['load', 'solar_gen', 'tou_tariff']
+        )
+        self.assertEqual(
+            profiles.timestamps[1], np.datetime64('2024-01-01T01:00')
+        )
+        half_hourly = load_profiles(self.input_file, time_interval=0.5)
+        self.assertEqual(
+            half_hourly.timestamps[-1], np.datetime64('2024-01-01T01:30')
+        )
+
+        bundle = convert_csv_to_bundle(
+            self.input_file, os.path.join(self.tmp_dir.name, 'bundle')
+        )
+        np.testing.assert_array_equal(
+            load_profiles(bundle).timestamps, profiles.timestamps
+        )
+
+    def test_invalid_file(self):
+        self.write('load,solar_gen,tou_tariff\n1,2,3\n-4,5,6\n')
+        with self.assertRaises(ProfileError) as error:
+            load_profiles(self.input_file)
+        self.assertIn("col 'load' has values below 0", str(error.exception))
+        # Skipping the schema
+        self.assertEqual(
+            load_profiles(self.input_file, schema=None)['load'][1], -4
+        )
+
+        # A gap after the first row.
+        self.write(
+            'timestamp,load,solar_gen,tou_tariff\n'
+            '2024-01-01 00:00,1,0,2\n2024-01-01 01:00,2,1,2\n'
+            '2024-01-01 03:00,2,1,2\n'
+        )
+        with self.assertRaises(ProfileError):
+            load_profiles(self.input_file)
+
+    def test_native_interval(self):
+        rows = ''.join(
+            f'2024-01-01 00:{15 * i:02d},{i + 1},0,2\n' for i in range(4)
+        )
+        self.write('timestamp,load,solar_gen,tou_tariff\n' + rows)
+        # 15 minute rows, from the timestamps.
+        profiles = load_profiles(self.input_file)
+        self.assertEqual(profiles.interval, 0.25)
+        hourly = load_profiles(self.input_file, time_interval=1)
+        np.testing.assert_array_equal(hourly['load'], [10])
+        bundle = convert_csv_to_bundle(
+            self.input_file, os.path.join(self.tmp_dir.name, 'bundle')
+        )
+        self.assertEqual(load_profiles(bundle).interval, 0.25)
+
+        # Without timestamps the interval has to be given, hourly otherwise.
+        self.write('load,solar_gen,tou_tariff\n1,0,2\n2,0,2\n')
+        self.assertEqual(load_profiles(self.input_file).interval, 1)
+        profiles = load_profiles(self.input_file, interval=0.5)
+        self.assertEqual(profiles.interval, 0.5)
+        np.testing.assert_array_equal(
+            load_profiles(self.input_file, 1, interval=0.5)['load'], [3]
+        )
+
+    def test_cached_by_hash(self):
+        text = 'load,solar_gen,tou_tariff\n1,2,3\n4,5,6\n'
+        copy = self.write(text, os.path.join(self.tmp_dir.name, 'copy.csv'))
+        self.write(text)
+        self.assertEqual(hash_file(self.input_file), hash_file(copy))
+
+        calls = []
+        check = Schema.check
+
+        def counted_check(*args, **kwargs):
+            calls.append(args)
+            return check(*args, **kwargs)
+
+        Schema.check = counted_check
+        try:
+            load_profiles(self.input_file)
+            load_profiles(self.input_file)
+            # Same content in another file: not validated again.
+            load_profiles(copy)
+        finally:
+            Schema.check = check
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(schema_module._VALIDATED), 1)
+
+    def test_file_key(self):
+        self.write('load,solar_gen,tou_tariff\n1,2,3\n4,5,6\n')
+        bundle = convert_csv_to_bundle(
+            self.input_file, os.path.join(self.tmp_dir.name, 'bundle')
+        )
+        calls = []
+        get_file_key = profiles_module._get_file_key
+
+        def counted_key(path):
+            calls.append(path)
+            return get_file_key(path)
+
+        profiles_module._get_file_key = counted_key
+        try:
+            # No schema, nothing to key.
+            profiles = load_profiles(bundle, schema=None)
+            self.assertEqual(calls, [])
+            self.assertIsNone(profiles.file_hash)
+            # The key is only found once a schema needs it.
+            load_profiles(bundle)
+            self.assertEqual(len(calls), 1)
+        finally:
+            profiles_module._get_file_key = get_file_key
+
+        # A bundle is keyed on the file stats, not the column contents.
+        key = get_file_key(bundle)
+        self.assertEqual(get_file_key(bundle), key)
+        column = bundle / 'load.npy'
+        stat = os.stat(column)
+        np.save(column, np.array([7.0, 8.0]))
+        os.utime(column, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertNotEqual(get_file_key(bundle), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
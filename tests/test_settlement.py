@@ -0,0 +1,149 @@
+from microgrid.settlement import (
+    SettlementError,
+    get_window_starts,
+    settle,
+)
+from microgrid.control import Control
+from microgrid.grid import Grid
+from microgrid.ledger import LEDGER_KEYS
+from microgrid.tariff import Tariff, TariffPeriod
+from microgrid.timeindex import TimeIndex
+import numpy as np
+import unittest
+
+
+class TestExport(unittest.TestCase):
+
+    def test_export_energy(self):
+        grid = Grid(feed_in_power_rating=5)
+        self.assertEqual(grid.export_energy(3, 0), (3, 0))
+        self.assertEqual(grid.export_energy(8, 0), (5, 3))
+        self.assertEqual(grid.export_energy(8, 0, interval=0.5), (2.5, 5.5))
+        self.assertEqual(grid.export_energy(0, 0), (0, 0))
+        # Nothing goes out during loadshedding.
+        availability = np.ones(8760, dtype=bool)
+        availability[1] = False
+        grid.set_availability(availability)
+        self.assertEqual(grid.export_energy(3, 1), (0, 3))
+
+        exported, curtailed = grid.export_trace(np.array([3, 8, 3]), 0)
+        np.testing.assert_array_equal(exported, [3, 0, 3])
+        np.testing.assert_array_equal(curtailed, [0, 8, 0])
+
+    def test_feed_in_tariffs(self):
+        self.assertTrue(
+            np.all(Grid(feed_in_tariff=0.7).feed_in_tariffs == 0.7)
+        )
+        tariff = Tariff(
+            (TariffPeriod('day', 2, hours=((6, 18),), feed_in_rate=0.9),),
+            default_rate=1,
+            feed_in_rate=0.4,
+        )
+        feed_in = Grid(tariff=tariff).feed_in_tariffs
+        self.assertEqual(feed_in[12], 0.9)
+        self.assertEqual(feed_in[0], 0.4)
+
+    def test_control(self):
+        control = Control()
+        control.grid.feed_in_power_rating = 0.05
+        excess = []
+        for _ in range(48):
+            result = control.balance_energy(0)
+            excess.append(result['excess_this_step'])
+            control.step()
+        rows = control.ledger.get_rows()
+        exported = rows[:, LEDGER_KEYS.index('exported')].copy()
+        curtailed = rows[:, LEDGER_KEYS.index('curtailed')].copy()
+        self.assertGreater(exported.sum(), 0)
+        self.assertGreater(curtailed.sum(), 0)
+        self.assertTrue(np.all(exported <= 0.05))
+        np.testing.assert_allclose(exported + curtailed, excess)
+
+        # The rollout exports the same.
+        control.reset()
+        control.grid.feed_in_power_rating = 0.05
+        columns = control.rollout(np.zeros(48))
+        np.testing.assert_allclose(columns['exported'], exported)
+        np.testing.assert_allclose(columns['curtailed'], curtailed)
+
+
+class TestSettlement(unittest.TestCase):
+
+    def setUp(self):
+        # Two periods of two steps.
+        self.purchased = np.array([4.0, 0.0, 1.0, 0.0])
+        self.tariffs = np.array([2.0, 2.0, 1.0, 3.0])
+        self.cost = self.purchased * self.tariffs
+        self.exported = np.array([0.0, 3.0, 0.0, 2.0])
+        self.feed_in = np.full(4, 0.5)
+        self.starts = np.array([0, 2])
+
+    def get(self, mode):
+        return settle(
+            self.purchased,
+            self.cost,
+            self.exported,
+            self.tariffs,
+            self.feed_in,
+            self.starts,
+            mode,
+        )
+
+    def test_net_billing(self):
+        bill = self.get("net_billing")
+        np.testing.assert_array_equal(bill['imported'], [4, 1])
+        np.testing.assert_array_equal(bill['exported'], [3, 2])
+        np.testing.assert_array_equal(bill['import_cost'], [8, 1])
+        np.testing.assert_array_equal(bill['export_credit'], [1.5, 1])
+        np.testing.assert_array_equal(bill['bill'], [6.5, 0])
+
+    def test_net_metering(self):
+        bill = self.get("net_metering")
+        # Period 1: 3 kWh at retail 2 offsets 6 of the 8.
+        # Period 2: 2 kWh at retail 3 is 6, only 1 can be offset, 5/6 of the exports are surplus at 0.5.
+        np.testing.assert_allclose(bill['export_credit'], [6, 1 + 5 / 6])
+        np.testing.assert_allclose(bill['bill'], [2, -5 / 6])
+        with self.assertRaises(SettlementError):
+            self.get("net_nothing")
+        with self.assertRaises(SettlementError):
+            settle(*self.get_args(), starts=np.array([1, 2]))
+
+    def get_args(self):
+        return (
+            self.purchased,
+            self.cost,
+            self.exported,
+            self.tariffs,
+            self.feed_in,
+        )
+
+    def test_window_starts(self):
+        starts = TimeIndex("2023-01-01", 8760).get_period_starts("month")
+        np.testing.assert_array_equal(
+            get_window_starts(starts, 700, 1500), [0, 44, 716]
+        )
+        np.testing.assert_array_equal(get_window_starts(starts, 0, 10), [0])
+
+    def test_control_settle(self):
+        control = Control(start_date="2023-01-31 12:00", feed_in_tariff=0.5)
+        for _ in range(48):
+            control.balance_energy(0.1)
+            control.step()
+        bill = control.settle("net_billing", "month")
+        # The run crosses into February.
+        np.testing.assert_array_equal(
+            bill['start'],
+            [control.time_index.get_step("2023-01-31 12:00"), 744],
+        )
+        totals = control.ledger.get_totals()
+        self.assertAlmostEqual(bill['import_cost'].sum(), totals['cost'])
+        self.assertAlmostEqual(bill['exported'].sum(), totals['exported'])
+        self.assertAlmostEqual(
+            bill['export_credit'].sum(), totals['exported'] * 0.5
+        )
+        daily = control.settle("net_metering", "day")
+        self.assertEqual(len(daily['bill']), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,14 @@ class TestSolarSimulator(unittest.TestCase):
     def tearDown(self):
         pass
 
+    def test_get_solar_forecast(self):
+        forecast = self.solar.get_solar_forecast(current_step=8750)
+        # Full length at the end of the year, wrapping to the start.
+        self.assertEqual(len(forecast), 24)
+        self.assertEqual(
+            forecast[10], self.solar.get_current_solar_generation(0)
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,122 @@
+from microgrid.stream import (
+    IteratorSource,
+    QueueSource,
+    TailingCsvSource,
+    RingBuffer,
+    StreamSource,
+    StreamEnd,
+    StreamError,
+)
+from microgrid.control import Control
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_window(self):
+        buffer = RingBuffer(length=4, n_features=1)
+        buffer.append(1.0)
+        # Filled with the first row until there is enough history.
+        self.assertEqual(buffer.window()[:, 0].tolist(), [1, 1, 1, 1])
+        for value in range(2, 8):
+            buffer.append(float(value))
+        window = buffer.window()
+        self.assertEqual(window[:, 0].tolist(), [4, 5, 6, 7])
+        self.assertEqual(buffer.latest()[0], 7)
+        # Always a view of the buffer, never a copy.
+        self.assertTrue(np.shares_memory(window, buffer.data))
+        self.assertEqual(buffer.get_forecast(2)[:, 0].tolist(), [4, 5])
+        with self.assertRaises(StreamError):
+            buffer.get_forecast(5)
+
+
+class TestSources(unittest.TestCase):
+
+    def test_iterator_source(self):
+        source = IteratorSource(
+            [{'load': 1, 'solar_gen': 2, 'tou_tariff': 3}, (4, 5, 6)]
+        )
+        self.assertEqual(source.next_sample(), (1.0, 2.0, 3.0))
+        self.assertEqual(source.next_sample(), (4.0, 5.0, 6.0))
+        with self.assertRaises(StreamEnd):
+            source.next_sample()
+        # A source has to implement next_sample.
+        with self.assertRaises(TypeError):
+            StreamSource()
+
+    def test_queue_source(self):
+        source = QueueSource(maxlen=2)
+        for value in range(3):
+            source.put((value, 0, 1))
+        # The oldest sample was dropped.
+        self.assertEqual(source.next_sample()[0], 1)
+        self.assertEqual(len(source), 1)
+        with self.assertRaises(StreamError):
+            source.put({'load': 1})
+
+    def test_tailing_csv_source(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'meter.csv')
+            with open(path, 'w') as f:
+                f.write(
+                    'timestamp,tou_tariff,load,solar_gen\n0,1.5,10,2\n1,1.5,1'
+                )
+            with TailingCsvSource(
+                path, timeout=0.1, poll_interval=0.01
+            ) as source:
+                self.assertEqual(source.next_sample(), (10.0, 2.0, 1.5))
+                # The second line is still being written.
+                with self.assertRaises(StreamEnd):
+                    source.next_sample()
+                with open(path, 'a') as f:
+                    f.write('1,3\n2,2.0,5,0\n')
+                self.assertEqual(source.next_sample(), (11.0, 3.0, 1.5))
+                self.assertEqual(source.next_sample(), (5.0, 0.0, 2.0))
+
+
+class TestStreamingControl(unittest.TestCase):
+
+    def test_matches_profiles(self):
+        # Streaming the profiles through a source gives the same numbers as reading them.
+        control = Control()
+        control.battery._set_battery_capacity(200)
+        samples = control.get_forecast_matrix(1)[:, 0]
+        streaming = Control(source=IteratorSource(samples), ledger_length=24)
+        streaming.battery._set_battery_capacity(200)
+
+        actions = np.tile([20.0] * 6 + [0.0] * 18, 3)
+        for action in actions:
+            expected = control.balance_energy(action=action)
+            result = streaming.balance_energy(action=action)
+            self.assertEqual(result, expected)
+            self.assertEqual(
+                streaming.get_current_state(), control.get_current_state()
+            )
+            control.step()
+            streaming.step()
+
+        # The streaming ledger only keeps the last day.
+        df = streaming.ledger.to_dataframe()
+        self.assertEqual(df.index.tolist(), list(range(48, 72)))
+        np.testing.assert_array_equal(
+            df.to_numpy(), control.ledger.to_dataframe().to_numpy()[48:]
+        )
+        # Persistence forecast from step 72: the last 24 samples pulled (49 to 72).
+        np.testing.assert_array_equal(
+            streaming.get_forecast(24), samples[49:73]
+        )
+
+    def test_end_of_stream(self):
+        streaming = Control(source=IteratorSource([(1, 2, 3)]))
+        with self.assertRaises(StreamEnd):
+            streaming.step()
+        self.assertEqual(streaming.current_step, 0)
+        with self.assertRaises(StreamError):
+            streaming.rollout([0])
+
+
+if __name__ == "__main__":
+    unittest.main()
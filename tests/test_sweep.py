@@ -0,0 +1,118 @@
+from microgrid.control import Control
+from microgrid.solar import Solar
+from microgrid.sweep import make_sweep_grid, run_sweep, SweepError, RUN_KEY
+import numpy as np
+import pandas as pd
+import os
+import tempfile
+import unittest
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.configs = make_sweep_grid(
+            capacity=[200, 800], C_rate=[0.25, 0.5], kw_peak=[100, 300]
+        )
+        # Charge a bit overnight, nothing during the day.
+        self.actions = np.tile(
+            [40.0] * 6 + [0.0] * 18, 30
+        )  # 30 days of actions
+
+    def test_make_sweep_grid(self):
+        self.assertEqual(len(self.configs), 8)
+        self.assertEqual(self.configs[0]['efficiency'], 0.9)
+        with self.assertRaises(SweepError):
+            make_sweep_grid(not_a_param=[1])
+
+    def test_matches_control(self):
+        df = run_sweep(self.configs, self.actions, n_workers=2, chunksize=3)
+        self.assertEqual(len(df), 8)
+
+        row = df.iloc[-1]
+        control = Control()
+        control.battery._set_battery_capacity(row['capacity'])
+        control.battery.C_rate = row['C_rate']
+        control.solar = Solar(kw_peak=row['kw_peak'])
+        result = control.rollout(self.actions)
+
+        self.assertAlmostEqual(
+            row['grid_energy_bought'], result['to_purchase'].sum(), 9
+        )
+        self.assertAlmostEqual(row['cost'], result['cost'].sum(), 9)
+        self.assertAlmostEqual(
+            row['unmet_demand'], result['unmet_demand'].sum(), 9
+        )
+        self.assertEqual(row['final_soc'], result['soc'][-1])
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results_file = os.path.join(tmp_dir, 'sweep.csv')
+            first = run_sweep(
+                self.configs[:5],
+                self.actions,
+                n_workers=1,
+                results_file=results_file,
+            )
+            self.assertEqual(len(first), 5)
+
+            # Only the last 3 configs should be run the second time.
+            second = run_sweep(
+                self.configs,
+                self.actions,
+                n_workers=2,
+                results_file=results_file,
+            )
+            self.assertEqual(len(second), 8)
+            with open(results_file) as f:
+                self.assertEqual(len(f.readlines()), 9)
+
+            in_process = run_sweep(self.configs, self.actions, n_workers=1)
+            np.testing.assert_allclose(
+                second['cost'].to_numpy(), in_process['cost'].to_numpy()
+            )
+
+            # A subset is read back from the file, without the other configs in it.
+            subset = run_sweep(
+                self.configs[2:4],
+                self.actions,
+                n_workers=1,
+                results_file=results_file,
+            )
+            self.assertEqual(len(subset), 2)
+            np.testing.assert_allclose(
+                subset['cost'].to_numpy(),
+                in_process['cost'].to_numpy()[2:4],
+            )
+
+            # Other actions are another run, nothing in the file is reused for them.
+            other = run_sweep(
+                self.configs[:2],
+                self.actions * 2,
+                n_workers=1,
+                results_file=results_file,
+            )
+            with open(results_file) as f:
+                self.assertEqual(len(f.readlines()), 11)
+            np.testing.assert_allclose(
+                other['cost'].to_numpy(),
+                run_sweep(self.configs[:2], self.actions * 2, n_workers=1)[
+                    'cost'
+                ].to_numpy(),
+            )
+
+            # A results file from before the run key can't be matched.
+            pd.read_csv(results_file).drop(columns=RUN_KEY).to_csv(
+                results_file, index=False
+            )
+            with self.assertRaises(SweepError):
+                run_sweep(
+                    self.configs,
+                    self.actions,
+                    n_workers=1,
+                    results_file=results_file,
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
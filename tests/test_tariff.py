@@ -0,0 +1,181 @@
+from microgrid.tariff import (
+    Tariff,
+    TariffError,
+    TariffPeriod,
+    clear_tariff_cache,
+)
+from microgrid.timeindex import TimeIndex
+from microgrid.batch import BatchControl
+from microgrid.control import Control
+from microgrid.grid import Grid, GridError
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+def get_tariff(peak=4.0, standard=2.0, off_peak=1.0, demand_charge=0.0):
+    # Eskom style: peak and standard on weekdays, the rest off peak. Winter peak is dearer.
+    return Tariff(
+        periods=(
+            TariffPeriod(
+                'winter_peak',
+                2 * peak,
+                hours=((6, 9), (17, 19)),
+                days=('weekday',),
+                seasons=('winter',),
+            ),
+            TariffPeriod(
+                'peak', peak, hours=((7, 10), (18, 20)), days=('weekday',)
+            ),
+            TariffPeriod(
+                'standard',
+                standard,
+                hours=((6, 22),),
+                days=('weekday', 'saturday'),
+                feed_in_rate=0.8,
+            ),
+        ),
+        default_rate=off_peak,
+        feed_in_rate=0.5,
+        demand_charge=demand_charge,
+        demand_periods=('winter_peak', 'peak'),
+    )
+
+
+class TestTariff(unittest.TestCase):
+
+    def setUp(self):
+        clear_tariff_cache()
+        self.index = TimeIndex("2023-01-01", 8760)
+
+    def test_prices(self):
+        prices = get_tariff().build(self.index)
+        self.assertEqual(prices.shape, (8760,))
+        step = self.index.get_step
+        # 2023-01-01 is a Sunday, off peak all day.
+        self.assertTrue(np.all(prices[:24] == 1.0))
+        # Monday the 2nd of January (summer).
+        self.assertEqual(prices[step("2023-01-02 05:00")], 1.0)
+        self.assertEqual(prices[step("2023-01-02 06:00")], 2.0)
+        self.assertEqual(prices[step("2023-01-02 08:00")], 4.0)
+        self.assertEqual(prices[step("2023-01-02 12:00")], 2.0)
+        self.assertEqual(prices[step("2023-01-02 22:00")], 1.0)
+        # Saturday is standard, but never peak.
+        self.assertEqual(prices[step("2023-01-07 08:00")], 2.0)
+        # Winter peak wins over peak, it comes first.
+        self.assertEqual(prices[step("2023-07-03 08:00")], 8.0)
+        self.assertEqual(prices[step("2023-07-03 09:00")], 4.0)
+        with self.assertRaises(ValueError):
+            prices[0] = 0
+
+        feed_in = get_tariff().build_feed_in(self.index)
+        self.assertEqual(feed_in[step("2023-01-02 12:00")], 0.8)
+        self.assertEqual(feed_in[step("2023-01-02 08:00")], 0.5)
+
+        names = get_tariff().get_period_names(self.index)
+        self.assertEqual(names[step("2023-07-03 08:00")], 'winter_peak')
+        self.assertEqual(names[0], 'default')
+        demand = get_tariff().get_demand_mask(self.index)
+        self.assertTrue(demand[step("2023-01-02 08:00")])
+        self.assertFalse(demand[step("2023-01-02 12:00")])
+
+    def test_wrapping_hours_and_sub_hourly(self):
+        night = Tariff(
+            (TariffPeriod('night', 0.5, hours=((22, 6),)),), default_rate=1
+        )
+        index = TimeIndex("2023-01-01", 24 * 4, interval=0.25)
+        prices = night.build(index)
+        hours = index.get_calendar()['hour']
+        np.testing.assert_array_equal(
+            prices == 0.5, (hours >= 22) | (hours < 6)
+        )
+
+    def test_cache(self):
+        tariff = get_tariff()
+        prices = tariff.build(self.index)
+        # Same rules, new object: cached.
+        self.assertIs(get_tariff().build(self.index), prices)
+        # Rate variants share the period index.
+        variant = get_tariff(peak=5.0)
+        self.assertIs(
+            variant.get_period_index(self.index),
+            tariff.get_period_index(self.index),
+        )
+        np.testing.assert_array_equal(
+            variant.build(self.index) == 5.0, prices == 4.0
+        )
+
+    def test_rules(self):
+        tariff = Tariff.from_dict(
+            {
+                'default_rate': 1.0,
+                'periods': [
+                    {'name': 'peak', 'rate': 3.0, 'hours': [[7, 10]]},
+                    {'name': 'summer', 'rate': 2.0, 'months': [12, 1, 2]},
+                ],
+            }
+        )
+        prices = tariff.build(self.index)
+        self.assertEqual(prices[8], 3.0)
+        self.assertEqual(prices[12], 2.0)
+        self.assertEqual(prices[self.index.get_step("2023-05-01 12:00")], 1)
+        with self.assertRaises(TariffError):
+            TariffPeriod('x', 1, days=('funday',))
+        with self.assertRaises(TariffError):
+            TariffPeriod('x', 1, seasons=('monsoon',))
+        with self.assertRaises(TariffError):
+            TariffPeriod('x', 1, months=(13,))
+        with self.assertRaises(TariffError):
+            Tariff((TariffPeriod('x', 1), TariffPeriod('x', 2)))
+        with self.assertRaises(TariffError):
+            Tariff((TariffPeriod('x', 1),), demand_periods=('y',))
+        with self.assertRaises(TariffError):
+            Tariff.from_dict({'periods': [{'name': 'x'}]})
+
+
+class TestTariffGrid(unittest.TestCase):
+
+    def test_grid(self):
+        tariff = get_tariff()
+        grid = Grid(tariff=tariff)
+        index = TimeIndex("2023-01-01", 8760)
+        np.testing.assert_array_equal(grid.tariffs, tariff.build(index))
+        step = index.get_step("2023-01-02 08:00")
+        self.assertEqual(grid.purchase_energy(2, step), (2, 8.0))
+
+        grid.set_tariff(get_tariff(peak=10.0), index)
+        self.assertEqual(grid.get_current_tariff(step), 10.0)
+        with self.assertRaises(GridError):
+            grid.set_tariff(tariff, TimeIndex("2023-01-01", 10))
+
+    def test_control(self):
+        tariff = get_tariff()
+        control = Control(tariff=tariff, start_date="2023-01-02 19:00")
+        self.assertEqual(control.get_current_state()['tou_tariff'], 4.0)
+        control.balance_energy(0)
+        totals = control.ledger.get_totals()
+        self.assertGreater(totals['purchased'], 0)
+        self.assertAlmostEqual(totals['cost'], totals['purchased'] * 4)
+        batch = BatchControl(n_envs=2, start_step=32, tariff=tariff)
+        np.testing.assert_array_equal(batch.grid.tariffs, control.grid.tariffs)
+
+    def test_control_without_tariff_column(self):
+        # The prices all come from the Tariff, so the file doesn't need a tou_tariff column.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = os.path.join(tmp_dir, 'site.csv')
+            with open(input_file, 'w') as f:
+                f.write('load,solar_gen\n' + '2,0\n' * 48)
+            tariff = get_tariff()
+            control = Control(input_file=input_file, tariff=tariff)
+            np.testing.assert_array_equal(
+                control.grid.tariffs, tariff.build(control.time_index)
+            )
+            control.balance_energy(0)
+            self.assertGreater(control.ledger.get_totals()['cost'], 0)
+            with self.assertRaises(GridError):
+                Control(input_file=input_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+from microgrid.timeindex import (
+    CALENDAR_KEYS,
+    SEASONS,
+    TimeIndex,
+    TimeIndexError,
+    get_time_index,
+)
+from microgrid.control import Control
+from microgrid.profiles import load_profiles, clear_profile_cache
+import numpy as np
+import pandas as pd
+import os
+import tempfile
+import unittest
+
+
+class TestTimeIndex(unittest.TestCase):
+
+    def test_step_lookup(self):
+        index = TimeIndex("2023-01-01", 8760)
+        self.assertEqual(index.get_step("2023-01-01 00:00"), 0)
+        self.assertEqual(index.get_step("2023-01-02 05:30"), 29)
+        self.assertEqual(index.get_step("2023-12-31 23:00"), 8759)
+        # Round trip for every step.
+        for step in (0, 1, 1000, 8759):
+            self.assertEqual(index.get_step(index.get_timestamp(step)), step)
+        self.assertEqual(index.timestamps[100], index.get_timestamp(100))
+        with self.assertRaises(TimeIndexError):
+            index.get_step("2023-01-02 05:30", exact=True)
+        with self.assertRaises(TimeIndexError):
+            index.get_step("2024-01-01 00:00")
+        with self.assertRaises(TimeIndexError):
+            index.get_step("2022-12-31 23:00")
+        with self.assertRaises(TimeIndexError):
+            index.get_step("not a date")
+
+    def test_timezones(self):
+        index = TimeIndex("2023-01-01", 48, tz="Africa/Johannesburg")
+        # Johannesburg is UTC+2, so midnight UTC is 02:00 local.
+        self.assertEqual(
+            index.get_step(pd.Timestamp("2023-01-01 00:00", tz="UTC")), 2
+        )
+        self.assertEqual(str(index.get_timestamp(0).tz), "Africa/Johannesburg")
+        # Sub hourly steps.
+        index = TimeIndex("2023-01-01", 288, interval=5 / 60)
+        self.assertEqual(index.get_step("2023-01-01 01:07"), 13)
+        self.assertAlmostEqual(index.get_calendar()["hour"][13], 1 + 5 / 60)
+
+    def test_calendar(self):
+        index = TimeIndex("2023-01-01", 8760)
+        calendar = index.get_calendar()
+        self.assertEqual(set(calendar), set(CALENDAR_KEYS))
+        # 2023-01-01 is a Sunday in summer.
+        self.assertEqual(calendar["weekday"][0], 6)
+        self.assertEqual(calendar["is_weekend"][0], 1)
+        self.assertEqual(SEASONS[calendar["season"][0]], "summer")
+        july = index.get_step("2023-07-05 14:00")
+        self.assertEqual(calendar["hour"][july], 14)
+        self.assertEqual(calendar["month"][july], 7)
+        self.assertEqual(SEASONS[calendar["season"][july]], "winter")
+        self.assertEqual(calendar["day_of_year"][july], 186)
+        self.assertEqual(calendar["is_weekend"][july], 0)
+        # Built once, read only.
+        matrix = index.get_calendar_matrix()
+        self.assertEqual(matrix.shape, (8760, len(CALENDAR_KEYS)))
+        self.assertIs(matrix, index.get_calendar_matrix())
+        with self.assertRaises(ValueError):
+            matrix[0, 0] = 1
+
+    def test_file_timestamps(self):
+        clear_profile_cache()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profiles.csv")
+            pd.DataFrame(
+                {
+                    "timestamp": pd.date_range(
+                        "2024-03-01", periods=48, freq="h", tz="UTC"
+                    ).strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "load": np.ones(48),
+                    "solar_gen": np.zeros(48),
+                    "tou_tariff": np.ones(48),
+                }
+            ).to_csv(path, index=False)
+            profiles = load_profiles(path)
+            index = get_time_index(profiles)
+            self.assertIs(index, get_time_index(profiles))
+            # UTC timestamps in the file, local dates in the index.
+            self.assertEqual(
+                index.get_timestamp(0),
+                pd.Timestamp("2024-03-01 02:00", tz="Africa/Johannesburg"),
+            )
+            self.assertEqual(index.get_step("2024-03-01 03:00"), 1)
+
+            # Gaps can't be indexed by arithmetic.
+            gap_path = os.path.join(tmp, "gap.csv")
+            timestamps = pd.date_range("2024-03-01", periods=4, freq="h")
+            pd.DataFrame(
+                {
+                    "timestamp": timestamps.delete(2).append(
+                        pd.DatetimeIndex(["2024-03-01 05:00"])
+                    ),
+                    "load": np.ones(4),
+                }
+            ).to_csv(gap_path, index=False)
+            with self.assertRaises(TimeIndexError):
+                get_time_index(load_profiles(gap_path, schema=None))
+        clear_profile_cache()
+
+
+class TestControlDates(unittest.TestCase):
+
+    def test_start_date_and_seek(self):
+        control = Control(start_date="2023-03-15 08:00")
+        step = control.time_index.get_step("2023-03-15 08:00")
+        self.assertEqual(control.current_step, step)
+        self.assertEqual(
+            control.get_timestamp(),
+            pd.Timestamp("2023-03-15 08:00", tz="Africa/Johannesburg"),
+        )
+        control.seek("2023-07-05 14:00")
+        features = control.get_calendar_features()
+        self.assertEqual(features[CALENDAR_KEYS.index("hour")], 14)
+        self.assertEqual(features[CALENDAR_KEYS.index("month")], 7)
+        # Every Control on the same profiles shares the index.
+        self.assertIs(Control().time_index, control.time_index)
+
+
+if __name__ == '__main__':
+    unittest.main()